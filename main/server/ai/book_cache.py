@@ -0,0 +1,113 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# 所有分区（分块、关键词索引、向量索引、目录）共享的总字节预算
+CHUNK_CACHE_MAX_BYTES = int(os.getenv("CHUNK_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+class BookCache:
+    """进程内按书籍缓存解析结果，按对象版本校验，按字节数做LRU淘汰
+
+    不同类型的数据放在各自的分区中，所有分区共用同一字节预算并一起按LRU淘汰。
+    """
+
+    def __init__(self, max_bytes: int = CHUNK_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        # (分区, book_id) -> (version, value, size)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Optional[str], Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        # 分区 -> 条目数、字节数与命中、未命中、淘汰计数
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def section(self, name: str) -> "BookCacheSection":
+        """返回共享本缓存预算的一个分区"""
+        with self._lock:
+            self._section_counters(name)
+        return BookCacheSection(self, name)
+
+    def _section_counters(self, name: str) -> Dict[str, int]:
+        counters = self._counters.get(name)
+        if counters is None:
+            counters = self._counters[name] = {"entries": 0, "bytes": 0, "hits": 0, "misses": 0, "evictions": 0}
+        return counters
+
+    def get(self, book_id: str, version: Optional[str], section: str = "default") -> Optional[Any]:
+        """命中且版本一致时返回缓存值，否则返回None"""
+        with self._lock:
+            counters = self._section_counters(section)
+            entry = self._entries.get((section, book_id))
+            if entry is None or entry[0] != version:
+                counters["misses"] += 1
+                return None
+            self._entries.move_to_end((section, book_id))
+            counters["hits"] += 1
+            return entry[1]
+
+    def put(self, book_id: str, version: Optional[str], value: Any, size: int, section: str = "default"):
+        """写入缓存，超出容量时淘汰最久未使用的条目（不论属于哪个分区）"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._pop((section, book_id))
+            self._entries[(section, book_id)] = (version, value, size)
+            self.total_bytes += size
+            counters = self._section_counters(section)
+            counters["entries"] += 1
+            counters["bytes"] += size
+            while self.total_bytes > self.max_bytes and self._entries:
+                key = next(iter(self._entries))
+                self._pop(key)
+                self._counters[key[0]]["evictions"] += 1
+
+    def invalidate(self, book_id: str, section: str = "default"):
+        """使某本书在该分区的缓存失效"""
+        with self._lock:
+            self._pop((section, book_id))
+
+    def _pop(self, key: Tuple[str, str]):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= old[2]
+            counters = self._counters[key[0]]
+            counters["entries"] -= 1
+            counters["bytes"] -= old[2]
+
+    def stats(self, section: Optional[str] = None) -> Dict[str, Any]:
+        """返回命中、未命中、淘汰计数与当前占用；不指定分区时为全部分区的合计"""
+        with self._lock:
+            if section is not None:
+                counters = dict(self._section_counters(section))
+            else:
+                counters = {key: sum(c[key] for c in self._counters.values())
+                            for key in ("entries", "bytes", "hits", "misses", "evictions")}
+            return {
+                "entries": counters["entries"],
+                "bytes": counters["bytes"],
+                "maxBytes": self.max_bytes,
+                "hits": counters["hits"],
+                "misses": counters["misses"],
+                "evictions": counters["evictions"],
+            }
+
+
+class BookCacheSection:
+    """BookCache中的一个分区，接口与BookCache相同"""
+
+    def __init__(self, cache: BookCache, name: str):
+        self.cache = cache
+        self.name = name
+
+    def get(self, book_id: str, version: Optional[str]) -> Optional[Any]:
+        return self.cache.get(book_id, version, self.name)
+
+    def put(self, book_id: str, version: Optional[str], value: Any, size: int):
+        self.cache.put(book_id, version, value, size, self.name)
+
+    def invalidate(self, book_id: str):
+        self.cache.invalidate(book_id, self.name)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats(self.name)
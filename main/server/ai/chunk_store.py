@@ -0,0 +1,281 @@
+import io
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# 分块文件格式：头部 + 定长偏移表 + 章节标题(utf-8, 换行分隔) + 正文(utf-8)
+# 原文模式下正文是整本书的文本，只存一份；分块文本由偏移表切出后去掉首尾空白。
+# 分段模式用于从旧版chunks.jsonl转换：正文是各分块文本依次拼接。
+_MAGIC = b"RACS"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIIIQQ")
+_FLAG_RAW_TEXT = 1
+_RECORD = np.dtype([
+    ("id", "<u4"),
+    ("start", "<u4"),        # 字符偏移（与阅读位置同尺度）
+    ("end", "<u4"),
+    ("title", "<i4"),        # 章节标题序号，-1表示无
+    ("byte_start", "<u8"),   # 在正文中的字节偏移
+    ("byte_end", "<u8"),
+])
+# 按区间打开时首次读取的字节数，通常已包含头部、偏移表与章节标题
+_OPEN_PREFETCH = 64 * 1024
+# find_text每批读取的分块数（远程正文每批一次批量区间读取）
+_FIND_BATCH = 64
+
+
+@dataclass
+class Chunk:
+    id: str
+    start: int
+    end: int
+    text: str
+    title: Optional[str] = None
+
+
+def _chunk_number(chunk_id: str) -> int:
+    return int(chunk_id.rsplit("_", 1)[-1])
+
+
+def _utf8_offsets(text: str) -> np.ndarray:
+    """每个字符偏移对应的utf-8字节偏移（长度为len(text)+1）"""
+    codes = np.frombuffer(text.encode("utf-32-le", errors="replace"), dtype="<u4")
+    widths = 1 + (codes >= 0x80).astype(np.int64) + (codes >= 0x800) + (codes >= 0x10000)
+    offsets = np.zeros(len(codes) + 1, dtype=np.int64)
+    np.cumsum(widths, out=offsets[1:])
+    return offsets
+
+
+class _RemoteText:
+    """不在内存中的正文：切片时按字节区间读取，read_many批量读取多个区间"""
+
+    def __init__(self, read_ranges: Callable[[Sequence[Tuple[int, int]]], List[bytes]], base: int, length: int):
+        self._read_ranges = read_ranges
+        self._base = base
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, i: slice) -> bytes:
+        start, stop, _ = i.indices(self._length)
+        return self.read_many([(start, stop)])[0]
+
+    def __bytes__(self) -> bytes:
+        return self[:]
+
+    def read_many(self, spans: Sequence[Tuple[int, int]]) -> List[bytes]:
+        """读取多个 [start, stop) 字节区间（相对正文起点）"""
+        ranges = [(self._base + start, stop - start) for start, stop in spans]
+        return self._read_ranges(ranges)
+
+
+def _parse_header(data) -> Tuple[int, int, int, int]:
+    """校验头部，返回 (标志, 分块数, 章节标题字节数, 正文字节数)"""
+    magic, version, flags, n, titles_len, text_len = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC or version != _FORMAT_VERSION:
+        raise ValueError("分块文件格式不兼容")
+    return flags, n, titles_len, text_len
+
+
+def _parse_titles(data, offset: int, length: int) -> List[str]:
+    blob = bytes(data[offset:offset + length]).decode("utf-8")
+    return blob.split("\n") if blob else []
+
+
+class ChunkStore(Sequence):
+    """只读分块序列：偏移表为零拷贝数组，按需解码单个分块，按位置二分查找"""
+
+    def __init__(self, table: np.ndarray, titles: List[str], text, raw: bool):
+        self.table = table
+        self.titles = titles
+        self.raw = raw
+        self._text = text
+        self.ids = table["id"]
+        self.starts = table["start"]
+        self.ends = table["end"]
+
+    @classmethod
+    def build(cls, chunks: List[Chunk], text: Optional[str] = None) -> "ChunkStore":
+        """由按位置排序的分块构建；提供全书文本时使用原文模式"""
+        table = np.zeros(len(chunks), dtype=_RECORD)
+        titles: List[str] = []
+        title_ids = {}
+        for i, chunk in enumerate(chunks):
+            title = -1
+            if chunk.title:
+                title = title_ids.setdefault(chunk.title, len(titles))
+                if title == len(titles):
+                    titles.append(chunk.title.replace("\n", " "))
+            table[i] = (_chunk_number(chunk.id), chunk.start, chunk.end, title, 0, 0)
+
+        if text is not None:
+            offsets = _utf8_offsets(text)
+            table["byte_start"] = offsets[table["start"]]
+            table["byte_end"] = offsets[table["end"]]
+            blob = text.encode("utf-8")
+        else:
+            encoded = [chunk.text.encode("utf-8") for chunk in chunks]
+            lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+            table["byte_end"] = np.cumsum(lengths)
+            table["byte_start"] = table["byte_end"] - lengths
+            blob = b"".join(encoded)
+        return cls(table, titles, blob, raw=text is not None)
+
+    def to_bytes(self) -> bytes:
+        """序列化为二进制格式"""
+        buffer = io.BytesIO()
+        self.write_to(buffer)
+        return buffer.getvalue()
+
+    def write_to(self, f: BinaryIO):
+        """按顺序写入文件对象，不在内存中拼出整个文件"""
+        titles_blob = "\n".join(self.titles).encode("utf-8")
+        f.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, _FLAG_RAW_TEXT if self.raw else 0,
+                             len(self.table), len(titles_blob), len(self._text)))
+        f.write(self.table.tobytes())
+        f.write(titles_blob)
+        f.write(bytes(self._text) if self.remote else self._text)
+
+    @classmethod
+    def from_bytes(cls, data) -> "ChunkStore":
+        """从二进制数据加载（偏移表与正文都是零拷贝视图，可直接作用于mmap）"""
+        flags, n, titles_len, text_len = _parse_header(data)
+        offset = _HEADER.size
+        table = np.frombuffer(data, dtype=_RECORD, count=n, offset=offset)
+        offset += table.nbytes
+        titles = _parse_titles(data, offset, titles_len)
+        offset += titles_len
+        text = memoryview(data)[offset:offset + text_len]
+        return cls(table, titles, text, raw=bool(flags & _FLAG_RAW_TEXT))
+
+    @classmethod
+    def open(cls, read_range: Callable[[int, int], bytes],
+             read_ranges: Callable[[Sequence[Tuple[int, int]]], List[bytes]],
+             prefetch: int = _OPEN_PREFETCH) -> "ChunkStore":
+        """按字节区间打开远程文件：只下载头部、偏移表与章节标题，正文在取出分块时按区间读取
+
+        read_range(offset, length) 读取一个区间，read_ranges([(offset, length), ...]) 批量读取。
+        整个文件不超过prefetch时一次读完，之后不再发起请求。
+        """
+        head = read_range(0, prefetch)
+        flags, n, titles_len, text_len = _parse_header(head)
+        text_offset = _HEADER.size + n * _RECORD.itemsize + titles_len
+        if len(head) < text_offset:
+            head += read_range(len(head), text_offset - len(head))
+        table = np.frombuffer(head, dtype=_RECORD, count=n, offset=_HEADER.size)
+        titles = _parse_titles(head, _HEADER.size + table.nbytes, titles_len)
+        if len(head) >= text_offset + text_len:
+            text = memoryview(head)[text_offset:text_offset + text_len]
+        else:
+            text = _RemoteText(read_ranges, text_offset, text_len)
+        return cls(table, titles, text, raw=bool(flags & _FLAG_RAW_TEXT))
+
+    @property
+    def remote(self) -> bool:
+        """正文是否按需从远程读取"""
+        return isinstance(self._text, _RemoteText)
+
+    @property
+    def nbytes(self) -> int:
+        """常驻内存的字节数（远程正文不计入）"""
+        return self.table.nbytes + (0 if self.remote else len(self._text))
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Chunk, List[Chunk]]:
+        if isinstance(i, slice):
+            return [self._chunk(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._chunk(i)
+
+    def __iter__(self) -> Iterator[Chunk]:
+        for i in range(len(self)):
+            yield self._chunk(i)
+
+    def take(self, ordinals: Sequence[int]) -> List[Chunk]:
+        """按序号取出多个分块；远程正文合并为一次批量区间读取"""
+        records = [self.table[i] for i in ordinals]
+        blobs = self._read_spans([(int(r["byte_start"]), int(r["byte_end"])) for r in records])
+        return [self._make_chunk(r, blob) for r, blob in zip(records, blobs)]
+
+    def _read_spans(self, spans: Sequence[Tuple[int, int]]) -> List[bytes]:
+        if self.remote:
+            return self._text.read_many(spans)
+        return [self._text[start:stop] for start, stop in spans]
+
+    def _chunk(self, i: int) -> Chunk:
+        record = self.table[i]
+        return self._make_chunk(record, self._text[record["byte_start"]:record["byte_end"]])
+
+    def _make_chunk(self, record, blob) -> Chunk:
+        text = bytes(blob).decode("utf-8")
+        title = self.titles[record["title"]] if record["title"] >= 0 else None
+        return Chunk(
+            id=f"chunk_{int(record['id']):06d}",
+            start=int(record["start"]),
+            end=int(record["end"]),
+            text=text.strip() if self.raw else text,
+            title=title,
+        )
+
+    def count_ending_by(self, position: int, lo: int = 0, hi: Optional[int] = None) -> int:
+        """在[lo, hi)内二分查找：返回第一个 end > position 的分块序号"""
+        hi = len(self) if hi is None else hi
+        return lo + int(np.searchsorted(self.ends[lo:hi], position, side="right"))
+
+    def locate(self, position: int) -> Optional[int]:
+        """包含该位置的第一个分块；没有时返回起点最近的分块"""
+        if not len(self):
+            return None
+        i = int(np.searchsorted(self.ends, position, side="left"))
+        if i < len(self) and self.starts[i] <= position:
+            return i
+        j = int(np.searchsorted(self.starts, position))
+        candidates = [k for k in (j - 1, j) if 0 <= k < len(self)]
+        return min(candidates, key=lambda k: abs(int(self.starts[k]) - position))
+
+    def text_range(self, start: int, end: int) -> str:
+        """取出字符区间[start, end)的文本：原文模式只解码该区间，分段模式拼接相邻分块并去掉重叠"""
+        if end <= start or not len(self):
+            return ""
+        if self.raw:
+            k = int(np.searchsorted(self.starts, start, side="right")) - 1
+            base_char, base_byte = (int(self.starts[k]), int(self.table["byte_start"][k])) if k >= 0 else (0, 0)
+            m = int(np.searchsorted(self.ends, end, side="left"))
+            stop_byte = int(self.table["byte_end"][m]) if m < len(self) else len(self._text)
+            text = bytes(self._text[base_byte:stop_byte]).decode("utf-8")
+            return text[start - base_char:end - base_char]
+
+        parts = []
+        covered = start
+        for i in range(self.count_ending_by(start), len(self)):
+            chunk = self._chunk(i)
+            if chunk.start >= end:
+                break
+            parts.append(chunk.text[max(0, covered - chunk.start):max(0, end - chunk.start)])
+            covered = max(covered, chunk.end)
+        return "".join(parts)
+
+    def find_text(self, needle: str, hi: Optional[int] = None) -> Iterator[int]:
+        """按顺序产出前hi个分块中包含needle的分块序号
+
+        逐个分块在其字节区间内查找（跨两个分块的命中不算），每批只读取_FIND_BATCH个分块的正文。
+        """
+        hi = len(self) if hi is None else min(hi, len(self))
+        if not needle or hi <= 0:
+            return
+        pattern = needle.encode("utf-8")
+        byte_starts, byte_ends = self.table["byte_start"], self.table["byte_end"]
+        for lo in range(0, hi, _FIND_BATCH):
+            ordinals = range(lo, min(lo + _FIND_BATCH, hi))
+            blobs = self._read_spans([(int(byte_starts[i]), int(byte_ends[i])) for i in ordinals])
+            for i, blob in zip(ordinals, blobs):
+                if pattern in bytes(blob):
+                    yield i
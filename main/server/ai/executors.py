@@ -0,0 +1,35 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict
+
+from bounded_executor import BoundedExecutor, PoolBusyError, process_context
+
+__all__ = ["PoolBusyError", "io_pool", "cpu_pool", "executor_stats", "shutdown_executors"]
+
+AI_IO_WORKERS = int(os.getenv("AI_IO_WORKERS", "16"))
+AI_IO_QUEUE_LIMIT = int(os.getenv("AI_IO_QUEUE_LIMIT", "256"))
+AI_CPU_WORKERS = int(os.getenv("AI_CPU_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+AI_CPU_QUEUE_LIMIT = int(os.getenv("AI_CPU_QUEUE_LIMIT", "16"))
+
+
+# 阻塞的存储I/O与LLM外的同步调用
+io_pool = BoundedExecutor(
+    "io", lambda n: ThreadPoolExecutor(max_workers=n, thread_name_prefix="ai-io"),
+    AI_IO_WORKERS, AI_IO_QUEUE_LIMIT,
+)
+# 文本抽取、切片、建索引等CPU密集任务
+cpu_pool = BoundedExecutor(
+    "cpu", lambda n: ProcessPoolExecutor(max_workers=n, mp_context=process_context()),
+    AI_CPU_WORKERS, AI_CPU_QUEUE_LIMIT,
+)
+
+
+def executor_stats() -> Dict[str, Any]:
+    """返回各执行池的运行统计"""
+    return {"io": io_pool.stats(), "cpu": cpu_pool.stats()}
+
+
+def shutdown_executors():
+    """关闭所有执行池"""
+    io_pool.shutdown()
+    cpu_pool.shutdown()
@@ -0,0 +1,45 @@
+import os
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+HYBRID_DEPTH = int(os.getenv("HYBRID_DEPTH", "50"))
+HYBRID_RECENCY_WEIGHT = float(os.getenv("HYBRID_RECENCY_WEIGHT", "0.5"))
+HYBRID_RECENCY_SCALE = float(os.getenv("HYBRID_RECENCY_SCALE", "20000"))
+
+
+def _ranks(ids: np.ndarray, ranked: Sequence[Tuple[int, float]]) -> np.ndarray:
+    """每个候选在某一路结果中的名次（未出现为inf）"""
+    ranks = np.full(len(ids), np.inf)
+    if ranked:
+        ranked_ids = np.fromiter((doc_id for doc_id, _ in ranked), dtype=np.int64, count=len(ranked))
+        ranks[np.searchsorted(ids, ranked_ids)] = np.arange(len(ranked))
+    return ranks
+
+
+def fuse(lexical: Sequence[Tuple[int, float]], semantic: Sequence[Tuple[int, float]],
+         nearby: Iterable[int], chunk_ends: np.ndarray, position: int, top_k: int = 4,
+         rrf_k: int = HYBRID_RRF_K, recency_weight: float = HYBRID_RECENCY_WEIGHT,
+         recency_scale: float = HYBRID_RECENCY_SCALE) -> List[Tuple[int, float]]:
+    """倒数排名融合BM25与向量结果，并叠加距阅读位置的衰减先验
+
+    chunk_ends为各分块的结束偏移（按分块序号），nearby为阅读位置附近的分块序号，
+    确保没有词面或语义命中时也能选到读者正在阅读的段落。
+    """
+    ids = np.unique(np.fromiter(
+        [doc_id for doc_id, _ in lexical] + [doc_id for doc_id, _ in semantic] + list(nearby),
+        dtype=np.int64,
+    ))
+    if len(ids) == 0:
+        return []
+
+    scores = 1.0 / (rrf_k + 1 + _ranks(ids, lexical)) + 1.0 / (rrf_k + 1 + _ranks(ids, semantic))
+    # 先取出候选再转换类型，避免每次查询复制整张结束偏移表
+    ends = np.asarray(chunk_ends)[ids].astype(np.float64)
+    prior = np.exp(-np.abs(position - ends) / recency_scale)
+    # 先验最大相当于一路结果中排名第一的贡献乘以权重
+    scores += recency_weight / (rrf_k + 1) * prior
+
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [(int(ids[i]), float(scores[i])) for i in order]
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import time
+import urllib.error
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .executors import PoolBusyError
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "2"))
+INGEST_RETRY_BACKOFF_SECONDS = float(os.getenv("INGEST_RETRY_BACKOFF_SECONDS", "2"))
+INGEST_JOB_TTL_SECONDS = int(os.getenv("INGEST_JOB_TTL_SECONDS", "3600"))
+INGEST_QUEUE_LIMIT = int(os.getenv("INGEST_QUEUE_LIMIT", "100"))
+
+
+class IngestQueueFullError(Exception):
+    """排队的任务数已达上限"""
+
+
+class IngestConflictError(Exception):
+    """同一本书已有另一种文件类型的未完成任务"""
+
+
+def _is_transient(error: Exception) -> bool:
+    """执行池繁忙与网络、存储服务的临时故障可以重试；解析失败、对象不存在等结果不会因重试改变"""
+    if isinstance(error, PoolBusyError):
+        return True
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500 or error.code == 429
+    if isinstance(error, (FileNotFoundError, PermissionError, IsADirectoryError, NotADirectoryError)):
+        return False
+    # 连接失败、超时等（requests 与 urllib 的网络异常也是 OSError）
+    return isinstance(error, OSError)
+
+
+@dataclass
+class IngestJob:
+    id: str
+    book_id: str
+    file_type: str
+    status: str = "queued"  # queued | running | succeeded | failed
+    attempts: int = 0
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # 由ReadingAI.aingest_book实时更新：stage、bytesDownloaded、chunks、stageTimings
+    progress: Dict[str, Any] = field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "jobId": self.id,
+            "bookId": self.book_id,
+            "fileType": self.file_type,
+            "status": self.status,
+            "attempts": self.attempts,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class IngestJobManager:
+    """书籍处理任务队列：后台工作协程按并发上限处理，临时故障重试，同一本书的重复提交合并"""
+
+    def __init__(self, ai_engine, workers: int = INGEST_WORKERS, max_retries: int = INGEST_MAX_RETRIES,
+                 queue_limit: int = INGEST_QUEUE_LIMIT):
+        self.ai_engine = ai_engine
+        self.workers = workers
+        self.max_retries = max_retries
+        self._jobs: Dict[str, IngestJob] = {}
+        self._active_by_book: Dict[str, IngestJob] = {}
+        self._queue: "asyncio.Queue[IngestJob]" = asyncio.Queue(maxsize=queue_limit)
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """启动后台工作协程"""
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        """停止后台工作协程"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, book_id: str, file_type: str) -> IngestJob:
+        """提交任务；同一本书已有未完成任务时直接返回该任务
+
+        该任务的文件类型不同时抛出IngestConflictError（两个任务会写同一组切片与索引），
+        排队已满时抛出IngestQueueFullError。
+        """
+        job = self._active_by_book.get(book_id)
+        if job is not None and job.active:
+            if job.file_type != file_type:
+                raise IngestConflictError(f"书籍 {book_id} 已有 {job.file_type} 类型的处理任务")
+            return job
+        self._prune()
+        job = IngestJob(id=uuid.uuid4().hex, book_id=book_id, file_type=file_type)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise IngestQueueFullError("书籍处理任务排队已满")
+        self._jobs[job.id] = job
+        self._active_by_book[book_id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "queueDepth": self._queue.qsize(), "jobs": counts}
+
+    def _prune(self):
+        """清理过期的已完成任务"""
+        cutoff = time.time() - INGEST_JOB_TTL_SECONDS
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if not job.active and (job.finished_at or 0) < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: IngestJob):
+        job.status = "running"
+        job.started_at = time.time()
+        while True:
+            job.attempts += 1
+            retryable = False
+            try:
+                result = await self.ai_engine.aingest_book(job.book_id, job.file_type, progress=job.progress)
+                error = result.get("message") if result.get("status") != "success" else None
+            except PoolBusyError as e:
+                result, error, retryable = None, str(e), True
+            except Exception as e:
+                result, error, retryable = None, f"书籍处理失败: {e}", _is_transient(e)
+
+            if error is None:
+                job.status, job.result, job.error = "succeeded", result, None
+                break
+            if not retryable or job.attempts > self.max_retries:
+                job.status, job.result, job.error = "failed", result, error
+                break
+            job.error = error
+            await asyncio.sleep(INGEST_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+
+        job.finished_at = time.time()
+        if self._active_by_book.get(job.book_id) is job:
+            del self._active_by_book[job.book_id]
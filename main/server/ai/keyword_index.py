@@ -0,0 +1,233 @@
+import io
+import math
+import struct
+from collections import Counter
+from typing import BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .tokenizer import Tokenizer, get_tokenizer, tokenizer_names
+
+# 索引文件格式：头部 + 分词器名称(ascii, 补齐到8字节) + ptr(int64) + doc_lengths(int32) + docs(int32) + tfs(int32)
+# + 词表(utf-8, 换行分隔)
+_MAGIC = b"RAIX"
+_FORMAT_VERSION = 3
+_HEADER = struct.Struct("<4sIIIQQI")
+# 版本2的分词器名称是定长16字节字段，更长的名称会被截断
+_HEADER_V2 = struct.Struct("<4sIIIQQ16s")
+# 版本1没有记录分词器，固定使用旧版按字符段切分的规则
+_HEADER_V1 = struct.Struct("<4sIIIQQ")
+
+
+def _padded(size: int) -> int:
+    """数组从8字节对齐的位置开始"""
+    return (size + 7) // 8 * 8
+
+
+def _v2_tokenizer(name: str) -> Tokenizer:
+    """版本2中超过16字节的名称被截断，按前缀找回唯一匹配的分词器"""
+    if len(name) == 16:
+        matches = [full for full in tokenizer_names() if full.startswith(name)]
+        if len(matches) == 1:
+            name = matches[0]
+    return get_tokenizer(name)
+
+
+class KeywordIndex:
+    """BM25倒排索引，倒排表以CSR数组存储：词 -> 按分块序号升序的 (序号, 词频)"""
+
+    def __init__(self, vocab: Dict[str, int], ptr: np.ndarray, docs: np.ndarray, tfs: np.ndarray,
+                 doc_lengths: np.ndarray, tokenizer: Tokenizer, k1: float = 1.5, b: float = 0.75):
+        self.vocab = vocab
+        self.tokenizer = tokenizer
+        self.ptr = ptr
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.doc_count = len(doc_lengths)
+        self.avg_doc_length = float(doc_lengths.mean()) if self.doc_count else 0.0
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, texts: List[str], tokenizer: Optional[Tokenizer] = None) -> "KeywordIndex":
+        """由按位置排序的分块文本构建索引"""
+        tokenizer = tokenizer or get_tokenizer()
+        # 按出现顺序编号的词表；倒排项按 (分块, 词) 顺序平铺，最后按词号稳定排序
+        first_seen: Dict[str, int] = {}
+        term_ids: List[int] = []
+        all_tfs: List[int] = []
+        doc_lengths = np.zeros(len(texts), dtype=np.int32)
+        doc_terms = np.zeros(len(texts), dtype=np.int64)
+        for doc_id, text in enumerate(texts):
+            words = tokenizer.tokenize(text)
+            doc_lengths[doc_id] = len(words)
+            counts = Counter(words)
+            doc_terms[doc_id] = len(counts)
+            term_ids.extend([first_seen.setdefault(word, len(first_seen)) for word in counts])
+            all_tfs.extend(counts.values())
+
+        terms = sorted(first_seen)
+        rank = np.empty(len(terms), dtype=np.int64)
+        rank[np.fromiter(map(first_seen.__getitem__, terms), dtype=np.int64, count=len(terms))] = \
+            np.arange(len(terms), dtype=np.int64)
+        postings_terms = rank[np.asarray(term_ids, dtype=np.int64)]
+        order = np.argsort(postings_terms, kind="stable")
+        ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(postings_terms, minlength=len(terms)), out=ptr[1:])
+        all_docs = np.repeat(np.arange(len(texts), dtype=np.int32), doc_terms)
+        return cls(
+            dict(zip(terms, range(len(terms)))),
+            ptr,
+            all_docs[order],
+            np.asarray(all_tfs, dtype=np.int32)[order],
+            doc_lengths,
+            tokenizer,
+        )
+
+    @classmethod
+    def update(cls, previous: "KeywordIndex", reused: Sequence[int], texts: List[str]) -> "KeywordIndex":
+        """增量重建：reused[i]为第i个分块在旧索引中的序号，-1表示新分块
+
+        保留分块的倒排项直接从旧索引的CSR数组中取出并重新编号，只对新分块分词。
+        """
+        tokenizer = previous.tokenizer
+        reused = np.asarray(reused, dtype=np.int64)
+        kept = np.flatnonzero(reused >= 0)
+        remap = np.full(previous.doc_count, -1, dtype=np.int64)
+        remap[reused[kept]] = kept
+
+        old_term_ids = np.repeat(np.arange(len(previous.ptr) - 1, dtype=np.int64), np.diff(previous.ptr))
+        old_docs = remap[previous.docs]
+        mask = old_docs >= 0
+        old_term_ids, old_docs, old_tfs = old_term_ids[mask], old_docs[mask], previous.tfs[mask]
+
+        doc_lengths = np.zeros(len(reused), dtype=np.int32)
+        doc_lengths[kept] = previous.doc_lengths[reused[kept]]
+        new_terms: List[str] = []
+        new_docs: List[int] = []
+        new_tfs: List[int] = []
+        for doc_id in np.flatnonzero(reused < 0):
+            words = tokenizer.tokenize(texts[doc_id])
+            doc_lengths[doc_id] = len(words)
+            for word, tf in Counter(words).items():
+                new_terms.append(word)
+                new_docs.append(int(doc_id))
+                new_tfs.append(tf)
+
+        # 合并词表（丢弃只出现在已删除分块中的词）
+        old_vocab = sorted(previous.vocab, key=previous.vocab.get)
+        used = np.unique(old_term_ids)
+        terms = sorted({old_vocab[i] for i in used}.union(new_terms))
+        vocab = {term: i for i, term in enumerate(terms)}
+        old_to_new = np.full(len(old_vocab), -1, dtype=np.int64)
+        old_to_new[used] = [vocab[old_vocab[i]] for i in used]
+
+        all_terms = np.concatenate([old_to_new[old_term_ids], np.asarray([vocab[t] for t in new_terms], dtype=np.int64)])
+        all_docs = np.concatenate([old_docs, np.asarray(new_docs, dtype=np.int64)])
+        all_tfs = np.concatenate([old_tfs, np.asarray(new_tfs, dtype=np.int32)])
+        order = np.lexsort((all_docs, all_terms))
+        ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        ptr[1:] = np.cumsum(np.bincount(all_terms, minlength=len(terms)))
+        return cls(
+            vocab,
+            ptr,
+            all_docs[order].astype(np.int32),
+            all_tfs[order].astype(np.int32),
+            doc_lengths,
+            tokenizer,
+            previous.k1,
+            previous.b,
+        )
+
+    def to_bytes(self) -> bytes:
+        """序列化为紧凑的二进制格式"""
+        buffer = io.BytesIO()
+        self.write_to(buffer)
+        return buffer.getvalue()
+
+    def write_to(self, f: BinaryIO):
+        """按顺序写入文件对象，不在内存中拼出整个文件"""
+        terms = sorted(self.vocab, key=self.vocab.get)
+        vocab_blob = "\n".join(terms).encode("utf-8")
+        name = self.tokenizer.name.encode("ascii")
+        f.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, self.doc_count, len(terms),
+                             len(self.docs), len(vocab_blob), len(name)))
+        f.write(name.ljust(_padded(_HEADER.size + len(name)) - _HEADER.size, b"\0"))
+        f.write(np.ascontiguousarray(self.ptr, dtype="<i8"))
+        f.write(np.ascontiguousarray(self.doc_lengths, dtype="<i4"))
+        f.write(np.ascontiguousarray(self.docs, dtype="<i4"))
+        f.write(np.ascontiguousarray(self.tfs, dtype="<i4"))
+        f.write(vocab_blob)
+
+    @classmethod
+    def from_bytes(cls, data) -> "KeywordIndex":
+        """从二进制数据加载（数组为零拷贝视图，可直接作用于mmap）"""
+        magic, version = struct.unpack_from("<4sI", data, 0)
+        if magic != _MAGIC or version not in (1, 2, _FORMAT_VERSION):
+            raise ValueError("索引文件格式不兼容")
+        if version == 1:
+            _, _, n_docs, n_terms, n_postings, vocab_len = _HEADER_V1.unpack_from(data, 0)
+            tokenizer = get_tokenizer("word")
+            offset = _HEADER_V1.size
+        elif version == 2:
+            _, _, n_docs, n_terms, n_postings, vocab_len, name = _HEADER_V2.unpack_from(data, 0)
+            tokenizer = _v2_tokenizer(name.rstrip(b"\0").decode("ascii"))
+            offset = _HEADER_V2.size
+        else:
+            _, _, n_docs, n_terms, n_postings, vocab_len, name_len = _HEADER.unpack_from(data, 0)
+            name = bytes(data[_HEADER.size:_HEADER.size + name_len])
+            tokenizer = get_tokenizer(name.decode("ascii"))
+            offset = _padded(_HEADER.size + name_len)
+        ptr = np.frombuffer(data, dtype="<i8", count=n_terms + 1, offset=offset)
+        offset += ptr.nbytes
+        doc_lengths = np.frombuffer(data, dtype="<i4", count=n_docs, offset=offset)
+        offset += doc_lengths.nbytes
+        docs = np.frombuffer(data, dtype="<i4", count=n_postings, offset=offset)
+        offset += docs.nbytes
+        tfs = np.frombuffer(data, dtype="<i4", count=n_postings, offset=offset)
+        offset += tfs.nbytes
+        vocab_blob = bytes(data[offset:offset + vocab_len]).decode("utf-8")
+        terms = vocab_blob.split("\n") if vocab_blob else []
+        return cls({term: i for i, term in enumerate(terms)}, ptr, docs, tfs, doc_lengths, tokenizer)
+
+    def idf(self, term: str) -> float:
+        """BM25逆文档频率"""
+        term_id = self.vocab.get(term)
+        df = int(self.ptr[term_id + 1] - self.ptr[term_id]) if term_id is not None else 0
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, limit: Optional[int] = None, top_k: int = 4,
+               start: int = 0) -> List[Tuple[int, float]]:
+        """在序号区间[start, limit)内按BM25检索，返回 (分块序号, 得分) 列表"""
+        if limit is None or limit > self.doc_count:
+            limit = self.doc_count
+        start = max(0, start)
+        if limit <= start or not self.avg_doc_length:
+            return []
+
+        hit_docs, hit_scores = [], []
+        k1, b, avgdl = self.k1, self.b, self.avg_doc_length
+        for term in set(self.tokenizer.tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            lo, hi = int(self.ptr[term_id]), int(self.ptr[term_id + 1])
+            docs = self.docs[lo:hi]
+            # 倒排表按序号升序，只取位置窗口内的部分
+            first = int(np.searchsorted(docs, start)) if start else 0
+            cut = int(np.searchsorted(docs, limit))
+            if cut <= first:
+                continue
+            docs = docs[first:cut]
+            tfs = self.tfs[lo + first:lo + cut].astype(np.float32)
+            norm = k1 * (1 - b + b * self.doc_lengths[docs] / avgdl)
+            hit_docs.append(docs)
+            hit_scores.append(self.idf(term) * tfs * (k1 + 1) / (tfs + norm))
+
+        if not hit_docs:
+            return []
+        doc_ids, inverse = np.unique(np.concatenate(hit_docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(hit_scores))
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [(int(doc_ids[i]), float(scores[i])) for i in order]
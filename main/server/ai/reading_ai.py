@@ -1,20 +1,271 @@
 import os
 import json
+import hashlib
+import importlib.util
+import asyncio
 import requests
+import tempfile
 import time
-import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, BinaryIO, Callable, Iterator, Optional, Tuple
 from dataclasses import dataclass
-import re
-from collections import Counter
+
+from .book_cache import BookCache
+from .chunk_store import Chunk, ChunkStore
+from .chunker import Chunker, get_chunker
+from .executors import PoolBusyError, cpu_pool, executor_stats, io_pool
+from .hybrid_ranker import HYBRID_DEPTH, fuse
+from .keyword_index import KeywordIndex
+from .text_extraction import Chapter, extract_book
+from .tokenizer import get_tokenizer
+from .vector_index import VectorIndex, get_embedding_provider
+
+# Optional: httpx（异步LLM客户端）
+try:
+    import httpx
+    _HTTPX_AVAILABLE = True
+except Exception:
+    httpx = None  # type: ignore
+    _HTTPX_AVAILABLE = False
+
+# HTTP/2 需要额外安装 h2（只检查是否已安装，由httpx自行导入）
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_MAX_CONCURRENCY_PER_HOST = int(os.getenv("LLM_MAX_CONCURRENCY_PER_HOST", "32"))
+
+@dataclass
+class BookArtifacts:
+    # 分块文件（偏移表 + 全书原文）、关键词索引与向量文件写在临时文件中，上传后由discard删除
+    chunks_path: str
+    chunk_count: int
+    summary: str
+    index_path: str
+    vectors_path: str
+    toc: List[Dict[str, Any]]
+    source_hash: str
+    source_bytes: int
+    # 各章内容哈希、偏移区间与分块序号区间，写入清单供下次增量处理
+    chapters: List[Dict[str, Any]]
+    reused_chunks: int = 0
+    # 下载前读取的原文件ETag，由调用方填写
+    source_etag: Optional[str] = None
+
+    def discard(self):
+        """删除临时文件"""
+        for path in (self.chunks_path, self.index_path, self.vectors_path):
+            if path and os.path.exists(path):
+                os.unlink(path)
+
+@dataclass
+class PreviousBook:
+    """上次处理的结果，用于增量处理"""
+    manifest: Dict[str, Any]
+    chunks_data: bytes
+    index_data: bytes
+    vectors_data: bytes
 
 @dataclass
-class Chunk:
-    id: str
-    start: int
-    end: int
-    text: str
-    title: Optional[str] = None
+class IngestPlan:
+    """一次处理的准备结果：下载到临时文件的原文件与上次的处理结果"""
+    book_id: str
+    file_type: str
+    source_path: Optional[str] = None
+    source_etag: Optional[str] = None
+    source_hash: Optional[str] = None
+    source_bytes: int = 0
+    previous: Optional[PreviousBook] = None
+    # 原文件与上次处理时一致，无需处理（不保留临时文件）
+    skipped: bool = False
+
+    def discard(self):
+        """删除下载的临时文件"""
+        if self.source_path:
+            os.unlink(self.source_path)
+            self.source_path = None
+
+def slice_text_into_chunks(text: str, chunker: Optional[Chunker] = None) -> List[Chunk]:
+    """将文本切片为块"""
+    chunker = chunker or get_chunker()
+    return [
+        Chunk(id=f"chunk_{chunk_id:06d}", start=start, end=end, text=chunk_text)
+        for chunk_id, (start, end, chunk_text) in enumerate(chunker.split(text))
+    ]
+
+def chapter_hash(text: str, chapter: Chapter) -> str:
+    """章节内容哈希（含标题，标题变化也需要更新分块）"""
+    digest = hashlib.sha256((chapter.title or "").encode("utf-8") + b"\0")
+    digest.update(text[chapter.start:chapter.end].encode("utf-8"))
+    return digest.hexdigest()
+
+def slice_chapters_into_chunks(text: str, chapters: List[Chapter], previous: Optional[PreviousBook] = None
+                               ) -> Tuple[List[Chunk], List[Dict[str, Any]], List[int]]:
+    """按章节分别切片（分块不跨章），返回 (分块, 目录, 复用来源)
+
+    目录记录每章的内容哈希、偏移区间与分块序号区间。提供上次结果时，
+    内容哈希未变的章节直接复用旧分块（保留id，只平移偏移），复用来源为旧分块序号，新切出的分块为-1。
+    """
+    old_by_hash: Dict[str, List[Dict[str, Any]]] = {}
+    next_id = 0
+    if previous is not None:
+        for entry in previous.manifest.get("chapters", []):
+            old_by_hash.setdefault(entry["hash"], []).append(entry)
+        old_store = ChunkStore.from_bytes(previous.chunks_data)
+        next_id = int(old_store.ids.max()) + 1 if len(old_store) else 0
+
+    chunks: List[Chunk] = []
+    reused: List[int] = []
+    toc = []
+    for chapter in chapters:
+        first = len(chunks)
+        digest = chapter_hash(text, chapter)
+        candidates = old_by_hash.get(digest)
+        if candidates:
+            old = candidates.pop(0)
+            shift = chapter.start - old["start"]
+            # 内容未变，只需按偏移表从新文本中取出分块，不必解码旧文件的正文
+            for ordinal in range(*old["chunks"]):
+                start = int(old_store.starts[ordinal]) + shift
+                end = int(old_store.ends[ordinal]) + shift
+                chunk_id = f"chunk_{int(old_store.ids[ordinal]):06d}"
+                chunks.append(Chunk(chunk_id, start, end, text[start:end].strip(), chapter.title))
+                reused.append(ordinal)
+        else:
+            for chunk in slice_text_into_chunks(text[chapter.start:chapter.end]):
+                chunk.id = f"chunk_{next_id:06d}"
+                next_id += 1
+                chunk.start += chapter.start
+                chunk.end += chapter.start
+                chunk.title = chapter.title
+                chunks.append(chunk)
+                reused.append(-1)
+        entry = chapter.to_dict()
+        entry["chunks"] = [first, len(chunks)]
+        entry["hash"] = digest
+        toc.append(entry)
+    return chunks, toc, reused
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    """计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _reusable_indexes(previous: Optional[PreviousBook]) -> Optional[Tuple[KeywordIndex, VectorIndex]]:
+    """上次结果的切片规则、分词器与嵌入提供者都与当前一致时才能复用，否则返回None"""
+    if previous is None or previous.manifest.get("chunker") != get_chunker().signature:
+        return None
+    try:
+        index = KeywordIndex.from_bytes(previous.index_data)
+        vector_index = VectorIndex.from_bytes(previous.vectors_data)
+    except Exception:
+        return None
+    provider = get_embedding_provider()
+    chunk_count = previous.manifest.get("chunks")
+    if (index.tokenizer.name != get_tokenizer().name or index.doc_count != chunk_count
+            or vector_index.signature != provider.signature or vector_index.doc_count != chunk_count):
+        return None
+    return index, vector_index
+
+def _write_temp_file(write_to: Callable[[BinaryIO], None], prefix: str) -> str:
+    """把序列化结果写入临时文件，返回文件路径"""
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=".bin")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_to(f)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+def build_book_artifacts(source_path: str, file_type: str,
+                         previous: Optional[PreviousBook] = None) -> Optional[BookArtifacts]:
+    """抽取文本、切片、生成摘要并构建索引（纯计算，可在进程池中执行）；无文本时返回None
+
+    提供上次结果时只对内容变化的章节重新切片、分词与计算嵌入。
+    """
+    # 流式抽取：一次只解压、解析一个内容文件，内存占用与原文件大小无关
+    with open(source_path, "rb") as f:
+        book_text, chapters = extract_book(f, file_type)
+    if not book_text:
+        return None
+    
+    reusable = _reusable_indexes(previous)
+    chunks, toc, reused = slice_chapters_into_chunks(book_text, chapters, previous if reusable else None)
+    
+    # 生成简单摘要（取前500字符）
+    summary = book_text[:500] + "..." if len(book_text) > 500 else book_text
+    
+    # 构建关键词索引与向量索引
+    texts = [chunk.text for chunk in chunks]
+    reused_chunks = sum(1 for ordinal in reused if ordinal >= 0)
+    if reusable and reused_chunks:
+        index = KeywordIndex.update(reusable[0], reused, texts)
+        vector_index = VectorIndex.update(reusable[1], reused, texts)
+    else:
+        index = KeywordIndex.build(texts)
+        vector_index = VectorIndex.build(texts)
+    chapter_manifest = [
+        {"hash": entry.pop("hash"), "start": entry["start"], "end": entry["end"], "chunks": entry["chunks"]}
+        for entry in toc
+    ]
+    # 结果写入临时文件，只把路径传回调用方，上传时流式读取
+    artifacts = BookArtifacts(
+        chunks_path="",
+        chunk_count=len(chunks),
+        summary=summary,
+        index_path="",
+        vectors_path="",
+        toc=toc,
+        source_hash=file_sha256(source_path),
+        source_bytes=os.path.getsize(source_path),
+        chapters=chapter_manifest,
+        reused_chunks=reused_chunks,
+    )
+    try:
+        artifacts.chunks_path = _write_temp_file(ChunkStore.build(chunks, book_text).write_to, "chunks_")
+        artifacts.index_path = _write_temp_file(index.write_to, "index_")
+        artifacts.vectors_path = _write_temp_file(vector_index.write_to, "vectors_")
+    except BaseException:
+        artifacts.discard()
+        raise
+    return artifacts
+
+def _parse_stream_line(line: str) -> Optional[str]:
+    """解析SSE流中的一行，返回增量文本；流结束时返回None"""
+    if not line or not line.startswith("data:"):
+        return ""
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return None
+    try:
+        choice = json.loads(data)["choices"][0]
+    except (ValueError, KeyError, IndexError):
+        return ""
+    return (choice.get("delta") or {}).get("content") or ""
+
+def _chat_payload(prompt: str, model: str, max_tokens: int, temperature: float, top_p: float,
+                  top_k: int, stream: bool = False) -> Dict[str, Any]:
+    """构建chat-completions请求体"""
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "top_p": top_p,
+        "top_k": top_k
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+async def _aiter(items: List[str]) -> AsyncIterator[str]:
+    """把列表包装成异步迭代器"""
+    for item in items:
+        yield item
 
 class ECNUClient:
     def __init__(self, api_key: str = None, base_url: str = "https://chat.ecnu.edu.cn/open/api/v1"):
@@ -28,14 +279,7 @@ class ECNUClient:
             return "ECNU API密钥未配置，返回模拟响应。请设置ECNU_API_KEY环境变量。"
         
         url = f"{self.base_url}/chat/completions"
-        payload = {
-            "model": model,
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "top_p": top_p,
-            "top_k": top_k
-        }
+        payload = _chat_payload(prompt, model, max_tokens, temperature, top_p, top_k)
         
         for i in range(retries):
             try:
@@ -52,83 +296,373 @@ class ECNUClient:
         return ""
 
     def get_embedding(self, text: str, model: str = "ecnu-embedding-small") -> List[float]:
-        """简化版嵌入生成（实际项目应使用真实API）"""
-        # 模拟嵌入向量（768维）
-        return [hash(text + str(i)) % 100 / 100.0 for i in range(768)]
+        """嵌入生成（使用本地可插拔的嵌入提供者）"""
+        return get_embedding_provider().embed([text])[0].tolist()
 
-    def generate_tts(self, text: str, model: str = "ecnu-tts") -> bytes:
-        """模拟TTS生成"""
+    def generate_tts(self, text: str, model: str = "ecnu-tts") -> Iterator[bytes]:
+        """模拟TTS生成，逐段产出音频数据"""
         # 实际项目应调用真实TTS API
-        return f"模拟音频数据: {text[:100]}".encode()
+        yield f"模拟音频数据: {text[:100]}".encode()
 
     def generate_image(self, prompt: str, model: str = "ecnu-image", n: int = 1) -> List[str]:
         """模拟图像生成"""
         return [f"模拟图片URL: {prompt[:50]}"]
 
+class AsyncECNUClient:
+    """异步LLM客户端：共享连接池（keep-alive，可用时启用HTTP/2），按主机限制并发"""
+
+    def __init__(self, api_key: str = None, base_url: str = "https://chat.ecnu.edu.cn/open/api/v1",
+                 max_concurrency_per_host: int = LLM_MAX_CONCURRENCY_PER_HOST):
+        self.api_key = api_key or os.getenv("ECNU_API_KEY", "")
+        self.base_url = base_url
+        self.headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"} if self.api_key else {}
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        if not _HTTPX_AVAILABLE:
+            raise RuntimeError("后端未安装 httpx 依赖包")
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=_HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = httpx.URL(url).host
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_concurrency_per_host)
+        return self._host_limits[host]
+
+    async def generate(self, prompt: str, model: str = "educhat-r1", max_tokens: int = 500,
+                       temperature: float = 0.7, top_p: float = 0.8, top_k: int = 20, retries: int = 3) -> str:
+        if not self.api_key:
+            return "ECNU API密钥未配置，返回模拟响应。请设置ECNU_API_KEY环境变量。"
+        
+        url = f"{self.base_url}/chat/completions"
+        payload = _chat_payload(prompt, model, max_tokens, temperature, top_p, top_k)
+        
+        for i in range(retries):
+            try:
+                async with self._host_limit(url):
+                    response = await self._get_client().post(url, headers=self.headers, json=payload)
+                if response.status_code == 429:
+                    await asyncio.sleep(2 ** i)  # 指数退避
+                    continue
+                response.raise_for_status()
+                result = response.json()
+                return result["choices"][0]["message"]["content"]
+            except Exception as e:
+                if i == retries - 1:
+                    return f"API调用失败: {str(e)}"
+        return ""
+
+    async def generate_stream(self, prompt: str, model: str = "educhat-r1", max_tokens: int = 500,
+                              temperature: float = 0.7, top_p: float = 0.8,
+                              top_k: int = 20) -> AsyncIterator[str]:
+        """流式生成，逐段产出增量文本"""
+        if not self.api_key:
+            yield "ECNU API密钥未配置，返回模拟响应。请设置ECNU_API_KEY环境变量。"
+            return
+        
+        url = f"{self.base_url}/chat/completions"
+        payload = _chat_payload(prompt, model, max_tokens, temperature, top_p, top_k, stream=True)
+        
+        try:
+            async with self._host_limit(url):
+                async with self._get_client().stream("POST", url, headers=self.headers, json=payload) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        delta = _parse_stream_line(line)
+                        if delta is None:
+                            break
+                        if delta:
+                            yield delta
+        except Exception as e:
+            yield f"API调用失败: {str(e)}"
+
+    async def aclose(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
 class ReadingAI:
-    def __init__(self, storage):
+    def __init__(self, storage, cache: Optional[BookCache] = None):
         self.storage = storage
         self.llm = ECNUClient()
-        self.embedding_index = {}
+        self.allm = AsyncECNUClient()
+        # 分块、索引、向量与目录共用一个字节预算
+        self.cache = cache or BookCache()
+        self.chunk_cache = self.cache.section("chunks")
+        self.keyword_index_cache = self.cache.section("keywordIndex")
+        self.vector_index_cache = self.cache.section("vectorIndex")
+        self.toc_cache = self.cache.section("toc")
+
+    def plan_ingest(self, book_id: str, file_type: str, skip_unchanged: bool = False,
+                    incremental: bool = True) -> IngestPlan:
+        """下载原文件并加载上次的处理结果，供build_book_artifacts与ingest_prepared使用
+
+        skip_unchanged为True时比对清单中的原文件指纹（先比ETag，再比内容哈希），未变化则标记为跳过；
+        incremental为False时不加载上次的结果（全量处理）。临时文件由调用方通过discard删除。
+        """
+        plan = IngestPlan(book_id, file_type)
+        key = f"books/{book_id}.{file_type}"
+        manifest = self._load_manifest(book_id) if skip_unchanged else None
+        if manifest and manifest.get("sourceKey") != key:
+            manifest = None
+        if manifest:
+            etag = self._object_version(key)
+            if etag is not None and etag == manifest.get("sourceEtag"):
+                plan.skipped = True
+                return plan
+
+        plan.source_path, plan.source_etag = self._download_book_source(book_id, file_type)
+        try:
+            plan.source_bytes = os.path.getsize(plan.source_path)
+            if manifest:
+                plan.source_hash = file_sha256(plan.source_path)
+                # ETag因上传方式不同可能变化，内容哈希一致时同样跳过
+                if manifest.get("sourceSha256") == plan.source_hash:
+                    manifest["sourceEtag"] = plan.source_etag
+                    self._save_manifest(book_id, manifest)
+                    plan.skipped = True
+                    plan.discard()
+                    return plan
+            if incremental:
+                plan.previous = self._load_previous_book(book_id, file_type)
+        except BaseException:
+            plan.discard()
+            raise
+        return plan
+
+    def ingest_prepared(self, plan: IngestPlan, artifacts: Optional[BookArtifacts]) -> Dict[str, Any]:
+        """上传build_book_artifacts的结果并返回处理结果；artifacts为None表示没有可用文本"""
+        if artifacts is None:
+            return {"status": "error", "message": "无法下载或解析书籍文本"}
+        try:
+            artifacts.source_etag = plan.source_etag
+            self._store_book_artifacts(plan.book_id, plan.file_type, artifacts)
+        finally:
+            artifacts.discard()
+        return {"status": "success", "chunk_count": artifacts.chunk_count,
+                "reused_chunks": artifacts.reused_chunks}
 
     def ingest_book(self, book_id: str, file_type: str) -> Dict[str, Any]:
-        """处理书籍，生成切片和索引"""
+        """处理书籍，生成切片和索引（只重新处理内容变化的章节）"""
+        plan = None
         try:
-            book_text = self._download_book_text(book_id, file_type)
-            if not book_text:
-                return {"status": "error", "message": "无法下载或解析书籍文本"}
-            
-            chunks = self._slice_text_into_chunks(book_text)
-            chunks_file_key = f"books/{book_id}/chunks.jsonl"
-            self._save_chunks(chunks, chunks_file_key)
+            plan = self.plan_ingest(book_id, file_type)
+            artifacts = build_book_artifacts(plan.source_path, file_type, plan.previous)
+            return self.ingest_prepared(plan, artifacts)
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+        finally:
+            if plan is not None:
+                plan.discard()
+
+    async def aingest_book(self, book_id: str, file_type: str,
+                           progress: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """处理书籍：存储读写放入I/O线程池，抽取、切片与建索引放入进程池
+
+        progress用于向调用方实时报告阶段、已下载字节数、切片数与各阶段耗时。
+        异常不在这里转换为错误结果，由调用方（任务队列）判断是否值得重试。
+        """
+        progress = progress if progress is not None else {}
+        stage_timings = progress.setdefault("stageTimings", {})
+        plan = artifacts = None
+        try:
+            progress["stage"] = "download"
+            started = time.perf_counter()
+            plan = await io_pool.run(self.plan_ingest, book_id, file_type)
+            stage_timings["downloadMs"] = round((time.perf_counter() - started) * 1000, 2)
+            progress["bytesDownloaded"] = plan.source_bytes
             
-            # 生成简单摘要（取前500字符）
-            summary = book_text[:500] + "..." if len(book_text) > 500 else book_text
-            self.storage.upload_text(f"books/{book_id}/summary.txt", summary)
+            progress["stage"] = "process"
+            started = time.perf_counter()
+            artifacts = await cpu_pool.run(build_book_artifacts, plan.source_path, file_type, plan.previous)
+            stage_timings["processMs"] = round((time.perf_counter() - started) * 1000, 2)
+            if artifacts is None:
+                return self.ingest_prepared(plan, artifacts)
+            progress["chunks"] = artifacts.chunk_count
+            progress["reusedChunks"] = artifacts.reused_chunks
             
-            # 构建简单的关键词索引
-            self._build_keyword_index(book_id, chunks)
+            progress["stage"] = "upload"
+            started = time.perf_counter()
+            result = await io_pool.run(self.ingest_prepared, plan, artifacts)
+            stage_timings["uploadMs"] = round((time.perf_counter() - started) * 1000, 2)
             
-            return {"status": "success", "chunk_count": len(chunks)}
+            progress["stage"] = "done"
+            return result
+        finally:
+            if plan is not None:
+                plan.discard()
+            if artifacts is not None:
+                artifacts.discard()
+
+    def _store_book_artifacts(self, book_id: str, file_type: str, artifacts: BookArtifacts):
+        """上传切片、摘要与索引，并刷新进程内缓存；清单最后写入，作为处理完成的标记"""
+        self._save_chunks(book_id, artifacts.chunks_path)
+        self._save_toc(book_id, artifacts.toc)
+        self.storage.upload_text(f"books/{book_id}/summary.txt", artifacts.summary)
+        self._save_keyword_index(book_id, artifacts.index_path)
+        self._save_vector_index(book_id, artifacts.vectors_path)
+        self._save_manifest(book_id, {
+            "bookId": book_id,
+            "sourceKey": f"books/{book_id}.{file_type}",
+            "sourceEtag": artifacts.source_etag,
+            "sourceSha256": artifacts.source_hash,
+            "sourceBytes": artifacts.source_bytes,
+            "chunks": artifacts.chunk_count,
+            "chunker": get_chunker().signature,
+            "chapters": artifacts.chapters,
+            "ingestedAt": time.time(),
+        })
+
+    def _save_manifest(self, book_id: str, manifest: Dict[str, Any]):
+        """保存处理清单（原文件指纹等），用于判断原文件是否需要重新处理"""
+        self.storage.upload_text(f"books/{book_id}/manifest.json", json.dumps(manifest, ensure_ascii=False))
+
+    def _load_previous_book(self, book_id: str, file_type: str) -> Optional[PreviousBook]:
+        """加载上次处理的分块与索引；没有可用的清单或数据不完整时返回None（全量处理）"""
+        manifest = self._load_manifest(book_id)
+        if not manifest or manifest.get("sourceKey") != f"books/{book_id}.{file_type}":
+            return None
+        if not isinstance(manifest.get("chapters"), list):
+            return None
+        try:
+            chunks_data = self.storage.download_bytes(f"books/{book_id}/chunks.bin")
+            if len(ChunkStore.from_bytes(chunks_data)) != manifest.get("chunks"):
+                return None
+            return PreviousBook(
+                manifest=manifest,
+                chunks_data=chunks_data,
+                index_data=self.storage.download_bytes(f"books/{book_id}/index.bin"),
+                vectors_data=self.storage.download_bytes(f"books/{book_id}/vectors.bin"),
+            )
         except Exception as e:
-            return {"status": "error", "message": str(e)}
+            print(f"加载上次处理结果失败: {e}")
+            return None
+
+    def _load_manifest(self, book_id: str) -> Optional[Dict[str, Any]]:
+        """加载处理清单，尚未处理过时返回None"""
+        try:
+            return json.loads(self.storage.download_text(f"books/{book_id}/manifest.json"))
+        except Exception:
+            return None
 
     def query_with_context(self, book_id: str, question: str, position: int, 
                            selected_text: str = "", include_after: bool = False, 
-                           companion_mode: bool = True) -> Dict[str, Any]:
+                           companion_mode: bool = True, chapter_index: Optional[int] = None) -> Dict[str, Any]:
         """根据上下文回答问题"""
         try:
-            chunks = self._load_chunks(book_id)
-            if not chunks:
+            started = time.perf_counter()
+            prompt, selected_chunks, timings = self._prepare_question(
+                book_id, question, position, selected_text, include_after, companion_mode, chapter_index)
+            if prompt is None:
                 return {"answer": "未找到书籍分块数据", "citations": []}
             
-            candidate_chunks = self._select_candidate_chunks(chunks, position, companion_mode)
-            if not include_after:
-                candidate_chunks = [c for c in candidate_chunks if c.end <= position]
-            
-            selected_chunks = self._select_relevant_chunks(book_id, candidate_chunks, question)
-            context = self._build_context_text(selected_chunks)
-            
-            prompt = self._build_question_prompt(selected_text, context, question)
+            llm_started = time.perf_counter()
             answer = self.llm.generate(prompt, model=os.getenv("ECNU_MODEL_PRO", "educhat-r1"))
+            timings["llmMs"] = (time.perf_counter() - llm_started) * 1000
+            timings["totalMs"] = (time.perf_counter() - started) * 1000
             
-            citations = [
-                {
-                    "chunkId": c.id, 
-                    "text": c.text[:200] + "..." if len(c.text) > 200 else c.text, 
-                    "range": [c.start, c.end]
-                } for c in selected_chunks
-            ]
+            return {
+                "answer": answer, 
+                "citations": self._build_citations(selected_chunks), 
+                "model": os.getenv("ECNU_MODEL_PRO", "educhat-r1"), 
+                "usedCompanionMode": companion_mode,
+                "timings": {stage: round(ms, 2) for stage, ms in timings.items()}
+            }
+        except Exception as e:
+            return {"answer": f"查询失败: {str(e)}", "citations": []}
+
+    async def aquery_with_context(self, book_id: str, question: str, position: int,
+                                  selected_text: str = "", include_after: bool = False,
+                                  companion_mode: bool = True, chapter_index: Optional[int] = None) -> Dict[str, Any]:
+        """根据上下文回答问题（异步LLM调用）"""
+        try:
+            started = time.perf_counter()
+            prompt, selected_chunks, timings = await io_pool.run(
+                self._prepare_question, book_id, question, position, selected_text, include_after,
+                companion_mode, chapter_index)
+            if prompt is None:
+                return {"answer": "未找到书籍分块数据", "citations": []}
+            
+            llm_started = time.perf_counter()
+            answer = await self.allm.generate(prompt, model=os.getenv("ECNU_MODEL_PRO", "educhat-r1"))
+            timings["llmMs"] = (time.perf_counter() - llm_started) * 1000
+            timings["totalMs"] = (time.perf_counter() - started) * 1000
             
             return {
                 "answer": answer, 
-                "citations": citations, 
+                "citations": self._build_citations(selected_chunks), 
                 "model": os.getenv("ECNU_MODEL_PRO", "educhat-r1"), 
-                "usedCompanionMode": companion_mode
+                "usedCompanionMode": companion_mode,
+                "timings": {stage: round(ms, 2) for stage, ms in timings.items()}
             }
+        except PoolBusyError:
+            raise
         except Exception as e:
             return {"answer": f"查询失败: {str(e)}", "citations": []}
 
+    async def aquery_with_context_stream(self, book_id: str, question: str, position: int,
+                                         selected_text: str = "", include_after: bool = False,
+                                         companion_mode: bool = True, chapter_index: Optional[int] = None
+                                         ) -> Tuple[Dict[str, Any], AsyncIterator[str]]:
+        """流式问答（异步LLM调用）"""
+        prompt, selected_chunks, timings = await io_pool.run(
+            self._prepare_question, book_id, question, position, selected_text, include_after,
+            companion_mode, chapter_index)
+        if prompt is None:
+            return {"citations": []}, _aiter(["未找到书籍分块数据"])
+        
+        meta = {
+            "citations": self._build_citations(selected_chunks),
+            "model": os.getenv("ECNU_MODEL_PRO", "educhat-r1"),
+            "usedCompanionMode": companion_mode,
+            "timings": {stage: round(ms, 2) for stage, ms in timings.items()}
+        }
+        return meta, self.allm.generate_stream(prompt, model=os.getenv("ECNU_MODEL_PRO", "educhat-r1"))
+
+    def _prepare_question(self, book_id: str, question: str, position: int, selected_text: str,
+                          include_after: bool, companion_mode: bool, chapter_index: Optional[int] = None
+                          ) -> Tuple[Optional[str], List[Chunk], Dict[str, float]]:
+        """检索上下文并构建问答提示词，无分块数据时提示词为None；指定章节时只在该章内检索"""
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        chunks = self._load_chunks(book_id)
+        timings["loadChunksMs"] = (time.perf_counter() - started) * 1000
+        if not chunks:
+            return None, [], timings
+        
+        start, limit = self._select_candidate_window(chunks, position, companion_mode or not include_after)
+        if chapter_index is not None:
+            chapter_start, chapter_limit = self._chapter_chunk_window(book_id, chapter_index, len(chunks))
+            start, limit = max(start, chapter_start), min(limit, chapter_limit)
+        
+        selected_chunks = self._select_relevant_chunks(book_id, chunks, start, limit, question, position,
+                                                       timings=timings)
+        context = self._build_context_text(selected_chunks)
+        return self._build_question_prompt(selected_text, context, question), selected_chunks, timings
+
+    def _build_citations(self, selected_chunks: List[Chunk]) -> List[Dict[str, Any]]:
+        """构建引用列表"""
+        return [
+            {
+                "chunkId": c.id, 
+                "text": c.text[:200] + "..." if len(c.text) > 200 else c.text, 
+                "range": [c.start, c.end],
+                "chapter": c.title
+            } for c in selected_chunks
+        ]
+
     def _build_question_prompt(self, selected_text: str, context: str, question: str) -> str:
         """构建问答提示词"""
         base_prompt = """你是一本中文书籍的AI阅读助手。请严格基于提供的文本内容回答问题，避免臆造信息。如果信息不足请明确说明。"""
@@ -142,55 +676,95 @@ class ReadingAI:
         
         return base_prompt
 
-    def _build_keyword_index(self, book_id: str, chunks: List[Chunk]):
-        """构建简单的关键词索引（替代向量索引）"""
-        keyword_index = {}
-        for chunk in chunks:
-            words = re.findall(r'[\w\u4e00-\u9fff]+', chunk.text.lower())
-            for word in set(words):
-                if len(word) > 1:  # 过滤单字
-                    if word not in keyword_index:
-                        keyword_index[word] = []
-                    keyword_index[word].append(chunk.id)
-        self.embedding_index[book_id] = keyword_index
-
-    def _select_relevant_chunks(self, book_id: str, candidate_chunks: List[Chunk], 
-                               question: str, max_chunks: int = 4) -> List[Chunk]:
-        """基于关键词匹配选择相关分块"""
-        if book_id not in self.embedding_index:
-            return candidate_chunks[:max_chunks]
-        
-        # 简单的关键词匹配评分
-        question_words = set(re.findall(r'[\w\u4e00-\u9fff]+', question.lower()))
-        scored_chunks = []
+    def _save_keyword_index(self, book_id: str, path: str):
+        """持久化BM25倒排索引到对象存储"""
+        self._upload_file(f"books/{book_id}/index.bin", path)
+        self.keyword_index_cache.invalidate(book_id)
+
+    def _load_keyword_index(self, book_id: str) -> Optional[KeywordIndex]:
+        """按需加载书籍的BM25索引（首次查询时从对象存储读取）"""
+        index_key = f"books/{book_id}/index.bin"
+        version = self._object_version(index_key)
+        index = self.keyword_index_cache.get(book_id, version)
+        if index is not None:
+            return index
+        try:
+            data = self._map_object(index_key)
+            index = KeywordIndex.from_bytes(data)
+        except Exception as e:
+            print(f"加载索引失败: {e}")
+            return None
+        self.keyword_index_cache.put(book_id, version, index, len(data))
+        return index
+
+    def _save_vector_index(self, book_id: str, path: str):
+        """持久化分块嵌入矩阵到对象存储"""
+        self._upload_file(f"books/{book_id}/vectors.bin", path)
+        self.vector_index_cache.invalidate(book_id)
+
+    def _load_vector_index(self, book_id: str) -> Optional[VectorIndex]:
+        """按需加载书籍的向量索引"""
+        vectors_key = f"books/{book_id}/vectors.bin"
+        version = self._object_version(vectors_key)
+        index = self.vector_index_cache.get(book_id, version)
+        if index is not None:
+            return index
+        try:
+            data = self._map_object(vectors_key)
+            index = VectorIndex.from_bytes(data)
+        except Exception as e:
+            print(f"加载向量索引失败: {e}")
+            return None
+        if index.signature is not None and index.signature != index.provider.signature:
+            # 查询向量与书中向量的分词器或维度不同，内积没有意义，只用关键词检索
+            print(f"向量索引与当前嵌入规则不一致，已忽略: {index.signature} != {index.provider.signature}")
+            return None
+        self.vector_index_cache.put(book_id, version, index, index.nbytes)
+        return index
+
+    def _select_relevant_chunks(self, book_id: str, chunks: ChunkStore, start: int, limit: int,
+                               question: str, position: int, max_chunks: int = 4,
+                               timings: Optional[Dict[str, float]] = None) -> List[Chunk]:
+        """混合检索：在分块序号区间[start, limit)内做BM25与向量结果的倒数排名融合，并叠加阅读位置先验"""
+        timings = timings if timings is not None else {}
+        if limit <= start:
+            return []
         
-        for chunk in candidate_chunks:
-            chunk_words = set(re.findall(r'[\w\u4e00-\u9fff]+', chunk.text.lower()))
-            score = len(question_words.intersection(chunk_words))
-            if score > 0:
-                scored_chunks.append((score, chunk))
+        started = time.perf_counter()
+        lexical = []
+        index = self._load_keyword_index(book_id)
+        if index is not None and index.doc_count >= limit:
+            lexical = index.search(question, limit=limit, top_k=HYBRID_DEPTH, start=start)
+        timings["lexicalMs"] = (time.perf_counter() - started) * 1000
         
-        # 按评分排序并返回前max_chunks个
-        scored_chunks.sort(key=lambda x: x[0], reverse=True)
-        result_chunks = [chunk for score, chunk in scored_chunks[:max_chunks]]
+        started = time.perf_counter()
+        semantic = []
+        vector_index = self._load_vector_index(book_id)
+        if vector_index is not None and vector_index.doc_count >= limit:
+            semantic = vector_index.search(question, limit=limit, top_k=HYBRID_DEPTH, start=start)
+        timings["semanticMs"] = (time.perf_counter() - started) * 1000
         
-        # 如果匹配结果不足，补充位置相近的块
-        if len(result_chunks) < max_chunks and candidate_chunks:
-            remaining_slots = max_chunks - len(result_chunks)
-            used_ids = {chunk.id for chunk in result_chunks}
-            for chunk in candidate_chunks:
-                if chunk.id not in used_ids and len(result_chunks) < max_chunks:
-                    result_chunks.append(chunk)
+        started = time.perf_counter()
+        # 阅读位置附近的块始终参与排序
+        anchor = chunks.count_ending_by(position, start, limit)
+        nearby = range(max(start, anchor - max_chunks), min(limit, anchor + 1))
+        ranked = fuse(lexical, semantic, nearby, chunks.ends, position, top_k=max_chunks)
+        timings["fusionMs"] = (time.perf_counter() - started) * 1000
         
-        return result_chunks
+        return chunks.take([doc_id for doc_id, score in ranked])
 
-    def generate_chapter_media(self, book_id: str, chapter_text: str, chapter_id: str) -> Dict[str, str]:
-        """生成章节媒体文件（音频和视频）"""
+    def generate_chapter_media(self, book_id: str, chapter_text: str, chapter_id: str,
+                               chapter_index: Optional[int] = None) -> Dict[str, str]:
+        """生成章节媒体文件（音频和视频）；未提供章节文本时按目录从分块中取出"""
         try:
+            if not chapter_text and chapter_index is not None:
+                chapter_text = self._get_chapter_text(book_id, chapter_index, max_chars=1000)
+            if not chapter_text:
+                raise ValueError("章节内容为空")
+            
             # 生成音频
-            audio_bytes = self.llm.generate_tts(chapter_text[:1000])
             audio_key = f"books/{book_id}/audio/{chapter_id}.mp3"
-            self.storage.upload_bytes(audio_key, audio_bytes)
+            self.storage.upload_stream(audio_key, self.llm.generate_tts(chapter_text[:1000]), content_type="audio/mpeg")
             audio_url = self.storage.get_presign_url(audio_key)
             
             # 视频生成（待实现）
@@ -209,14 +783,41 @@ class ReadingAI:
                 "message": str(e)
             }
 
+    async def agenerate_chapter_media(self, book_id: str, chapter_text: str, chapter_id: str,
+                                      chapter_index: Optional[int] = None) -> Dict[str, str]:
+        """生成章节媒体文件（在I/O线程池中执行）"""
+        return await io_pool.run(self.generate_chapter_media, book_id, chapter_text, chapter_id, chapter_index)
+
     def character_dialogue(self, book_id: str, character: str, user_input: str, position: int) -> str:
         """与书中人物对话，仅基于已读内容"""
         try:
-            chunks = self._load_chunks(book_id)
-            read_chunks = [c for c in chunks if c.end <= position]
-            character_context = self._extract_character_context(read_chunks, character)
-            
-            prompt = f"""你是《{book_id}》中的{character}。
+            prompt = self._build_character_prompt(book_id, character, user_input, position)
+            return self.llm.generate(prompt, model=os.getenv("ECNU_MODEL_PRO", "educhat-r1"))
+        except Exception as e:
+            return f"人物对话失败: {str(e)}"
+
+    async def acharacter_dialogue(self, book_id: str, character: str, user_input: str, position: int) -> str:
+        """与书中人物对话（异步LLM调用）"""
+        try:
+            prompt = await io_pool.run(self._build_character_prompt, book_id, character, user_input, position)
+            return await self.allm.generate(prompt, model=os.getenv("ECNU_MODEL_PRO", "educhat-r1"))
+        except PoolBusyError:
+            raise
+        except Exception as e:
+            return f"人物对话失败: {str(e)}"
+
+    async def acharacter_dialogue_stream(self, book_id: str, character: str, user_input: str,
+                                         position: int) -> AsyncIterator[str]:
+        """流式人物对话（异步LLM调用）"""
+        prompt = await io_pool.run(self._build_character_prompt, book_id, character, user_input, position)
+        return self.allm.generate_stream(prompt, model=os.getenv("ECNU_MODEL_PRO", "educhat-r1"))
+
+    def _build_character_prompt(self, book_id: str, character: str, user_input: str, position: int) -> str:
+        """构建人物对话提示词"""
+        chunks = self._load_chunks(book_id)
+        character_context = self._extract_character_context(chunks, character, chunks.count_ending_by(position))
+        
+        return f"""你是《{book_id}》中的{character}。
 
 当前情节背景：
 {character_context}
@@ -224,157 +825,263 @@ class ReadingAI:
 读者问：{user_input}
 
 请以{character}的身份、性格和语气回答，保持角色一致性："""
-            
-            return self.llm.generate(prompt, model=os.getenv("ECNU_MODEL_PRO", "educhat-r1"))
-        except Exception as e:
-            return f"人物对话失败: {str(e)}"
 
     def analyze_stay_time(self, book_id: str, stay_records: Dict[int, float]) -> Dict[str, Any]:
         """分析用户在书中停留时间最长的部分"""
         if not stay_records:
             return {"message": "无停留记录"}
         
-        # 找到停留时间最长的位置
+        result, prompt = self._prepare_stay_analysis(book_id, stay_records)
+        result["analysis"] = self.llm.generate(prompt) if prompt else "无法获取该位置的文本内容"
+        return result
+
+    async def aanalyze_stay_time(self, book_id: str, stay_records: Dict[int, float]) -> Dict[str, Any]:
+        """分析用户在书中停留时间最长的部分（异步LLM调用）"""
+        if not stay_records:
+            return {"message": "无停留记录"}
+        
+        result, prompt = await io_pool.run(self._prepare_stay_analysis, book_id, stay_records)
+        result["analysis"] = await self.allm.generate(prompt) if prompt else "无法获取该位置的文本内容"
+        return result
+
+    def _prepare_stay_analysis(self, book_id: str, stay_records: Dict[int, float]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """找到停留最久的位置，返回结果骨架与分析提示词（无文本时为None）"""
         longest_pos, duration = max(stay_records.items(), key=lambda x: x[1])
         content = self._get_text_around_position(book_id, longest_pos)
         
-        # 生成简要分析
+        prompt = None
         if content:
-            analysis_prompt = f"""用户在第{longest_pos}位置停留了{duration}秒，阅读了以下内容：
+            prompt = f"""用户在第{longest_pos}位置停留了{duration}秒，阅读了以下内容：
 {content}
 
 请简要分析用户可能对这部分内容感兴趣的原因："""
-            analysis = self.llm.generate(analysis_prompt)
-        else:
-            analysis = "无法获取该位置的文本内容"
         
         return {
             "position": longest_pos, 
             "duration": duration, 
             "content_preview": content[:200] + "..." if len(content) > 200 else content,
-            "analysis": analysis
+        }, prompt
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存等运行统计"""
+        return {
+            "bookCache": self.cache.stats(),
+            "chunkCache": self.chunk_cache.stats(),
+            "keywordIndexCache": self.keyword_index_cache.stats(),
+            "vectorIndexCache": self.vector_index_cache.stats(),
+            "tocCache": self.toc_cache.stats(),
+            "executors": executor_stats(),
+            "storage": self.storage.stats() if hasattr(self.storage, "stats") else None,
         }
 
     def external_dialogue(self, imported_content: str, user_input: str) -> str:
         """基于导入内容的外部对话"""
-        prompt = f"""基于以下内容回答问题：
+        return self.llm.generate(self._build_external_prompt(imported_content, user_input))
+
+    async def aexternal_dialogue(self, imported_content: str, user_input: str) -> str:
+        """基于导入内容的外部对话（异步LLM调用）"""
+        return await self.allm.generate(self._build_external_prompt(imported_content, user_input))
+
+    def _build_external_prompt(self, imported_content: str, user_input: str) -> str:
+        """构建外部对话提示词"""
+        return f"""基于以下内容回答问题：
 
 {imported_content}
 
 问题：{user_input}
 
 请提供准确、相关的回答："""
-        
-        return self.llm.generate(prompt)
 
     def analyze_interest(self, book_id: str, stay_records: Dict[int, float]) -> List[str]:
         """根据停留记录分析用户兴趣并给出推荐"""
+        interested_contents, message = self._collect_interest_contents(book_id, stay_records)
+        if message:
+            return [message]
+        
+        topics = self.llm.generate(self._build_topics_prompt(interested_contents))
+        recommendations = self.llm.generate(self._build_recommendation_prompt(topics))
+        return self._format_recommendations(recommendations)
+
+    async def aanalyze_interest(self, book_id: str, stay_records: Dict[int, float]) -> List[str]:
+        """根据停留记录分析用户兴趣并给出推荐（异步LLM调用）"""
+        interested_contents, message = await io_pool.run(self._collect_interest_contents, book_id, stay_records)
+        if message:
+            return [message]
+        
+        topics = await self.allm.generate(self._build_topics_prompt(interested_contents))
+        recommendations = await self.allm.generate(self._build_recommendation_prompt(topics))
+        return self._format_recommendations(recommendations)
+
+    def _collect_interest_contents(self, book_id: str, stay_records: Dict[int, float]) -> Tuple[List[str], Optional[str]]:
+        """收集长时间停留位置的文本片段，无法分析时返回提示信息"""
         if not stay_records:
-            return ["暂无足够的停留记录来分析兴趣"]
+            return [], "暂无足够的停留记录来分析兴趣"
         
         # 筛选有效停留记录（超过30秒）
         interested_positions = [pos for pos, dur in stay_records.items() if dur > 30]
         if len(interested_positions) < 2:
-            return ["停留记录较少，请继续阅读以获得更准确的分析"]
+            return [], "停留记录较少，请继续阅读以获得更准确的分析"
         
         # 获取感兴趣的内容片段
+        chunks = self._load_chunks(book_id)
         interested_contents = []
         for pos in interested_positions[:5]:  # 最多分析5个位置
-            content = self._get_text_around_position(book_id, pos)
+            content = self._get_text_around_position(book_id, pos, chunks)
             if content:
                 interested_contents.append(content[:300])  # 限制长度
         
         if not interested_contents:
-            return ["无法获取停留位置的文本内容"]
-        
-        # 分析兴趣主题
-        topics_prompt = f"""根据用户在这些文本片段上的长时间停留，分析用户可能感兴趣的主题：
+            return [], "无法获取停留位置的文本内容"
+        return interested_contents, None
+
+    def _build_topics_prompt(self, interested_contents: List[str]) -> str:
+        """构建兴趣主题分析提示词"""
+        return f"""根据用户在这些文本片段上的长时间停留，分析用户可能感兴趣的主题：
 
 {"；".join(interested_contents)}
 
 请列出3-5个主要兴趣主题："""
-        topics = self.llm.generate(topics_prompt)
-        
-        # 生成推荐
-        rec_prompt = f"""基于这些兴趣主题：{topics}
+
+    def _build_recommendation_prompt(self, topics: str) -> str:
+        """构建推荐提示词"""
+        return f"""基于这些兴趣主题：{topics}
 
 请给出3-5个相关的书籍或内容推荐："""
-        recommendations = self.llm.generate(rec_prompt)
-        
-        # 格式化推荐结果
+
+    def _format_recommendations(self, recommendations: str) -> List[str]:
+        """格式化推荐结果"""
         return [rec.strip() for rec in recommendations.split("\n") if rec.strip() and len(rec.strip()) > 5]
 
+    async def aclose(self):
+        """释放异步客户端的连接池"""
+        await self.allm.aclose()
+
     # ========== 辅助方法 ==========
 
-    def _download_book_text(self, book_id: str, file_type: str) -> str:
-        """下载书籍文本内容"""
+    def _download_book_source(self, book_id: str, file_type: str) -> Tuple[str, Optional[str]]:
+        """下载书籍原文件到临时文件，返回 (文件路径, 下载前的ETag)；文件由调用方删除"""
         book_key = f"books/{book_id}.{file_type}"
-        return self.storage.download_text(book_key)
+        etag = self._object_version(book_key)
+        fd, path = tempfile.mkstemp(prefix="book_", suffix=f".{file_type}")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                # 支持流式读取的存储逐块写入临时文件，不在内存中保留整个原文件
+                iter_bytes = getattr(self.storage, "iter_bytes", None)
+                if iter_bytes is None:
+                    f.write(self.storage.download_bytes(book_key))
+                else:
+                    for block in iter_bytes(book_key):
+                        f.write(block)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return path, etag
 
-    def _slice_text_into_chunks(self, text: str, chunk_size: int = 2000, overlap: int = 200) -> List[Chunk]:
-        """将文本切片为块"""
-        chunks = []
-        start = 0
-        chunk_id = 0
-        
-        while start < len(text):
-            end = min(start + chunk_size, len(text))
-            
-            # 尝试在句子边界分割
-            if end < len(text):
-                for boundary in ['。', '！', '？', '\n\n', '\n']:
-                    boundary_pos = text.rfind(boundary, start, end)
-                    if boundary_pos > start + chunk_size // 2:  # 确保不会切得太短
-                        end = boundary_pos + len(boundary)
-                        break
-            
-            chunk_text = text[start:end].strip()
-            if chunk_text and len(chunk_text) > 50:  # 过滤过短的块
-                chunks.append(Chunk(
-                    id=f"chunk_{chunk_id:06d}",
-                    start=start,
-                    end=end,
-                    text=chunk_text
-                ))
-                chunk_id += 1
-            
-            start = end - overlap if end - overlap > start else end
-        
-        return chunks
+    def _save_chunks(self, book_id: str, path: str):
+        """保存分块文件，并清除进程内缓存（下次读取时重新映射或按区间打开）"""
+        self._upload_file(f"books/{book_id}/chunks.bin", path)
+        self.chunk_cache.invalidate(book_id)
 
-    def _save_chunks(self, chunks: List[Chunk], chunks_file_key: str):
-        """保存分块数据"""
-        chunks_data = [
-            {
-                "id": chunk.id, 
-                "start": chunk.start, 
-                "end": chunk.end, 
-                "text": chunk.text
-            } for chunk in chunks
-        ]
-        chunks_lines = [json.dumps(chunk_data, ensure_ascii=False) for chunk_data in chunks_data]
-        self.storage.upload_text(chunks_file_key, "\n".join(chunks_lines))
+    def _upload_file(self, key: str, path: str):
+        """流式上传本地文件，超过一个分片时走分片上传"""
+        with open(path, "rb") as f:
+            self.storage.upload_stream(key, f, length=os.path.getsize(path))
 
-    def _load_chunks(self, book_id: str) -> List[Chunk]:
-        """加载分块数据"""
-        chunks_file_key = f"books/{book_id}/chunks.jsonl"
+    def _load_chunks(self, book_id: str) -> ChunkStore:
+        """加载分块（优先使用进程内缓存）；没有chunks.bin的旧数据读取chunks.jsonl"""
+        chunks_file_key = f"books/{book_id}/chunks.bin"
         try:
-            chunks_content = self.storage.download_text(chunks_file_key)
-            chunks = []
-            for line in chunks_content.splitlines():
-                if line.strip():
-                    chunk_data = json.loads(line)
-                    chunks.append(Chunk(**chunk_data))
-            return chunks
+            version = self._object_version(chunks_file_key)
+            cached = self.chunk_cache.get(book_id, version)
+            if cached is not None:
+                return cached
+            try:
+                store = self._open_chunk_store(chunks_file_key)
+            except Exception:
+                store = self._load_legacy_chunks(book_id)
+                version = None
+            self.chunk_cache.put(book_id, version, store, store.nbytes)
+            return store
         except Exception as e:
             print(f"加载分块失败: {e}")
+            return ChunkStore.build([])
+
+    def _load_legacy_chunks(self, book_id: str) -> ChunkStore:
+        """读取旧版JSONL分块文件（每行一个分块）"""
+        chunks_content = self.storage.download_text(f"books/{book_id}/chunks.jsonl")
+        chunks = [Chunk(**json.loads(line)) for line in chunks_content.splitlines() if line.strip()]
+        return ChunkStore.build(chunks)
+
+    def _open_chunk_store(self, key: str) -> ChunkStore:
+        """打开分块文件：可内存映射的存储整体映射，远程存储只读取头部与偏移表，正文按区间读取"""
+        if getattr(self.storage, "mappable", True) or not hasattr(self.storage, "download_ranges"):
+            return ChunkStore.from_bytes(self._map_object(key))
+        return ChunkStore.open(
+            lambda offset, length: self.storage.download_range(key, offset, length),
+            lambda ranges: self.storage.download_ranges(key, ranges),
+        )
+
+    def _map_object(self, key: str):
+        """读取整个对象用于零拷贝解析；存储支持时使用只读内存映射，远程存储整体下载"""
+        map_bytes = getattr(self.storage, "map_bytes", None)
+        return map_bytes(key) if map_bytes is not None else self.storage.download_bytes(key)
+
+    def _object_version(self, key: str) -> Optional[str]:
+        """获取对象版本（ETag），存储不支持时返回None"""
+        get_etag = getattr(self.storage, "get_etag", None)
+        if get_etag is None:
+            return None
+        try:
+            return get_etag(key)
+        except Exception:
+            return None
+
+    def _select_candidate_window(self, chunks: ChunkStore, position: int, read_only: bool) -> Tuple[int, int]:
+        """选择候选分块的序号区间（伴读模式或不包含后文时只选择已读内容）"""
+        if not read_only:
+            return 0, len(chunks)
+        return 0, chunks.count_ending_by(position)
+
+    def _save_toc(self, book_id: str, toc: List[Dict[str, Any]]):
+        """保存书籍目录（章节标题、字符偏移区间与分块序号区间）"""
+        toc_key = f"books/{book_id}/toc.json"
+        content = json.dumps(toc, ensure_ascii=False)
+        self.storage.upload_text(toc_key, content)
+        self.toc_cache.put(book_id, self._object_version(toc_key), toc, len(content.encode("utf-8")))
+
+    def get_toc(self, book_id: str) -> List[Dict[str, Any]]:
+        """加载书籍目录（优先使用进程内缓存），旧数据没有目录时返回空列表"""
+        toc_key = f"books/{book_id}/toc.json"
+        try:
+            version = self._object_version(toc_key)
+            cached = self.toc_cache.get(book_id, version)
+            if cached is not None:
+                return cached
+            content = self.storage.download_text(toc_key)
+            toc = json.loads(content)
+            self.toc_cache.put(book_id, version, toc, len(content.encode("utf-8")))
+            return toc
+        except Exception as e:
+            print(f"加载目录失败: {e}")
             return []
 
-    def _select_candidate_chunks(self, chunks: List[Chunk], position: int, companion_mode: bool) -> List[Chunk]:
-        """选择候选分块（伴读模式下只选择已读内容）"""
-        if not companion_mode:
-            return chunks
-        return [chunk for chunk in chunks if chunk.end <= position]
+    def _chapter_chunk_window(self, book_id: str, chapter_index: int, chunk_count: int) -> Tuple[int, int]:
+        """章节对应的分块序号区间"""
+        toc = self.get_toc(book_id)
+        if not 0 <= chapter_index < len(toc):
+            raise ValueError(f"章节不存在: {chapter_index}")
+        first, last = toc[chapter_index]["chunks"]
+        return min(first, chunk_count), min(last, chunk_count)
+
+    def _get_chapter_text(self, book_id: str, chapter_index: int, max_chars: Optional[int] = None) -> str:
+        """按目录中的字符区间从分块文件中取出章节文本"""
+        toc = self.get_toc(book_id)
+        if not 0 <= chapter_index < len(toc):
+            raise ValueError(f"章节不存在: {chapter_index}")
+        start, end = toc[chapter_index]["start"], toc[chapter_index]["end"]
+        if max_chars is not None:
+            end = min(end, start + max_chars)
+        return self._load_chunks(book_id).text_range(start, end).strip()
 
     def _build_context_text(self, selected_chunks: List[Chunk]) -> str:
         """构建上下文文本"""
@@ -383,17 +1090,13 @@ class ReadingAI:
             context_parts.append(f"[片段{i+1}] {chunk.text}")
         return "\n\n".join(context_parts)
 
-    def _extract_character_context(self, chunks: List[Chunk], character: str) -> str:
-        """提取角色相关上下文"""
-        character_chunks = []
-        for chunk in chunks:
-            if character in chunk.text:
-                character_chunks.append(chunk.text)
-        
+    def _extract_character_context(self, chunks: ChunkStore, character: str, limit: Optional[int] = None) -> str:
+        """提取前limit个分块中的角色相关上下文"""
         # 限制上下文长度
         total_length = 0
         result = []
-        for text in character_chunks:
+        for i in chunks.find_text(character, limit):
+            text = chunks[i].text
             if total_length + len(text) > 1500:  # 限制总长度
                 break
             result.append(text)
@@ -401,16 +1104,10 @@ class ReadingAI:
         
         return "\n".join(result)
 
-    def _get_text_around_position(self, book_id: str, position: int) -> str:
-        """获取指定位置附近的文本"""
-        chunks = self._load_chunks(book_id)
-        for chunk in chunks:
-            if chunk.start <= position <= chunk.end:
-                return chunk.text
-        
-        # 如果没找到精确匹配，返回最近的块
-        if chunks:
-            closest_chunk = min(chunks, key=lambda c: abs(c.start - position))
-            return closest_chunk.text
-        
-        return ""
+    def _get_text_around_position(self, book_id: str, position: int,
+                                  chunks: Optional[ChunkStore] = None) -> str:
+        """获取指定位置附近的文本（按偏移表二分查找，没找到精确匹配时返回最近的块）"""
+        if chunks is None:
+            chunks = self._load_chunks(book_id)
+        ordinal = chunks.locate(position)
+        return chunks[ordinal].text if ordinal is not None else ""
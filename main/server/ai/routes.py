@@ -1,6 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, AsyncIterator, Optional, List
+import json
+
+from .executors import PoolBusyError, io_pool
+from .ingest_jobs import IngestConflictError, IngestQueueFullError
 
 router = APIRouter()
 
@@ -10,6 +15,35 @@ def get_ai_engine(request: Request):
         raise HTTPException(status_code=500, detail="AI引擎未正确初始化")
     return request.app.state.ai_engine
 
+def _sse_event(data: Any, event: Optional[str] = None) -> str:
+    """编码一条SSE事件"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _sse_stream(tokens: AsyncIterator[str], meta: Optional[Dict[str, Any]] = None) -> StreamingResponse:
+    """把增量文本转成SSE响应：先发元信息（引用），再逐段发送，最后发送done"""
+    async def events():
+        if meta is not None:
+            yield _sse_event(meta, "citations")
+        try:
+            async for token in tokens:
+                yield _sse_event({"delta": token})
+        except Exception as e:
+            yield _sse_event({"message": str(e)}, "error")
+        yield _sse_event({}, "done")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def get_ingest_jobs(request: Request):
+    """从应用状态中获取书籍处理任务队列"""
+    if not hasattr(request.app.state, "ingest_jobs"):
+        raise HTTPException(status_code=500, detail="任务队列未正确初始化")
+    return request.app.state.ingest_jobs
+
 class QueryRequest(BaseModel):
     bookId: str
     question: str
@@ -17,6 +51,7 @@ class QueryRequest(BaseModel):
     selectedText: Optional[str] = ""
     includeAfter: bool = False
     companionMode: bool = True
+    chapterIndex: Optional[int] = None  # 只在该章内检索（序号见 /ai/toc）
 
 class CharacterDialogueRequest(BaseModel):
     bookId: str
@@ -42,8 +77,9 @@ class IngestRequest(BaseModel):
 
 class MediaGenerationRequest(BaseModel):
     bookId: str
-    chapterText: str
+    chapterText: str = ""
     chapterId: str
+    chapterIndex: Optional[int] = None  # 未提供chapterText时按目录取章节内容
 
 @router.post("/query")
 async def query_with_context(
@@ -52,30 +88,70 @@ async def query_with_context(
 ):
     """根据选中文本、阅读位置和问题生成回答"""
     try:
-        result = ai_engine.query_with_context(
+        result = await ai_engine.aquery_with_context(
             book_id=request.bookId,
             question=request.question,
             position=request.position,
             selected_text=request.selectedText,
             include_after=request.includeAfter,
-            companion_mode=request.companionMode
+            companion_mode=request.companionMode,
+            chapter_index=request.chapterIndex
         )
         return result
+    except PoolBusyError:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后再试")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
+
+@router.post("/query/stream")
+async def query_with_context_stream(
+    request: QueryRequest,
+    ai_engine = Depends(get_ai_engine)
+):
+    """流式问答（SSE）：先发送引用，再逐段发送回答"""
+    try:
+        meta, tokens = await ai_engine.aquery_with_context_stream(
+            book_id=request.bookId,
+            question=request.question,
+            position=request.position,
+            selected_text=request.selectedText,
+            include_after=request.includeAfter,
+            companion_mode=request.companionMode,
+            chapter_index=request.chapterIndex
+        )
+        return _sse_stream(tokens, meta)
+    except PoolBusyError:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后再试")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
 
 @router.post("/ingest")
 async def ingest_book(
     request: IngestRequest,
-    ai_engine = Depends(get_ai_engine)
+    ingest_jobs = Depends(get_ingest_jobs)
 ):
-    """处理书籍，生成切片和嵌入索引"""
+    """提交书籍处理任务（切片和索引在后台生成），返回任务ID"""
     try:
-        result = ai_engine.ingest_book(request.bookId, request.fileType)
-        return result
+        job = ingest_jobs.submit(request.bookId, request.fileType)
+        return job.to_dict()
+    except IngestConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except IngestQueueFullError:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后再试")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"书籍处理失败: {str(e)}")
 
+@router.get("/ingest/{job_id}")
+async def ingest_status(
+    job_id: str,
+    ingest_jobs = Depends(get_ingest_jobs)
+):
+    """查询书籍处理任务进度"""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job.to_dict()
+
 @router.post("/character-dialogue")
 async def character_dialogue(
     request: CharacterDialogueRequest,
@@ -83,13 +159,34 @@ async def character_dialogue(
 ):
     """与书中人物对话，仅基于已读内容"""
     try:
-        response = ai_engine.character_dialogue(
+        response = await ai_engine.acharacter_dialogue(
             book_id=request.bookId,
             character=request.character,
             user_input=request.userInput,
             position=request.position
         )
         return {"response": response}
+    except PoolBusyError:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后再试")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"人物对话失败: {str(e)}")
+
+@router.post("/character-dialogue/stream")
+async def character_dialogue_stream(
+    request: CharacterDialogueRequest,
+    ai_engine = Depends(get_ai_engine)
+):
+    """流式人物对话（SSE）"""
+    try:
+        tokens = await ai_engine.acharacter_dialogue_stream(
+            book_id=request.bookId,
+            character=request.character,
+            user_input=request.userInput,
+            position=request.position
+        )
+        return _sse_stream(tokens)
+    except PoolBusyError:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后再试")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"人物对话失败: {str(e)}")
 
@@ -100,8 +197,10 @@ async def analyze_stay_time(
 ):
     """分析用户在书中停留时间最长的部分"""
     try:
-        result = ai_engine.analyze_stay_time(request.bookId, request.stayRecords)
+        result = await ai_engine.aanalyze_stay_time(request.bookId, request.stayRecords)
         return result
+    except PoolBusyError:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后再试")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"停留分析失败: {str(e)}")
 
@@ -112,7 +211,7 @@ async def external_dialogue(
 ):
     """基于导入内容的外部对话"""
     try:
-        response = ai_engine.external_dialogue(request.content, request.question)
+        response = await ai_engine.aexternal_dialogue(request.content, request.question)
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"外部对话失败: {str(e)}")
@@ -124,8 +223,10 @@ async def analyze_interest(
 ):
     """根据停留记录分析用户兴趣并给出推荐"""
     try:
-        recommendations = ai_engine.analyze_interest(request.bookId, request.stayRecords)
+        recommendations = await ai_engine.aanalyze_interest(request.bookId, request.stayRecords)
         return {"recommendations": recommendations}
+    except PoolBusyError:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后再试")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"兴趣分析失败: {str(e)}")
 
@@ -136,16 +237,37 @@ async def generate_media(
 ):
     """为章节生成音频和视频"""
     try:
-        result = ai_engine.generate_chapter_media(
+        result = await ai_engine.agenerate_chapter_media(
             book_id=request.bookId,
             chapter_text=request.chapterText,
-            chapter_id=request.chapterId
+            chapter_id=request.chapterId,
+            chapter_index=request.chapterIndex
         )
         return result
+    except PoolBusyError:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后再试")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"媒体生成失败: {str(e)}")
 
+@router.get("/toc/{book_id}")
+async def get_toc(
+    book_id: str,
+    ai_engine = Depends(get_ai_engine)
+):
+    """获取书籍目录：章节标题、字符偏移区间与分块序号区间"""
+    try:
+        return {"chapters": await io_pool.run(ai_engine.get_toc, book_id)}
+    except PoolBusyError:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后再试")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取目录失败: {str(e)}")
+
 @router.get("/health")
 async def health_check():
     """健康检查接口"""
     return {"status": "healthy", "service": "ai-router"}
+
+@router.get("/stats")
+async def stats(ai_engine = Depends(get_ai_engine), ingest_jobs = Depends(get_ingest_jobs)):
+    """运行统计（缓存命中率、执行池排队、任务队列等）"""
+    return {**ai_engine.stats(), "ingestJobs": ingest_jobs.stats()}
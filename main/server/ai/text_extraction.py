@@ -0,0 +1,360 @@
+import codecs
+import posixpath
+import re
+import zipfile
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+READ_BLOCK_SIZE = 64 * 1024
+
+_SKIP_TAGS = {"script", "style", "head"}
+_BLOCK_TAGS = {
+    "p", "div", "br", "li", "tr", "section", "article", "blockquote", "pre",
+    "h1", "h2", "h3", "h4", "h5", "h6", "hr", "dt", "dd", "table",
+}
+_SPACE_RE = re.compile(r"\s+")
+_NEWLINE_RE = re.compile(r" *\n[\n ]*")
+_HTML_EXTS = (".xhtml", ".html", ".htm")
+# 可以抽取文本的书籍格式
+SUPPORTED_FILE_TYPES = ("txt", "md", "html", "htm", "epub")
+_HEADING_TAGS = {"h1", "h2", "h3"}
+# 纯文本/单页HTML中的章节标题行
+_HEADING_LINE_RE = re.compile(
+    r'^[ \t\u3000]*('
+    r'第[0-9０-９零〇一二三四五六七八九十百千两]+[章回节卷部篇集][^\n]{0,40}'
+    r'|chapter\s+[0-9ivxlc]+\b[^\n]{0,40}'
+    r'|#{1,3}[ \t]+[^\n]{1,60}'
+    r')[ \t]*$',
+    re.MULTILINE | re.IGNORECASE,
+)
+
+
+@dataclass
+class Chapter:
+    index: int
+    title: Optional[str]
+    start: int
+    end: int
+    href: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {"index": self.index, "title": self.title, "start": self.start, "end": self.end, "href": self.href}
+
+
+class _HTMLTextParser(HTMLParser):
+    """增量HTML去标签：跳过脚本与样式，块级标签处换行，合并空白"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._skip_depth = 0
+        self._parts: List[str] = []
+        self._at_line_start = True
+        # 记录<title>与第一个h1-h3的文本，作为缺少目录时的章节标题
+        self._capture: Optional[str] = None
+        self._captured: Dict[str, List[str]] = {"title": [], "heading": []}
+
+    @property
+    def heading(self) -> Optional[str]:
+        for key in ("heading", "title"):
+            text = _SPACE_RE.sub(" ", "".join(self._captured[key])).strip()
+            if text:
+                return text
+        return None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title" and not self._captured["title"]:
+            self._capture = "title"
+        elif tag in _HEADING_TAGS and not self._captured["heading"]:
+            self._capture = "heading"
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in _BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if (self._capture == "title" and tag == "title") or (self._capture == "heading" and tag in _HEADING_TAGS):
+            self._capture = None
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_data(self, data):
+        if self._capture:
+            self._captured[self._capture].append(data)
+        if not self._skip_depth:
+            self._parts.append(_SPACE_RE.sub(" ", data))
+
+    def drain(self) -> str:
+        """取出目前已解析的文本"""
+        if not self._parts:
+            return ""
+        text = _NEWLINE_RE.sub("\n", "".join(self._parts))
+        self._parts.clear()
+        if self._at_line_start:
+            text = text.lstrip(" \n")
+        if text:
+            self._at_line_start = text.endswith("\n")
+        return text
+
+
+def _iter_html(stream: BinaryIO, parser: Optional[_HTMLTextParser] = None) -> Iterator[str]:
+    """逐块解码并解析HTML，产出文本片段"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    parser = parser or _HTMLTextParser()
+    while True:
+        block = stream.read(READ_BLOCK_SIZE)
+        if not block:
+            break
+        parser.feed(decoder.decode(block))
+        text = parser.drain()
+        if text:
+            yield text
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    text = parser.drain()
+    if text:
+        yield text
+
+
+def _detect_encoding(stream: BinaryIO) -> str:
+    """依次尝试 utf-8 / gb18030 严格解码整个文件（逐块读取，不保留内容），都失败时使用 latin-1"""
+    start = stream.tell()
+    for enc in ("utf-8", "gb18030"):
+        stream.seek(start)
+        decoder = codecs.getincrementaldecoder(enc)()
+        try:
+            while True:
+                block = stream.read(READ_BLOCK_SIZE)
+                if not block:
+                    break
+                decoder.decode(block)
+            decoder.decode(b"", final=True)
+            encoding = enc
+            break
+        except UnicodeDecodeError:
+            pass
+    else:
+        encoding = "latin-1"
+    stream.seek(start)
+    return encoding
+
+
+def _iter_plain_text(stream: BinaryIO) -> Iterator[str]:
+    """确定整个文件的编码后逐块解码（文件需可随机读取）
+
+    只看开头判断编码时，前面是ASCII、后面才出现中文的GB18030文件会被当成UTF-8，
+    因此先完整校验一遍，确认能严格解码后再产出文本。
+    """
+    decoder = codecs.getincrementaldecoder(_detect_encoding(stream))()
+    while True:
+        block = stream.read(READ_BLOCK_SIZE)
+        if not block:
+            break
+        text = decoder.decode(block)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def _local(tag: str) -> str:
+    """去掉XML命名空间"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _read_opf(zf: zipfile.ZipFile) -> Tuple[str, Dict[str, Dict[str, str]], List[str], Optional[str]]:
+    """解析OPF：返回 (OPF目录, manifest: id -> 属性, spine中的id列表, spine的toc属性)"""
+    container = ElementTree.fromstring(zf.read("META-INF/container.xml"))
+    rootfile = next(el for el in container.iter() if _local(el.tag) == "rootfile")
+    opf_path = rootfile.attrib["full-path"]
+    opf = ElementTree.fromstring(zf.read(opf_path))
+    opf_dir = posixpath.dirname(opf_path)
+
+    manifest: Dict[str, Dict[str, str]] = {}
+    spine_ids: List[str] = []
+    toc_id = None
+    for el in opf.iter():
+        tag = _local(el.tag)
+        if tag == "item":
+            item = dict(el.attrib)
+            item["path"] = posixpath.normpath(posixpath.join(opf_dir, unquote(item.get("href", ""))))
+            manifest[item.get("id")] = item
+        elif tag == "spine":
+            toc_id = el.attrib.get("toc")
+        elif tag == "itemref":
+            spine_ids.append(el.attrib.get("idref"))
+    return opf_dir, manifest, spine_ids, toc_id
+
+
+def epub_spine(zf: zipfile.ZipFile) -> List[str]:
+    """按OPF spine给出阅读顺序的内容文件；缺少OPF时退回压缩包内的顺序"""
+    names = set(zf.namelist())
+    try:
+        _, manifest, spine_ids, _ = _read_opf(zf)
+        spine = [manifest[i]["path"] for i in spine_ids if i in manifest and manifest[i]["path"] in names]
+        if spine:
+            return spine
+    except Exception:
+        pass
+    return [name for name in zf.namelist() if name.lower().endswith(_HTML_EXTS)]
+
+
+def epub_toc(zf: zipfile.ZipFile) -> Dict[str, str]:
+    """读取EPUB3 nav或EPUB2 NCX目录，返回 内容文件路径 -> 章节标题（同一文件取第一个条目）"""
+    try:
+        _, manifest, _, toc_id = _read_opf(zf)
+    except Exception:
+        return {}
+    nav = next((m for m in manifest.values() if "nav" in m.get("properties", "").split()), None)
+    ncx = manifest.get(toc_id) or next(
+        (m for m in manifest.values() if m.get("media-type") == "application/x-dtbncx+xml"), None)
+
+    toc: Dict[str, str] = {}
+
+    def add(base: str, href: str, title: str):
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(base), unquote(href.split("#", 1)[0])))
+        title = _SPACE_RE.sub(" ", title).strip()
+        if title and path not in toc:
+            toc[path] = title
+
+    if nav is not None:
+        try:
+            root = ElementTree.fromstring(zf.read(nav["path"]))
+            for el in root.iter():
+                if _local(el.tag) == "nav" and "toc" in el.attrib.get("{http://www.idpf.org/2007/ops}type", "toc"):
+                    for a in el.iter():
+                        if _local(a.tag) == "a" and a.attrib.get("href"):
+                            add(nav["path"], a.attrib["href"], "".join(a.itertext()))
+                    break
+        except Exception:
+            pass
+    # nav缺失、损坏或不完整时用NCX补齐
+    if ncx is not None:
+        try:
+            root = ElementTree.fromstring(zf.read(ncx["path"]))
+            for point in root.iter():
+                if _local(point.tag) != "navPoint":
+                    continue
+                label = next((el for el in point.iter() if _local(el.tag) == "text"), None)
+                content = next((el for el in point.iter() if _local(el.tag) == "content"), None)
+                if label is not None and content is not None and content.attrib.get("src"):
+                    add(ncx["path"], content.attrib["src"], "".join(label.itertext()))
+        except Exception:
+            pass
+    return toc
+
+
+def _iter_epub(stream: BinaryIO) -> Iterator[str]:
+    """按spine顺序逐个解压内容文件并增量去标签，文件之间以换行分隔（每次只缓存一个文件的文本）"""
+    first = True
+    for _, _, segments in _iter_epub_documents(stream):
+        if not first:
+            yield "\n"
+        first = False
+        yield from segments
+
+
+def _iter_epub_documents(stream: BinaryIO) -> Iterator[Tuple[str, _HTMLTextParser, List[str]]]:
+    """按spine顺序产出 (内容文件路径, 解析器, 文本片段列表)
+
+    每个文件读完后才产出，解压或解析失败的文件（损坏、缺失、加密）整体跳过，不影响其余章节。
+    """
+    with zipfile.ZipFile(stream) as zf:
+        for name in epub_spine(zf):
+            parser = _HTMLTextParser()
+            try:
+                with zf.open(name) as member:
+                    segments = list(_iter_html(member, parser))
+            except Exception as e:
+                print(f"跳过无法读取的EPUB内容文件 {name}: {e}")
+                continue
+            yield name, parser, segments
+
+
+def _extract_epub(stream: BinaryIO) -> Tuple[str, List[Chapter]]:
+    """抽取EPUB全文，按目录把spine中的文件合并为章节"""
+    stream.seek(0)
+    with zipfile.ZipFile(stream) as zf:
+        toc = epub_toc(zf)
+    stream.seek(0)
+
+    parts: List[str] = []
+    length = 0
+    chapters: List[Chapter] = []
+    for name, parser, segments in _iter_epub_documents(stream):
+        if length:
+            parts.append("\n")
+            length += 1
+        start = length
+        for segment in segments:
+            parts.append(segment)
+            length += len(segment)
+        title = toc.get(name)
+        # 不在目录中的文件（如一章拆成多个文件）并入上一章
+        if title or not chapters:
+            if chapters and start == chapters[-1].start:
+                chapters.pop()
+            chapters.append(Chapter(len(chapters), title or parser.heading, start, length, name))
+        else:
+            chapters[-1].end = length
+    return "".join(parts), chapters
+
+
+def _detect_chapters(text: str) -> List[Chapter]:
+    """按标题行划分纯文本章节，标题前的内容作为前言"""
+    chapters: List[Chapter] = []
+    for match in _HEADING_LINE_RE.finditer(text):
+        title = match.group(1).lstrip("#").strip()
+        if not chapters and text[:match.start()].strip():
+            chapters.append(Chapter(0, None, 0, match.start()))
+        if chapters:
+            chapters[-1].end = match.start()
+        chapters.append(Chapter(len(chapters), title, match.start(), len(text)))
+    if not chapters:
+        chapters.append(Chapter(0, None, 0, len(text)))
+    return chapters
+
+
+def extract_book(stream: BinaryIO, file_type: str) -> Tuple[str, List[Chapter]]:
+    """抽取全文并给出章节（标题与字符偏移区间），章节按顺序排列、互不重叠
+
+    源文件按块解码、逐个解压，但切片需要整本书的文本，全文会在内存中拼接后返回。
+    """
+    if file_type.lower() == "epub":
+        text, chapters = _extract_epub(stream)
+    else:
+        text = "".join(iter_text_segments(stream, file_type))
+        chapters = []
+
+    # 去掉首尾空白，章节偏移随之平移
+    lead = len(text) - len(text.lstrip())
+    text = text.strip()
+    if not chapters:
+        return text, _detect_chapters(text)
+    for chapter in chapters:
+        chapter.start = min(max(0, chapter.start - lead), len(text))
+        chapter.end = min(max(0, chapter.end - lead), len(text))
+    chapters[0].start = 0
+    chapters[-1].end = len(text)
+    return text, chapters
+
+
+def iter_text_segments(stream: BinaryIO, file_type: str) -> Iterator[str]:
+    """从书籍文件流中逐段抽取纯文本（epub需要可随机读取的文件对象）"""
+    ft = file_type.lower()
+    if ft in {"txt", "md"}:
+        return _iter_plain_text(stream)
+    if ft in {"html", "htm"}:
+        return _iter_html(stream)
+    if ft == "epub":
+        return _iter_epub(stream)
+    return iter(())
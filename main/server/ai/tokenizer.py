@@ -0,0 +1,101 @@
+import os
+import re
+from typing import Callable, Dict, FrozenSet, Iterable, List, Tuple
+
+RETRIEVAL_TOKENIZER = os.getenv("RETRIEVAL_TOKENIZER", "cjk-bigram")
+# 分词器名称写入索引文件与向量签名（vectors.bin中为定长64字节），只允许较短的ASCII名称
+TOKENIZER_NAME_MAX_BYTES = 32
+
+# 汉字连续段与其余单词分开匹配，整本书只需一次findall
+_TOKEN_RE = re.compile(r'([\u4e00-\u9fff]+)|([^\W\u4e00-\u9fff]+)')
+_WORD_RE = re.compile(r'[\w\u4e00-\u9fff]+')
+
+DEFAULT_STOPWORDS: FrozenSet[str] = frozenset("""
+我们 你们 他们 她们 它们 自己 什么 怎么 怎样 为什么 哪些 哪里 哪个 这个 那个 这些 那些 这样 那样
+一个 一些 没有 不是 就是 还是 但是 可是 因为 所以 如果 虽然 然后 已经 可以 这里 那里 时候
+请问 是否 为什 是不是 有没有 之后 之前 以及 或者 而且 不过 只是 的人 了一 是一 在这 在那
+the a an of and or to in on at for is are was were be been it this that with as by from
+what who whom which why how when where do does did not no but if so than then there
+""".split())
+
+
+class Tokenizer:
+    """分词器基类，索引构建与查询必须使用同一分词器"""
+
+    name = "base"
+
+    def tokenize(self, text: str) -> List[str]:
+        raise NotImplementedError
+
+
+class CJKNgramTokenizer(Tokenizer):
+    """汉字按字符n-gram切分，拉丁文按单词切分，并过滤停用词"""
+
+    def __init__(self, name: str, ngrams: Tuple[int, ...] = (2,),
+                 stopwords: Iterable[str] = DEFAULT_STOPWORDS):
+        self.name = name
+        self.ngrams = ngrams
+        self.stopwords = frozenset(stopwords)
+
+    def tokenize(self, text: str) -> List[str]:
+        tokens: List[str] = []
+        for cjk, word in _TOKEN_RE.findall(text.lower()):
+            if word:
+                if len(word) > 1:
+                    tokens.append(word)
+            elif len(cjk) == 1:
+                tokens.append(cjk)
+            else:
+                for n in self.ngrams:
+                    if n == 2:
+                        tokens.extend(map(str.__add__, cjk, cjk[1:]))
+                    elif len(cjk) >= n:
+                        tokens.extend(cjk[i:i + n] for i in range(len(cjk) - n + 1))
+        stopwords = self.stopwords
+        return [t for t in tokens if t not in stopwords]
+
+
+class WordTokenizer(Tokenizer):
+    """按连续字符段切分（旧版索引使用的规则）"""
+
+    name = "word"
+
+    def tokenize(self, text: str) -> List[str]:
+        return [w for w in _WORD_RE.findall(text.lower()) if len(w) > 1]
+
+
+_TOKENIZERS: Dict[str, Callable[[], Tokenizer]] = {
+    "cjk-bigram": lambda: CJKNgramTokenizer("cjk-bigram", (2,)),
+    "cjk-bigram-trigram": lambda: CJKNgramTokenizer("cjk-bigram-trigram", (2, 3)),
+    "word": WordTokenizer,
+}
+_instances: Dict[str, Tokenizer] = {}
+
+
+def _check_name(name: str):
+    if not name or not name.isascii() or len(name) > TOKENIZER_NAME_MAX_BYTES or "\0" in name:
+        raise ValueError(f"分词器名称须为不超过{TOKENIZER_NAME_MAX_BYTES}字节的ASCII字符串: {name!r}")
+
+
+def register_tokenizer(name: str, factory: Callable[[], Tokenizer]):
+    """注册自定义分词器，名称不符合索引文件格式时抛出ValueError"""
+    _check_name(name)
+    _TOKENIZERS[name] = factory
+    _instances.pop(name, None)
+
+
+def tokenizer_names() -> List[str]:
+    """已注册的分词器名称"""
+    return sorted(_TOKENIZERS)
+
+
+def get_tokenizer(name: str = None) -> Tokenizer:
+    """按名称获取分词器（默认取RETRIEVAL_TOKENIZER）"""
+    name = name or RETRIEVAL_TOKENIZER
+    if name not in _instances:
+        if name not in _TOKENIZERS:
+            raise ValueError(f"未知分词器: {name}")
+        tokenizer = _TOKENIZERS[name]()
+        _check_name(tokenizer.name)
+        _instances[name] = tokenizer
+    return _instances[name]
@@ -0,0 +1,224 @@
+import functools
+import io
+import os
+import struct
+import zlib
+from typing import BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .tokenizer import Tokenizer, get_tokenizer
+
+# Optional: FAISS
+try:
+    import faiss  # type: ignore
+    _FAISS_AVAILABLE = True
+except Exception:
+    faiss = None  # type: ignore
+    _FAISS_AVAILABLE = False
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "hashing")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+# 哈希嵌入缓存的词数上限（按最近使用淘汰）
+EMBEDDING_TOKEN_CACHE_SIZE = int(os.getenv("EMBEDDING_TOKEN_CACHE_SIZE", "200000"))
+
+# 向量文件格式：头部 + float32[n, dim] 行主序矩阵
+_MAGIC = b"RAVX"
+_FORMAT_VERSION = 2
+_HEADER = struct.Struct("<4sIII16s64s")
+# 版本1只记录了提供者名称，无法确认生成时使用的分词器与维度
+_HEADER_V1 = struct.Struct("<4sIII16s")
+
+
+class EmbeddingProvider:
+    """嵌入向量提供者基类，返回L2归一化的float32矩阵"""
+
+    name = "base"
+    dim = 0
+
+    @property
+    def signature(self) -> str:
+        """嵌入规则标识，写入向量文件用于判断旧向量能否复用"""
+        return f"{self.name}:{self.dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+@functools.lru_cache(maxsize=EMBEDDING_TOKEN_CACHE_SIZE)
+def _signed_bucket(token: str, dim: int) -> int:
+    """词 -> 带符号的桶号（+1偏移，避免0无法区分正负）"""
+    h = zlib.crc32(token.encode("utf-8"))
+    bucket = (h % dim) + 1
+    return -bucket if h & 0x80000000 else bucket
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """本地特征哈希嵌入：分词后哈希到固定维度，无需网络即可使用"""
+
+    name = "hashing"
+
+    def __init__(self, dim: int = EMBEDDING_DIM, tokenizer: Optional[Tokenizer] = None):
+        self.dim = dim
+        self.tokenizer = tokenizer or get_tokenizer()
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}:{self.tokenizer.name}:{self.dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        dim = self.dim
+        buckets: List[int] = []
+        lengths = []
+        for text in texts:
+            tokens = self.tokenizer.tokenize(text)
+            buckets.extend(_signed_bucket(t, dim) for t in tokens)
+            lengths.append(len(tokens))
+
+        signed = np.asarray(buckets, dtype=np.int64)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        flat = rows * self.dim + np.abs(signed) - 1
+        counts = np.bincount(flat, weights=np.sign(signed).astype(np.float64),
+                             minlength=len(texts) * self.dim)
+        vectors = counts.reshape(len(texts), self.dim).astype(np.float32)
+        # 次线性词频，避免高频词主导
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+_PROVIDERS: Dict[str, Callable[[], EmbeddingProvider]] = {
+    "hashing": HashingEmbeddingProvider,
+}
+_instances: Dict[str, EmbeddingProvider] = {}
+
+
+def register_embedding_provider(name: str, factory: Callable[[], EmbeddingProvider]):
+    """注册自定义嵌入提供者（如远程嵌入API）"""
+    _PROVIDERS[name] = factory
+    _instances.pop(name, None)
+
+
+def get_embedding_provider(name: str = None) -> EmbeddingProvider:
+    """按名称获取嵌入提供者（默认取EMBEDDING_PROVIDER）"""
+    name = name or EMBEDDING_PROVIDER
+    if name not in _instances:
+        if name not in _PROVIDERS:
+            raise ValueError(f"未知嵌入提供者: {name}")
+        _instances[name] = _PROVIDERS[name]()
+    return _instances[name]
+
+
+class VectorIndex:
+    """每本书一个float32嵌入矩阵，行号即分块序号"""
+
+    def __init__(self, vectors: np.ndarray, provider: EmbeddingProvider, signature: Optional[str] = None):
+        self.vectors = vectors
+        self.provider = provider
+        # 生成向量时的嵌入规则；从旧格式文件加载时为None
+        self.signature = signature
+        self.doc_count = len(vectors)
+        self._faiss_index = None
+
+    @classmethod
+    def build(cls, texts: List[str], provider: Optional[EmbeddingProvider] = None,
+              batch_size: int = EMBEDDING_BATCH_SIZE) -> "VectorIndex":
+        """分批计算分块嵌入"""
+        provider = provider or get_embedding_provider()
+        batches = [provider.embed(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        vectors = np.vstack(batches) if batches else np.zeros((0, provider.dim), dtype=np.float32)
+        return cls(np.ascontiguousarray(vectors, dtype=np.float32), provider, provider.signature)
+
+    @classmethod
+    def update(cls, previous: "VectorIndex", reused: Sequence[int], texts: List[str],
+               batch_size: int = EMBEDDING_BATCH_SIZE) -> "VectorIndex":
+        """增量重建：reused[i]为第i个分块在旧矩阵中的行号，-1表示新分块，只为新分块计算嵌入"""
+        provider = previous.provider
+        reused = np.asarray(reused, dtype=np.int64)
+        vectors = np.empty((len(reused), provider.dim), dtype=np.float32)
+        kept = np.flatnonzero(reused >= 0)
+        vectors[kept] = previous.vectors[reused[kept]]
+        fresh = np.flatnonzero(reused < 0)
+        for i in range(0, len(fresh), batch_size):
+            rows = fresh[i:i + batch_size]
+            vectors[rows] = provider.embed([texts[j] for j in rows])
+        return cls(vectors, provider, previous.signature)
+
+    def to_bytes(self) -> bytes:
+        """序列化为二进制格式"""
+        buffer = io.BytesIO()
+        self.write_to(buffer)
+        return buffer.getvalue()
+
+    def write_to(self, f: BinaryIO):
+        """按顺序写入文件对象，不复制整个矩阵"""
+        n, dim = self.vectors.shape
+        f.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, n, dim, self.provider.name.encode("ascii"),
+                             (self.signature or "").encode("ascii")))
+        f.write(np.ascontiguousarray(self.vectors, dtype="<f4"))
+
+    @classmethod
+    def from_bytes(cls, data) -> "VectorIndex":
+        """从二进制数据加载（矩阵为零拷贝视图）"""
+        magic, version = struct.unpack_from("<4sI", data, 0)
+        if magic != _MAGIC or version not in (1, _FORMAT_VERSION):
+            raise ValueError("向量文件格式不兼容")
+        if version == 1:
+            _, _, n, dim, name = _HEADER_V1.unpack_from(data, 0)
+            signature, offset = None, _HEADER_V1.size
+        else:
+            _, _, n, dim, name, signature = _HEADER.unpack_from(data, 0)
+            signature, offset = signature.rstrip(b"\0").decode("ascii") or None, _HEADER.size
+        provider = get_embedding_provider(name.rstrip(b"\0").decode("ascii"))
+        if provider.dim != dim:
+            raise ValueError("向量维度与嵌入提供者不一致")
+        vectors = np.frombuffer(data, dtype="<f4", count=n * dim, offset=offset).reshape(n, dim)
+        return cls(vectors, provider, signature)
+
+    @property
+    def nbytes(self) -> int:
+        """矩阵占用的字节数；可用FAISS时首次检索会再复制一份矩阵，一并计入"""
+        return self.vectors.nbytes * (2 if _FAISS_AVAILABLE else 1)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """计算查询向量"""
+        return self.provider.embed([query])[0]
+
+    def search(self, query: str, limit: Optional[int] = None, top_k: int = 4,
+               start: int = 0) -> List[Tuple[int, float]]:
+        """在序号区间[start, limit)内按内积检索，返回 (分块序号, 得分) 列表"""
+        if limit is None or limit > self.doc_count:
+            limit = self.doc_count
+        start = max(0, start)
+        if limit <= start:
+            return []
+        query_vec = self.embed_query(query)
+        top_k = min(top_k, limit - start)
+
+        if _FAISS_AVAILABLE:
+            try:
+                return self._faiss_search(query_vec, start, limit, top_k)
+            except Exception:
+                pass
+
+        scores = self.vectors[start:limit] @ query_vec
+        if top_k < len(scores):
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(i) + start, float(scores[i])) for i in top]
+
+    def _faiss_search(self, query_vec: np.ndarray, start: int, limit: int, top_k: int) -> List[Tuple[int, float]]:
+        """FAISS平铺内积检索，按序号区间过滤位置窗口"""
+        if self._faiss_index is None:
+            index = faiss.IndexFlatIP(self.vectors.shape[1])
+            index.add(np.ascontiguousarray(self.vectors))
+            self._faiss_index = index
+        params = None
+        if start > 0 or limit < self.doc_count:
+            params = faiss.SearchParameters(sel=faiss.IDSelectorRange(start, limit))
+        scores, ids = self._faiss_index.search(query_vec.reshape(1, -1), top_k, params=params)
+        return [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0]
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from user_store import UserRepository
+
+AUTH_USER_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_USER_CACHE_TTL_SECONDS", "30"))
+AUTH_USER_CACHE_MAX_ENTRIES = int(os.environ.get("AUTH_USER_CACHE_MAX_ENTRIES", "10000"))
+AUTH_TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get("AUTH_TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+
+class TTLCache:
+    """按条目数做LRU淘汰、每个条目带过期时间（time.time()）的线程安全缓存"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # key -> (过期时间, 值)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """未命中或已过期时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any, expires_at: float):
+        if self.max_entries <= 0 or expires_at <= time.time():
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class CachedUserRepository(UserRepository):
+    """在用户存储前加一层短TTL的用户缓存；经由本对象修改用户时立即失效
+
+    验证码读写不缓存，直接转发给底层存储。
+    """
+
+    def __init__(self, repo: UserRepository, ttl: float = AUTH_USER_CACHE_TTL_SECONDS,
+                 max_entries: int = AUTH_USER_CACHE_MAX_ENTRIES):
+        self.repo = repo
+        self.ttl = ttl
+        self.users = TTLCache(max_entries)
+
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        user = self.users.get(email)
+        if user is None:
+            user = self.repo.get_user(email)
+            if user is not None:
+                self.users.put(email, user, time.time() + self.ttl)
+        return user
+
+    def create_user(self, user: Dict[str, Any]) -> bool:
+        created = self.repo.create_user(user)
+        self.invalidate_user(user["email"])
+        return created
+
+    def invalidate_user(self, email: str):
+        self.users.invalidate(email)
+
+    def get_code(self, email: str) -> Optional[Dict[str, Any]]:
+        return self.repo.get_code(email)
+
+    def put_code(self, email: str, entry: Dict[str, Any], min_interval: int = 0) -> bool:
+        return self.repo.put_code(email, entry, min_interval)
+
+    def delete_code(self, email: str, code_hash: Optional[str] = None) -> bool:
+        return self.repo.delete_code(email, code_hash)
+
+    def purge_expired_codes(self, now: int) -> int:
+        return self.repo.purge_expired_codes(now)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.repo.stats(), "userCache": self.users.stats()}
@@ -0,0 +1,67 @@
+import hashlib
+import hmac
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict
+
+from passlib.hash import bcrypt
+
+from bounded_executor import BoundedExecutor, process_context
+
+AUTH_HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS", str(max(1, min(4, os.cpu_count() or 1)))))
+AUTH_HASH_QUEUE_LIMIT = int(os.environ.get("AUTH_HASH_QUEUE_LIMIT", "64"))
+
+# 验证码哈希前缀；没有该前缀的旧数据是bcrypt哈希
+_CODE_HASH_PREFIX = "hmac-sha256$"
+
+# 密码哈希与校验（bcrypt，每次数百毫秒CPU）在独立进程池中执行，排队超过上限时拒绝
+hash_pool = BoundedExecutor(
+    "auth", lambda n: ProcessPoolExecutor(max_workers=n, mp_context=process_context()),
+    AUTH_HASH_WORKERS, AUTH_HASH_QUEUE_LIMIT,
+)
+
+
+def _bcrypt_hash(secret: str) -> str:
+    return bcrypt.hash(secret)
+
+
+def _bcrypt_verify(secret: str, hashed: str) -> bool:
+    try:
+        return bcrypt.verify(secret, hashed)
+    except ValueError:
+        # 空值或格式错误的哈希
+        return False
+
+
+async def hash_password(password: str) -> str:
+    return await hash_pool.run(_bcrypt_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await hash_pool.run(_bcrypt_verify, password, hashed)
+
+
+class CodeHasher:
+    """六位验证码的带密钥HMAC：验证码只有几分钟有效期，不需要bcrypt的慢哈希"""
+
+    def __init__(self, secret: str):
+        self._key = hashlib.sha256(b"verification-code\0" + secret.encode("utf-8")).digest()
+
+    def hash(self, email: str, code: str) -> str:
+        # 哈希绑定邮箱，一个账号的验证码记录不能用于其他账号
+        digest = hmac.new(self._key, f"{email}\0{code}".encode("utf-8"), hashlib.sha256).hexdigest()
+        return _CODE_HASH_PREFIX + digest
+
+    async def verify(self, email: str, code: str, hashed: str) -> bool:
+        """校验验证码，兼容升级前生成的bcrypt哈希（在进程池中校验）"""
+        if not hashed.startswith(_CODE_HASH_PREFIX):
+            return await verify_password(code, hashed)
+        return hmac.compare_digest(self.hash(email, code), hashed)
+
+
+def hashing_stats() -> Dict[str, Any]:
+    return hash_pool.stats()
+
+
+def shutdown_hashing():
+    hash_pool.shutdown()
@@ -0,0 +1,89 @@
+import asyncio
+import functools
+import multiprocessing
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Optional
+
+
+class PoolBusyError(Exception):
+    """执行池排队已满"""
+
+
+def process_context():
+    """进程池的启动方式：服务进程中已有其他线程，fork 会把它们持有的锁原样复制到子进程，
+    因此使用 forkserver（平台不支持时用 spawn）"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict):
+    """在工作线程/进程中执行fn，返回 (执行耗时, 结果)，用于拆分排队时间与执行时间"""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+class BoundedExecutor:
+    """带排队上限的执行池，超过上限直接拒绝，避免请求在事件循环外无限堆积"""
+
+    def __init__(self, name: str, factory: Callable[[int], Executor], max_workers: int, queue_limit: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        # 成功任务的排队与执行耗时
+        self._timed = 0
+        self._queue_seconds = 0.0
+        self._max_queue_seconds = 0.0
+        self._run_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._factory(self.max_workers)
+        return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """在池中执行fn；运行中加排队的任务数超过上限时抛出PoolBusyError"""
+        # 计数只在事件循环线程中修改，无需加锁
+        if self._in_flight >= self.max_workers + self.queue_limit:
+            self.rejected += 1
+            raise PoolBusyError(f"{self.name} 执行池繁忙")
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            submitted = time.perf_counter()
+            elapsed, result = await loop.run_in_executor(
+                self._get_executor(), functools.partial(_timed_call, fn, args, kwargs))
+            waited = max(0.0, time.perf_counter() - submitted - elapsed)
+            self._timed += 1
+            self._queue_seconds += waited
+            self._max_queue_seconds = max(self._max_queue_seconds, waited)
+            self._run_seconds += elapsed
+            return result
+        finally:
+            self._in_flight -= 1
+            self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "queueLimit": self.queue_limit,
+            "inFlight": self._in_flight,
+            "queued": max(0, self._in_flight - self.max_workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queueWaitMsAvg": round(self._queue_seconds / self._timed * 1000, 2) if self._timed else 0.0,
+            "queueWaitMsMax": round(self._max_queue_seconds * 1000, 2),
+            "runMsAvg": round(self._run_seconds / self._timed * 1000, 2) if self._timed else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
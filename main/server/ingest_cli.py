@@ -0,0 +1,188 @@
+"""批量处理书籍：下载与上传走线程池，抽取、切片与建索引走进程池
+
+用法：
+    python ingest_cli.py books/a.epub books/b.txt
+    python ingest_cli.py --prefix books/ --cpu-workers 8 --io-workers 16
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# 环境变量加载（需在导入存储适配器前完成）
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+from storage_adapter import StorageAdapter
+from bounded_executor import process_context
+from ai.reading_ai import BookArtifacts, IngestPlan, ReadingAI, build_book_artifacts
+from ai.text_extraction import SUPPORTED_FILE_TYPES
+
+# 书籍原文件键：books/<bookId>.<ext>
+_BOOK_KEY_RE = re.compile(r"^books/([^/]+)\.([A-Za-z0-9]+)$")
+
+
+@dataclass
+class BookTask:
+    key: str
+    book_id: str
+    file_type: str
+    plan: Optional[IngestPlan] = None
+    source_bytes: int = 0
+    chunks: int = 0
+    reused_chunks: int = 0
+    status: str = "pending"  # pending | skipped | succeeded | failed
+    error: Optional[str] = None
+
+
+def parse_book_key(key: str) -> Optional[Tuple[str, str]]:
+    """解析书籍键，返回 (bookId, 文件类型)；不是可处理的原文件时返回None"""
+    match = _BOOK_KEY_RE.match(key)
+    if not match or match.group(2).lower() not in SUPPORTED_FILE_TYPES:
+        return None
+    return match.group(1), match.group(2)
+
+
+def collect_tasks(storage: StorageAdapter, keys: List[str], prefix: Optional[str]) -> List[BookTask]:
+    """由命令行给出的键与前缀列出待处理书籍（去重，保持顺序）"""
+    if prefix is not None:
+        keys = keys + [key for key, _ in storage.list_keys(prefix)]
+    tasks: Dict[str, BookTask] = {}
+    for key in keys:
+        parsed = parse_book_key(key)
+        if parsed is None:
+            if prefix is None:
+                print(f"跳过无法识别的书籍键: {key}", file=sys.stderr)
+            continue
+        tasks.setdefault(key, BookTask(key, *parsed))
+    return list(tasks.values())
+
+
+class BatchIngester:
+    """流水线批处理：下载 -> 抽取/切片/建索引 -> 上传，各阶段并发执行"""
+
+    def __init__(self, ai_engine: ReadingAI, cpu_workers: int, io_workers: int, force: bool = False):
+        self.ai_engine = ai_engine
+        self.cpu_workers = cpu_workers
+        self.io_workers = io_workers
+        self.force = force
+        # 已下载待处理的临时文件数上限，避免下载远快于处理时占满磁盘
+        self.max_in_flight = io_workers + cpu_workers * 2
+
+    def fetch(self, task: BookTask) -> BookTask:
+        """比对清单中的原文件指纹，未变化时跳过，否则下载到临时文件（原文件有变化时只重新处理变化的章节）"""
+        task.plan = self.ai_engine.plan_ingest(task.book_id, task.file_type,
+                                               skip_unchanged=not self.force, incremental=not self.force)
+        task.source_bytes = task.plan.source_bytes
+        if task.plan.skipped:
+            task.status = "skipped"
+        return task
+
+    def store(self, task: BookTask, artifacts: BookArtifacts) -> BookTask:
+        """上传处理结果"""
+        self.ai_engine.ingest_prepared(task.plan, artifacts)
+        task.chunks = artifacts.chunk_count
+        task.reused_chunks = artifacts.reused_chunks
+        task.status = "succeeded"
+        return task
+
+    def run(self, tasks: List[BookTask]) -> List[BookTask]:
+        pending = list(reversed(tasks))
+        running: Dict[Future, Tuple[str, BookTask]] = {}
+        with ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="ingest-io") as io_ex, \
+                ProcessPoolExecutor(max_workers=self.cpu_workers, mp_context=process_context()) as cpu_ex:
+            while pending or running:
+                while pending and len(running) < self.max_in_flight:
+                    task = pending.pop()
+                    running[io_ex.submit(self.fetch, task)] = ("fetch", task)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, task = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self._finish(task, error=f"{stage}: {e}")
+                        continue
+
+                    if stage == "fetch":
+                        if task.status == "skipped":
+                            self._finish(task)
+                        else:
+                            plan = task.plan
+                            future = cpu_ex.submit(build_book_artifacts, plan.source_path, plan.file_type, plan.previous)
+                            plan.previous = None
+                            running[future] = ("process", task)
+                    elif stage == "process":
+                        if result is None:
+                            self._finish(task, error="无法解析书籍文本")
+                        else:
+                            running[io_ex.submit(self.store, task, result)] = ("upload", task)
+                    else:
+                        self._finish(task)
+        return tasks
+
+    def _finish(self, task: BookTask, error: Optional[str] = None):
+        if error is not None:
+            task.status, task.error = "failed", error
+        if task.plan is not None:
+            task.plan.discard()
+        if task.status == "succeeded":
+            detail = f"{task.chunks} 个分块（复用 {task.reused_chunks}）"
+        else:
+            detail = task.error or ""
+        print(f"[{task.status}] {task.key} {detail}".rstrip(), flush=True)
+
+
+def print_report(tasks: List[BookTask], elapsed: float, storage_stats: Optional[Dict] = None):
+    """输出吞吐报告"""
+    done = [t for t in tasks if t.status == "succeeded"]
+    skipped = sum(1 for t in tasks if t.status == "skipped")
+    failed = sum(1 for t in tasks if t.status == "failed")
+    megabytes = sum(t.source_bytes for t in done) / (1024 * 1024)
+    chunks = sum(t.chunks for t in done)
+    elapsed = max(elapsed, 1e-9)
+    print(
+        f"\n共 {len(tasks)} 本：处理 {len(done)}，跳过 {skipped}，失败 {failed}，耗时 {elapsed:.2f}s\n"
+        f"吞吐：{len(done) / elapsed:.2f} books/s，{megabytes / elapsed:.2f} MB/s，{chunks / elapsed:.1f} chunks/s"
+    )
+    cache = (storage_stats or {}).get("cache")
+    if cache is not None:
+        print(f"本地缓存：命中 {cache['hits']}，未命中 {cache['misses']}，"
+              f"占用 {cache['bytes'] / (1024 * 1024):.1f} MB / {cache['maxBytes'] / (1024 * 1024):.0f} MB")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="批量生成书籍切片与索引")
+    parser.add_argument("keys", nargs="*", help="书籍原文件键，如 books/<bookId>.epub")
+    parser.add_argument("--prefix", help="处理该前缀下的所有书籍原文件，如 books/")
+    parser.add_argument("--cpu-workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="抽取与建索引的进程数")
+    parser.add_argument("--io-workers", type=int, default=8, help="下载与上传的线程数")
+    parser.add_argument("--force", action="store_true", help="忽略清单，全量重新处理所有书籍")
+    args = parser.parse_args(argv)
+    if not args.keys and args.prefix is None:
+        parser.error("需要提供书籍键或 --prefix")
+
+    storage = StorageAdapter()
+    tasks = collect_tasks(storage, args.keys, args.prefix)
+    if not tasks:
+        print("没有需要处理的书籍")
+        return 0
+
+    ingester = BatchIngester(ReadingAI(storage), args.cpu_workers, args.io_workers, force=args.force)
+    started = time.perf_counter()
+    ingester.run(tasks)
+    print_report(tasks, time.perf_counter() - started, storage.stats())
+    return 1 if any(t.status == "failed" for t in tasks) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
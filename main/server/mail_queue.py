@@ -0,0 +1,218 @@
+import asyncio
+import os
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MAIL_SENDERS = int(os.environ.get("MAIL_SENDERS", "1"))
+MAIL_BATCH_SIZE = int(os.environ.get("MAIL_BATCH_SIZE", "20"))
+MAIL_QUEUE_LIMIT = int(os.environ.get("MAIL_QUEUE_LIMIT", "1000"))
+MAIL_MAX_RETRIES = int(os.environ.get("MAIL_MAX_RETRIES", "3"))
+MAIL_RETRY_BACKOFF_SECONDS = float(os.environ.get("MAIL_RETRY_BACKOFF_SECONDS", "2"))
+MAIL_SMTP_TIMEOUT_SECONDS = float(os.environ.get("MAIL_SMTP_TIMEOUT_SECONDS", "10"))
+# 连接空闲超过该时间后先 NOOP 探活再发送（服务器通常几分钟后断开空闲连接）
+MAIL_IDLE_CHECK_SECONDS = float(os.environ.get("MAIL_IDLE_CHECK_SECONDS", "30"))
+MAIL_SHUTDOWN_TIMEOUT_SECONDS = float(os.environ.get("MAIL_SHUTDOWN_TIMEOUT_SECONDS", "5"))
+
+
+@dataclass
+class OutgoingMail:
+    sender: str
+    recipients: List[str]
+    message: str
+    attempts: int = 0
+
+
+class SMTPSession:
+    """复用的 SMTP 连接：首次发送时建立（STARTTLS、登录），断开后自动重连"""
+
+    def __init__(self, host: str, port: int, user: str = "", password: str = "", use_tls: bool = True,
+                 timeout: float = MAIL_SMTP_TIMEOUT_SECONDS):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.connections = 0
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except BaseException:
+            server.close()
+            raise
+        self._server = server
+        self.connections += 1
+
+    def _alive(self) -> bool:
+        try:
+            return self._server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, mail: OutgoingMail):
+        if self._server is not None and time.monotonic() - self._last_used > MAIL_IDLE_CHECK_SECONDS \
+                and not self._alive():
+            self.close()
+        if self._server is None:
+            self._connect()
+        try:
+            self._server.sendmail(mail.sender, mail.recipients, mail.message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # 连接在探活后被服务器关闭，重连后重发一次
+            self.close()
+            self._connect()
+            self._server.sendmail(mail.sender, mail.recipients, mail.message)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            self._server.close()
+        self._server = None
+
+
+def _is_permanent(error: Exception) -> bool:
+    """服务器返回 5xx（含收件人被永久拒绝）时不重试，4xx 为临时错误"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(500 <= code < 600 for code, _ in error.recipients.values())
+    code = getattr(error, "smtp_code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+class MailQueue:
+    """外发邮件队列：后台发送协程批量取出邮件，在各自的线程中复用 SMTP 连接发送，失败按指数退避重试"""
+
+    def __init__(self, session_factory: Callable[[], SMTPSession], senders: int = MAIL_SENDERS,
+                 batch_size: int = MAIL_BATCH_SIZE, max_retries: int = MAIL_MAX_RETRIES,
+                 queue_limit: int = MAIL_QUEUE_LIMIT):
+        self.session_factory = session_factory
+        self.senders = senders
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self._queue: "asyncio.Queue[OutgoingMail]" = asyncio.Queue(maxsize=queue_limit)
+        self._workers: List[Tuple[asyncio.Task, SMTPSession, ThreadPoolExecutor]] = []
+        # 等待重试的邮件：id(mail) -> 定时器
+        self._retry_handles: Dict[int, asyncio.TimerHandle] = {}
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+
+    async def start(self):
+        """启动后台发送协程（每个协程一个 SMTP 连接和一个发送线程）"""
+        for i in range(self.senders):
+            session = self.session_factory()
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"mail-{i}")
+            self._workers.append((asyncio.create_task(self._sender(session, executor)), session, executor))
+
+    async def stop(self, timeout: float = MAIL_SHUTDOWN_TIMEOUT_SECONDS):
+        """等待已排队的邮件发送完成（最多timeout秒），然后关闭连接"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            self.failed += self._queue.qsize()
+            print(f"邮件队列关闭时仍有 {self._queue.qsize()} 封未发送")
+        if self._retry_handles:
+            self.failed += len(self._retry_handles)
+            print(f"邮件队列关闭时放弃 {len(self._retry_handles)} 封等待重试的邮件")
+        for handle in self._retry_handles.values():
+            handle.cancel()
+        self._retry_handles.clear()
+        loop = asyncio.get_running_loop()
+        for task, session, executor in self._workers:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await loop.run_in_executor(executor, session.close)
+            executor.shutdown(wait=False)
+        self._workers = []
+
+    def submit(self, mail: OutgoingMail) -> bool:
+        """加入队列；队列已满时返回False"""
+        try:
+            self._queue.put_nowait(mail)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "senders": self.senders,
+            "queueDepth": self._queue.qsize(),
+            "pendingRetries": len(self._retry_handles),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "batches": self.batches,
+            "connections": sum(session.connections for _, session, _ in self._workers),
+        }
+
+    async def _sender(self, session: SMTPSession, executor: ThreadPoolExecutor):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                try:
+                    errors = await loop.run_in_executor(executor, _send_batch, session, batch)
+                    self.batches += 1
+                except Exception as e:
+                    # 意外错误不能结束发送协程，否则之后的邮件只进队列不发送；本批按失败处理
+                    print(f"邮件批量发送异常: {e!r}")
+                    errors = [e] * len(batch)
+                for mail, error in zip(batch, errors):
+                    self._finish(mail, error)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _finish(self, mail: OutgoingMail, error: Optional[Exception]):
+        if error is None:
+            self.sent += 1
+            return
+        mail.attempts += 1
+        if _is_permanent(error) or mail.attempts > self.max_retries:
+            self.failed += 1
+            print(f"邮件发送失败: {mail.recipients} {error}")
+            return
+        self.retries += 1
+        delay = MAIL_RETRY_BACKOFF_SECONDS * 2 ** (mail.attempts - 1)
+        self._retry_handles[id(mail)] = asyncio.get_running_loop().call_later(delay, self._requeue, mail)
+
+    def _requeue(self, mail: OutgoingMail):
+        self._retry_handles.pop(id(mail), None)
+        if not self.submit(mail):
+            self.failed += 1
+            print(f"邮件队列已满，放弃重试: {mail.recipients}")
+
+
+def _send_batch(session: SMTPSession, batch: List[OutgoingMail]) -> List[Optional[Exception]]:
+    """在发送线程中依次发送一批邮件，返回每封邮件的错误（成功为None）"""
+    errors: List[Optional[Exception]] = []
+    for mail in batch:
+        try:
+            session.send(mail)
+            errors.append(None)
+        except smtplib.SMTPResponseException as e:
+            # 单封邮件被拒绝（smtplib 已 RSET），连接继续使用
+            errors.append(e)
+        except smtplib.SMTPRecipientsRefused as e:
+            errors.append(e)
+        except Exception as e:
+            # 连接已不可用（SMTPException 也是 OSError）或出现意外错误，下一封邮件重新建立连接
+            session.close()
+            errors.append(e)
+    return errors
@@ -1,17 +1,15 @@
 from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, EmailStr
 from pathlib import Path
 import os
 import secrets
-import json
 import time
-from typing import Optional, Dict
-from passlib.hash import bcrypt
+from typing import Optional
 import jwt
 import io
-import re
-import zipfile
 from urllib import request as urlrequest
 
 # FastAPI应用初始化
@@ -33,15 +31,19 @@ REFRESH_TOKEN_EXPIRE_SECONDS = int(os.environ.get("REFRESH_TOKEN_EXPIRE_SECONDS"
 
 # 数据目录配置
 DATA_DIR = Path(os.environ.get("DATA_DIR", str(BASE_DIR / "data")))
-USERS_FILE = DATA_DIR / "users.json"
-CODES_FILE = DATA_DIR / "codes.json"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-# 初始化数据文件
-if not USERS_FILE.exists():
-    USERS_FILE.write_text(json.dumps({}, ensure_ascii=False))
-if not CODES_FILE.exists():
-    CODES_FILE.write_text(json.dumps({}, ensure_ascii=False))
+# 用户与验证码存储（首次启动时导入旧版 users.json / codes.json）
+from user_store import create_user_repository
+from auth_cache import AUTH_TOKEN_CACHE_MAX_ENTRIES, CachedUserRepository, TTLCache
+users_repo = CachedUserRepository(create_user_repository(DATA_DIR))
+# 已校验过签名的访问令牌 -> 载荷，条目在令牌过期时失效
+_verified_tokens = TTLCache(AUTH_TOKEN_CACHE_MAX_ENTRIES)
+
+# 密码哈希在独立进程池中执行，验证码使用HMAC
+from bounded_executor import PoolBusyError
+from auth_hashing import CodeHasher, hash_password, hashing_stats, shutdown_hashing, verify_password
+code_hasher = CodeHasher(SECRET_KEY)
 
 # CORS配置
 cors_env = os.environ.get("CORS_ORIGINS", "")
@@ -55,6 +57,12 @@ else:
         "http://127.0.0.1:5500",
     ]
 
+# 认证接口限流（先注册，位于CORS中间件内层，429响应同样带CORS头）
+from rate_limit import RATE_LIMIT_ENABLED, RateLimitMiddleware, create_rate_limiter
+rate_limiter = create_rate_limiter(DATA_DIR)
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -74,30 +82,29 @@ storage = StorageAdapter()
 @app.on_event("startup")
 async def startup_event():
     from ai.reading_ai import ReadingAI
+    from ai.ingest_jobs import IngestJobManager
     app.state.ai_engine = ReadingAI(storage)
+    app.state.ingest_jobs = IngestJobManager(app.state.ai_engine)
+    await app.state.ingest_jobs.start()
+    if SMTP_HOST and SMTP_FROM:
+        await mail_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from ai.executors import shutdown_executors
+    await app.state.ingest_jobs.stop()
+    await app.state.ai_engine.aclose()
+    await mail_queue.stop()
+    shutdown_executors()
+    shutdown_hashing()
+
+@app.exception_handler(PoolBusyError)
+async def pool_busy_handler(request: Request, exc: PoolBusyError):
+    return JSONResponse(status_code=503, content={"detail": "服务繁忙，请稍后再试"})
 
 # 包含AI路由
 app.include_router(ai_router, prefix="/ai", tags=["AI"])
 
-# 数据操作函数
-def load_users() -> Dict[str, dict]:
-    try:
-        return json.loads(USERS_FILE.read_text())
-    except Exception:
-        return {}
-
-def save_users(users: Dict[str, dict]):
-    USERS_FILE.write_text(json.dumps(users, ensure_ascii=False, indent=2))
-
-def load_codes() -> Dict[str, dict]:
-    try:
-        return json.loads(CODES_FILE.read_text())
-    except Exception:
-        return {}
-
-def save_codes(codes: Dict[str, dict]):
-    CODES_FILE.write_text(json.dumps(codes, ensure_ascii=False, indent=2))
-
 # Token相关函数
 def create_access_token(sub: str) -> str:
     payload = {
@@ -127,9 +134,13 @@ def _decode_token(token: str) -> dict:
         raise HTTPException(status_code=401, detail="Token无效")
 
 def decode_access_token(token: str) -> dict:
+    payload = _verified_tokens.get(token)
+    if payload is not None:
+        return payload
     payload = _decode_token(token)
     if payload.get("type") != "access":
         raise HTTPException(status_code=401, detail="Token类型错误")
+    _verified_tokens.put(token, payload, payload.get("exp", 0))
     return payload
 
 def decode_refresh_token(token: str) -> dict:
@@ -177,12 +188,16 @@ SMTP_PASS = os.environ.get("SMTP_PASS", "")
 SMTP_FROM = os.environ.get("SMTP_FROM", SMTP_USER or "")
 SMTP_TLS = os.environ.get("SMTP_TLS", "true").lower() in {"1", "true", "yes"}
 
-def _send_code_email(to_email: str, code: str):
+# 外发邮件队列：后台发送并复用 SMTP 连接，接口不等待邮件发送
+from mail_queue import MailQueue, OutgoingMail, SMTPSession
+mail_queue = MailQueue(lambda: SMTPSession(SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS, SMTP_TLS))
+
+def _send_code_email(to_email: str, code: str) -> bool:
+    """验证码邮件加入发送队列，队列已满时返回False"""
     if not SMTP_HOST or not SMTP_FROM:
         print(f"[DEV] 验证码发送到 {to_email}: {code}")
-        return
+        return True
     
-    import smtplib
     from email.mime.text import MIMEText
     from email.header import Header
     
@@ -194,20 +209,7 @@ def _send_code_email(to_email: str, code: str):
     msg["From"] = SMTP_FROM
     msg["To"] = to_email
     
-    try:
-        if SMTP_TLS:
-            server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
-            server.starttls()
-        else:
-            server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
-        
-        if SMTP_USER and SMTP_PASS:
-            server.login(SMTP_USER, SMTP_PASS)
-        
-        server.sendmail(SMTP_FROM, [to_email], msg.as_string())
-        server.quit()
-    except Exception as e:
-        print(f"邮件发送失败: {e}")
+    return mail_queue.submit(OutgoingMail(SMTP_FROM, [to_email], msg.as_string()))
 
 # 认证依赖
 def get_current_user(request: Request) -> dict:
@@ -218,8 +220,7 @@ def get_current_user(request: Request) -> dict:
     token = auth.split(" ", 1)[1]
     payload = decode_access_token(token)
     email = payload.get("sub")
-    users = load_users()
-    user = users.get(email)
+    user = users_repo.get_user(email)
     
     if not user:
         raise HTTPException(status_code=401, detail="用户不存在")
@@ -227,28 +228,26 @@ def get_current_user(request: Request) -> dict:
 
 # 认证路由
 @app.post("/auth/register")
-def register(body: RegisterBody):
-    users = load_users()
+async def register(body: RegisterBody):
     email = body.email.lower()
     
-    if email in users:
+    if await run_in_threadpool(users_repo.get_user, email):
         raise HTTPException(status_code=400, detail="该邮箱已注册")
     
     if len(body.password) < 6:
         raise HTTPException(status_code=400, detail="密码至少6位")
     
-    codes = load_codes()
-    entry = codes.get(email)
+    entry = await run_in_threadpool(users_repo.get_code, email)
     if not entry:
         raise HTTPException(status_code=400, detail="请先获取验证码")
     
     if entry.get("expires", 0) < _now_ts():
         raise HTTPException(status_code=400, detail="验证码已过期")
     
-    if not bcrypt.verify(body.code, entry.get("hash", "")):
+    if not await code_hasher.verify(email, body.code, entry.get("hash", "")):
         raise HTTPException(status_code=400, detail="验证码错误")
     
-    hashed = bcrypt.hash(body.password)
+    hashed = await hash_password(body.password)
     user = {
         "id": str(int(time.time() * 1000)),
         "name": body.name or email.split("@")[0],
@@ -258,11 +257,10 @@ def register(body: RegisterBody):
         "createdAt": int(time.time()),
     }
     
-    users[email] = user
-    save_users(users)
+    if not await run_in_threadpool(users_repo.create_user, user):
+        raise HTTPException(status_code=400, detail="该邮箱已注册")
     
-    codes.pop(email, None)
-    save_codes(codes)
+    await run_in_threadpool(users_repo.delete_code, email)
     
     access = create_access_token(email)
     refresh = create_refresh_token(email)
@@ -274,15 +272,14 @@ def register(body: RegisterBody):
     }
 
 @app.post("/auth/login")
-def login(body: LoginBody):
-    users = load_users()
+async def login(body: LoginBody):
     email = body.email.lower()
-    user = users.get(email)
+    user = await run_in_threadpool(users_repo.get_user, email)
     
     if not user:
         raise HTTPException(status_code=401, detail="邮箱或密码错误")
     
-    if not bcrypt.verify(body.password, user.get("passwordHash", "")):
+    if not await verify_password(body.password, user.get("passwordHash", "")):
         raise HTTPException(status_code=401, detail="邮箱或密码错误")
     
     access = create_access_token(email)
@@ -295,10 +292,9 @@ def login(body: LoginBody):
     }
 
 @app.post("/auth/login-code")
-def login_code(body: LoginCodeBody):
+async def login_code(body: LoginCodeBody):
     email = body.email.lower()
-    codes = load_codes()
-    entry = codes.get(email)
+    entry = await run_in_threadpool(users_repo.get_code, email)
     
     if not entry:
         raise HTTPException(status_code=400, detail="请先获取验证码")
@@ -306,16 +302,16 @@ def login_code(body: LoginCodeBody):
     if entry.get("expires", 0) < _now_ts():
         raise HTTPException(status_code=400, detail="验证码已过期")
     
-    if not bcrypt.verify(body.code, entry.get("hash", "")):
+    if not await code_hasher.verify(email, body.code, entry.get("hash", "")):
         raise HTTPException(status_code=400, detail="验证码错误")
     
-    users = load_users()
-    user = users.get(email)
+    user = await run_in_threadpool(users_repo.get_user, email)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在，请先注册")
     
-    codes.pop(email, None)
-    save_codes(codes)
+    # 只删除本次校验的验证码；并发使用同一验证码时只有一个请求成功
+    if not await run_in_threadpool(users_repo.delete_code, email, entry["hash"]):
+        raise HTTPException(status_code=400, detail="验证码已失效")
     
     access = create_access_token(email)
     refresh = create_refresh_token(email)
@@ -330,6 +326,11 @@ def login_code(body: LoginCodeBody):
 def me(current_user: dict = Depends(get_current_user)):
     return {k: v for k, v in current_user.items() if k != "passwordHash"}
 
+@app.get("/auth/stats")
+def auth_stats(current_user: dict = Depends(get_current_user)):
+    return {"hashing": hashing_stats(), "users": users_repo.stats(), "rateLimit": rate_limiter.stats(),
+            "mail": mail_queue.stats()}
+
 @app.post("/auth/logout")
 def logout():
     return {"ok": True}
@@ -343,36 +344,36 @@ def refresh(request: Request):
     token = auth.split(" ", 1)[1]
     payload = decode_refresh_token(token)
     email = payload.get("sub")
-    users = load_users()
     
-    if email not in users:
+    if not users_repo.get_user(email):
         raise HTTPException(status_code=401, detail="用户不存在")
     
     access = create_access_token(email)
     return {"accessToken": access}
 
 @app.post("/auth/request-code")
-def request_code(body: LoginBody):
+async def request_code(body: LoginBody):
     email = body.email.lower()
     now = _now_ts()
-    codes = load_codes()
-    entry = codes.get(email)
+    entry = await run_in_threadpool(users_repo.get_code, email)
     
     if entry and now - int(entry.get("sentAt", 0)) < CODE_RATE_LIMIT_SECONDS:
         raise HTTPException(status_code=429, detail="请求过于频繁，请稍后再试")
     
     code = _gen_code()
-    codes[email] = {
-        "hash": bcrypt.hash(code),
+    new_entry = {
+        "hash": code_hasher.hash(email, code),
         "sentAt": now,
         "expires": now + CODE_TTL_SECONDS,
     }
-    save_codes(codes)
+    if not await run_in_threadpool(users_repo.put_code, email, new_entry, CODE_RATE_LIMIT_SECONDS):
+        raise HTTPException(status_code=429, detail="请求过于频繁，请稍后再试")
+    await run_in_threadpool(users_repo.purge_expired_codes, now)
     
-    try:
-        _send_code_email(email, code)
-    except Exception:
-        print(f"[WARN] 邮件发送失败，但验证码已生成：{email} -> {code}")
+    if not _send_code_email(email, code):
+        # 未能发出的验证码不占用频率限制，稍后可以重新申请
+        await run_in_threadpool(users_repo.delete_code, email, new_entry["hash"])
+        raise HTTPException(status_code=503, detail="邮件队列繁忙，请稍后再试")
     
     if not SMTP_HOST or not SMTP_FROM:
         return {"ok": True, "devCode": code}
@@ -382,8 +383,7 @@ def request_code(body: LoginBody):
 @app.get("/storage/presign/get")
 def storage_presign_get(key: str, current_user: dict = Depends(get_current_user)):
     try:
-        from storage_adapter import _presign_get_url
-        url = _presign_get_url(key)
+        url = storage.get_presign_url(key)
         return {"url": url}
     except HTTPException:
         raise
@@ -393,8 +393,7 @@ def storage_presign_get(key: str, current_user: dict = Depends(get_current_user)
 @app.post("/storage/presign/put")
 def storage_presign_put(body: PresignPutBody, current_user: dict = Depends(get_current_user)):
     try:
-        from storage_adapter import _presign_put_url
-        url, headers = _presign_put_url(body.key, body.contentType or "application/octet-stream")
+        url, headers = storage.get_presign_put_url(body.key, body.contentType or "application/octet-stream")
         return {"url": url, "headers": headers}
     except HTTPException:
         raise
@@ -403,58 +402,12 @@ def storage_presign_put(body: PresignPutBody, current_user: dict = Depends(get_c
 
 # 文本处理函数
 def _extract_text(file_bytes: bytes, file_type: str) -> str:
-    ft = file_type.lower()
-    
-    if ft in {"txt", "md"}:
-        for enc in ("utf-8", "gb18030", "latin-1"):
-            try:
-                return file_bytes.decode(enc)
-            except Exception:
-                pass
-        return file_bytes.decode("utf-8", errors="ignore")
-    
-    if ft in {"html", "htm"}:
-        txt = file_bytes.decode("utf-8", errors="ignore")
-        txt = re.sub(r"<script[\s\S]*?</script>", " ", txt, flags=re.IGNORECASE)
-        txt = re.sub(r"<style[\s\S]*?</style>", " ", txt, flags=re.IGNORECASE)
-        txt = re.sub(r"<[^>]+>", " ", txt)
-        txt = re.sub(r"\s+", " ", txt)
-        return txt.strip()
-    
-    if ft == "epub":
-        try:
-            zf = zipfile.ZipFile(io.BytesIO(file_bytes))
-            texts = []
-            for name in zf.namelist():
-                if name.lower().endswith((".xhtml", ".html", ".htm")):
-                    try:
-                        raw = zf.read(name).decode("utf-8", errors="ignore")
-                        clean = re.sub(r"<script[\s\S]*?</script>", " ", raw, flags=re.IGNORECASE)
-                        clean = re.sub(r"<style[\s\S]*?</style>", " ", clean, flags=re.IGNORECASE)
-                        clean = re.sub(r"<[^>]+>", " ", clean)
-                        clean = re.sub(r"\s+", " ", clean)
-                        texts.append(clean.strip())
-                    except Exception:
-                        pass
-            return "\n".join(texts)
-        except Exception:
-            return ""
-    
-    return ""
+    from ai.text_extraction import iter_text_segments
+    return "".join(iter_text_segments(io.BytesIO(file_bytes), file_type)).strip()
 
 def _chunk_text(text: str, max_chars: int = 2000, overlap: int = 200) -> list:
-    chunks = []
-    i = 0
-    n = len(text)
-    
-    while i < n:
-        end = min(i + max_chars, n)
-        chunks.append(text[i:end])
-        i = end - overlap
-        if i < 0:
-            i = 0
-    
-    return [c.strip() for c in chunks if c.strip()]
+    from ai.chunker import Chunker
+    return [chunk_text for _, _, chunk_text in Chunker(size=max_chars, overlap=overlap, min_chars=0).split(text)]
 
 # 应用启动
 if __name__ == "__main__":
@@ -0,0 +1,280 @@
+import asyncio
+import ipaddress
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple, Union
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() in {"1", "true", "yes"}
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory").lower()  # memory | sqlite
+RATE_LIMIT_DB_PATH = os.environ.get("RATE_LIMIT_DB_PATH", "")
+# 格式：<次数>/<秒数>
+RATE_LIMIT_IP = os.environ.get("RATE_LIMIT_IP", "30/60")
+RATE_LIMIT_ACCOUNT = os.environ.get("RATE_LIMIT_ACCOUNT", "10/60")
+# 可信反向代理（逗号分隔的地址或网段）：直连方是其中之一时才读取 X-Forwarded-For / X-Real-IP，
+# 默认只信任本机，与 deploy/nginx.conf（同机 Nginx 转发到 127.0.0.1:8000）配套；置空则始终按直连地址计数
+RATE_LIMIT_TRUSTED_PROXIES = os.environ.get("RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.1,::1")
+# 读取请求体以识别账号时的大小上限
+_MAX_BODY_BYTES = 64 * 1024
+
+
+@dataclass(frozen=True)
+class Limit:
+    """window秒内最多count次：令牌桶容量为count，每秒补充count/window个令牌"""
+    count: int
+    window: float
+
+    @classmethod
+    def parse(cls, spec: str) -> "Limit":
+        count, window = spec.split("/", 1)
+        return cls(int(count), float(window))
+
+    @property
+    def rate(self) -> float:
+        return self.count / self.window
+
+
+@dataclass(frozen=True)
+class Rule:
+    group: str
+    ip: Optional[Limit]
+    account: Optional[Limit]
+
+
+def _refill(tokens: float, updated: float, limit: Limit, now: float) -> float:
+    return min(float(limit.count), tokens + (now - updated) * limit.rate)
+
+
+class MemoryBucketStore:
+    """进程内令牌桶（多个 uvicorn worker 之间不共享）"""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> (令牌数, 更新时间)，按最近使用排序
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, now: float) -> float:
+        """取一个令牌；成功返回0，否则返回需要等待的秒数"""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(limit.count), now))
+            tokens = _refill(tokens, updated, limit, now)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / limit.rate
+            self._buckets[key] = (tokens - 1 if wait == 0 else tokens, now)
+            self._buckets.move_to_end(key)
+            # 超过上限时淘汰最久未使用的桶，每次请求至多淘汰一个
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class SQLiteBucketStore:
+    """SQLite 中的令牌桶，同一数据文件的多个进程共享限流状态"""
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._last_prune = 0.0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, limit: Limit, now: float) -> float:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(row[0], row[1], limit, now) if row else float(limit.count)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / limit.rate
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens - 1 if wait == 0 else tokens, now),
+            )
+            if now - self._last_prune > limit.window:
+                self._last_prune = now
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - limit.window,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class RateLimiter:
+    """按 IP 与账号分别限流"""
+
+    def __init__(self, store, rules: Dict[str, Rule]):
+        self.store = store
+        self.rules = rules
+        self.allowed = 0
+        self.limited = 0
+
+    def check(self, rule: Rule, ip: str, account: Optional[str]) -> float:
+        """返回0表示放行，否则为建议的重试等待秒数"""
+        now = time.time()
+        checks = []
+        if rule.ip is not None:
+            checks.append((f"ip:{rule.group}:{ip}", rule.ip))
+        if rule.account is not None and account:
+            checks.append((f"account:{rule.group}:{account}", rule.account))
+        for key, limit in checks:
+            wait = self.store.take(key, limit, now)
+            if wait > 0:
+                self.limited += 1
+                return wait
+        self.allowed += 1
+        return 0.0
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": type(self.store).__name__, "allowed": self.allowed, "limited": self.limited}
+
+
+class RateLimitMiddleware:
+    """ASGI 中间件：对配置的 POST 路径按规则限流，超限返回 429 和 Retry-After"""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        rule = self.limiter.rules.get(scope.get("path", "")) if scope["type"] == "http" else None
+        if rule is None or scope.get("method") != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        account = None
+        if rule.account is not None:
+            body, receive = await _buffer_body(receive)
+            account = _account_from_body(body)
+        ip = _client_ip(scope)
+        if self.limiter.store.blocking:
+            wait = await asyncio.to_thread(self.limiter.check, rule, ip, account)
+        else:
+            wait = self.limiter.check(rule, ip, account)
+        if wait > 0:
+            await _send_429(send, wait)
+            return
+        await self.app(scope, receive, send)
+
+
+async def _buffer_body(receive):
+    """读出请求体并返回可重放的 receive"""
+    chunks = []
+    size = 0
+    more = True
+    while more:
+        message = await receive()
+        if message["type"] != "http.request":
+            # 客户端断开等消息原样交给应用
+            pending = [message]
+
+            async def replay_disconnect():
+                return pending.pop() if pending else await receive()
+            return b"", replay_disconnect
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        chunks.append(chunk)
+        more = message.get("more_body", False)
+    body = b"".join(chunks)
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+    return (body if size <= _MAX_BODY_BYTES else b""), replay
+
+
+def _account_from_body(body: bytes) -> Optional[str]:
+    try:
+        email = json.loads(body).get("email")
+    except Exception:
+        return None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def _parse_networks(spec: str) -> Tuple[Union[ipaddress.IPv4Network, ipaddress.IPv6Network], ...]:
+    return tuple(ipaddress.ip_network(part.strip(), strict=False) for part in spec.split(",") if part.strip())
+
+
+_TRUSTED_PROXIES = _parse_networks(RATE_LIMIT_TRUSTED_PROXIES)
+
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _TRUSTED_PROXIES)
+
+
+def _client_ip(scope) -> str:
+    """客户端地址：直连方是可信代理时，取 X-Forwarded-For 中从右往左第一个不可信的地址
+    （左侧的条目由客户端自己填写，可以伪造），没有该头时取 X-Real-IP"""
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    if not _is_trusted(peer):
+        return peer
+    forwarded = []
+    real_ip = None
+    for name, value in scope.get("headers", []):
+        if name == b"x-forwarded-for":
+            forwarded.extend(part.strip() for part in value.decode("latin-1").split(","))
+        elif name == b"x-real-ip":
+            real_ip = value.decode("latin-1").strip()
+    for address in reversed(forwarded):
+        if address and not _is_trusted(address):
+            return address
+    return real_ip or peer
+
+
+async def _send_429(send, wait: float):
+    body = json.dumps({"detail": "请求过于频繁，请稍后再试"}, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, int(wait + 0.999))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_rate_limiter(data_dir) -> RateLimiter:
+    """认证接口的默认规则：登录与验证码登录共用账号维度的额度"""
+    ip_limit = Limit.parse(RATE_LIMIT_IP)
+    account_limit = Limit.parse(RATE_LIMIT_ACCOUNT)
+    rules = {
+        "/auth/login": Rule("login", ip_limit, account_limit),
+        "/auth/login-code": Rule("login", ip_limit, account_limit),
+        "/auth/register": Rule("register", ip_limit, account_limit),
+        "/auth/request-code": Rule("code", ip_limit, account_limit),
+        "/auth/refresh": Rule("refresh", ip_limit, None),
+    }
+    if RATE_LIMIT_BACKEND == "sqlite":
+        store = SQLiteBucketStore(RATE_LIMIT_DB_PATH or os.path.join(str(data_dir), "ratelimit.db"))
+    else:
+        store = MemoryBucketStore()
+    return RateLimiter(store, rules)
@@ -1,9 +1,17 @@
+import io
+import mmap
 import os
-from typing import Optional, Tuple
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 from urllib import request as urlrequest
 
 from fastapi import HTTPException
 
+from storage_cache import STORAGE_CACHE_MAX_BYTES, DiskCache
+
 # Optional: MinIO (S3-compatible)
 try:
     from minio import Minio
@@ -24,7 +32,7 @@ except Exception:
 # ------------------------------
 # Cloud/Object Storage Settings
 # ------------------------------
-STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "none").lower()
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "none").lower()  # none | minio | cos | local
 
 # MinIO/S3-compatible settings
 STORAGE_ENDPOINT = os.environ.get("STORAGE_ENDPOINT", "")
@@ -34,6 +42,19 @@ STORAGE_SECRET_KEY = os.environ.get("STORAGE_SECRET_KEY", "")
 STORAGE_REGION = os.environ.get("STORAGE_REGION", "")
 STORAGE_SECURE = os.environ.get("STORAGE_SECURE", "true").lower() in {"1", "true", "yes"}
 STORAGE_URL_EXPIRES = int(os.environ.get("STORAGE_URL_EXPIRES", "600"))  # seconds
+# Ranged/streaming reads
+STORAGE_STREAM_CHUNK_BYTES = int(os.environ.get("STORAGE_STREAM_CHUNK_BYTES", str(1024 * 1024)))
+STORAGE_RANGE_MERGE_GAP = int(os.environ.get("STORAGE_RANGE_MERGE_GAP", str(64 * 1024)))  # bytes
+# Multipart uploads (S3/COS require parts of at least 5MB except the last one)
+STORAGE_PART_SIZE = max(5 * 1024 * 1024, int(os.environ.get("STORAGE_PART_SIZE", str(8 * 1024 * 1024))))
+STORAGE_UPLOAD_PARALLEL = int(os.environ.get("STORAGE_UPLOAD_PARALLEL", "4"))
+# Local read-through cache (0 disables)
+DATA_DIR = os.environ.get("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+STORAGE_CACHE_DIR = os.environ.get("STORAGE_CACHE_DIR", "") or os.path.join(DATA_DIR, "storage_cache")
+
+# Local filesystem backend
+STORAGE_LOCAL_DIR = os.environ.get("STORAGE_LOCAL_DIR", "") or os.path.join(DATA_DIR, "objects")
+STORAGE_LOCAL_URL_BASE = os.environ.get("STORAGE_LOCAL_URL_BASE", "").rstrip("/")
 
 # COS-specific settings
 COS_BUCKET = os.environ.get("COS_BUCKET", "")
@@ -44,11 +65,15 @@ COS_SCHEME = os.environ.get("COS_SCHEME", "https")
 
 _minio_client: Optional[Minio] = None
 _cos_client: Optional[CosS3Client] = None
+_disk_cache: Optional[DiskCache] = None
+_disk_cache_lock = threading.Lock()
 
 def _ensure_storage_ready():
     global _minio_client, _cos_client
     if STORAGE_BACKEND == "none":
         raise HTTPException(status_code=501, detail="未启用云存储")
+    if STORAGE_BACKEND == "local":
+        raise HTTPException(status_code=501, detail="本地存储不支持该操作")
     if STORAGE_BACKEND == "minio":
         if not _MINIO_AVAILABLE:
             raise HTTPException(status_code=500, detail="后端未安装 MinIO 依赖包")
@@ -119,42 +144,167 @@ def _presign_put_url(object_key: str, content_type: str = "application/octet-str
         return url, {"Content-Type": content_type}
     raise HTTPException(status_code=500, detail="未实现的存储后端")
 
-def _storage_download(key: str) -> bytes:
+def _range_header(offset: int, length: Optional[int]) -> Optional[str]:
+    """HTTP Range 头；读取整个对象时返回None"""
+    if offset <= 0 and length is None:
+        return None
+    end = "" if length is None else str(offset + length - 1)
+    return f"bytes={offset}-{end}"
+
+def _http_get(url: str, offset: int = 0, length: Optional[int] = None):
+    """通过预签名 URL 读取（可带 Range），返回响应对象"""
+    req = urlrequest.Request(url)
+    header = _range_header(offset, length)
+    if header:
+        req.add_header("Range", header)
+    return urlrequest.urlopen(req)
+
+def _get_disk_cache() -> Optional[DiskCache]:
+    global _disk_cache
+    if _disk_cache is None and STORAGE_CACHE_MAX_BYTES > 0:
+        with _disk_cache_lock:
+            if _disk_cache is None:
+                _disk_cache = DiskCache(STORAGE_CACHE_DIR, STORAGE_CACHE_MAX_BYTES)
+    return _disk_cache
+
+def _storage_download(key: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+    """读取对象；提供 offset/length 时只读取该字节区间（length为None表示读到末尾）
+
+    启用本地缓存时按 (对象键, ETag) 读写缓存：整对象读取未命中时下载并写入缓存；
+    区间读取不写缓存，只有该对象已缓存过时才查询ETag并从本地文件读取，否则直接发起区间请求。
+    """
+    if length is not None and length <= 0:
+        return b""
+    cache = _get_disk_cache()
+    if cache is None:
+        return _storage_fetch(key, offset, length)
+    if offset > 0 or length is not None:
+        return _cached_range(cache, key, _range_etag(cache, key), offset, length)
+    etag = _etag_or_none(key)
+    if not etag:
+        return _storage_fetch(key)
+    return cache.get_or_fill(key, etag, lambda: _storage_fetch(key))
+
+def _etag_or_none(key: str) -> Optional[str]:
+    try:
+        return _storage_etag(key)
+    except HTTPException:
+        raise
+    except Exception:
+        return None
+
+def _range_etag(cache: Optional[DiskCache], key: str) -> Optional[str]:
+    """区间读取用的ETag：对象没有缓存版本时不查询（省去一次HEAD请求）"""
+    if cache is None or not cache.holds(key):
+        return None
+    return _etag_or_none(key)
+
+def _cached_range(cache: Optional[DiskCache], key: str, etag: Optional[str],
+                  offset: int, length: Optional[int]) -> bytes:
+    data = cache.read_range(key, etag, offset, length) if cache is not None and etag else None
+    return data if data is not None else _storage_fetch(key, offset, length)
+
+def _storage_fetch(key: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+    """直接从对象存储读取（不经过本地缓存）"""
     _ensure_storage_ready()
     if STORAGE_BACKEND == "minio":
         assert _minio_client is not None
         try:
-            resp = _minio_client.get_object(STORAGE_BUCKET, key)
+            resp = _minio_client.get_object(STORAGE_BUCKET, key, offset=offset, length=length or 0)
             data = resp.read()
             resp.close()
             resp.release_conn()
             return data
         except Exception:
             url = _presign_get_url(key)
-            with urlrequest.urlopen(url) as r:
+            with _http_get(url, offset, length) as r:
                 return r.read()
     if STORAGE_BACKEND == "cos":
         assert _cos_client is not None
         try:
-            resp = _cos_client.get_object(Bucket=COS_BUCKET, Key=key)
+            header = _range_header(offset, length)
+            if header:
+                resp = _cos_client.get_object(Bucket=COS_BUCKET, Key=key, Range=header)
+            else:
+                resp = _cos_client.get_object(Bucket=COS_BUCKET, Key=key)
             body = resp.get("Body")
             data = body.read() if hasattr(body, "read") else body.get_raw_stream().read()
             return data
         except Exception:
             url = _presign_get_url(key)
-            with urlrequest.urlopen(url) as r:
+            with _http_get(url, offset, length) as r:
                 return r.read()
     raise HTTPException(status_code=500, detail="未实现的存储后端")
 
+def _storage_download_ranges(key: str, ranges: Sequence[Tuple[int, int]]) -> List[bytes]:
+    """批量读取多个 (offset, length) 区间，按输入顺序返回
+
+    相邻或间隔不超过 STORAGE_RANGE_MERGE_GAP 的区间合并为一次请求，再在本地切分。
+    """
+    order = sorted((offset, offset + length, i) for i, (offset, length) in enumerate(ranges) if length > 0)
+    results = [b""] * len(ranges)
+    groups: List[Tuple[int, int, List[Tuple[int, int, int]]]] = []
+    for start, end, i in order:
+        if groups and start - groups[-1][1] <= STORAGE_RANGE_MERGE_GAP:
+            base, stop, members = groups[-1]
+            groups[-1] = (base, max(stop, end), members)
+        else:
+            groups.append((start, end, []))
+        groups[-1][2].append((start, end, i))
+    if not groups:
+        return results
+    cache = _get_disk_cache()
+    # 所有区间共用一次ETag查询
+    etag = _range_etag(cache, key)
+    for base, stop, members in groups:
+        data = _cached_range(cache, key, etag, base, stop - base)
+        for start, end, i in members:
+            results[i] = data[start - base:end - base]
+    return results
+
+def _storage_stream(key: str, offset: int = 0, length: Optional[int] = None,
+                    chunk_size: int = STORAGE_STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """流式读取对象（或其中一段），每次产出不超过 chunk_size 字节，不在内存中拼出整个对象"""
+    if length is not None and length <= 0:
+        return
+    _ensure_storage_ready()
+    if STORAGE_BACKEND == "minio":
+        assert _minio_client is not None
+        resp = _minio_client.get_object(STORAGE_BUCKET, key, offset=offset, length=length or 0)
+        try:
+            yield from resp.stream(chunk_size)
+        finally:
+            resp.close()
+            resp.release_conn()
+        return
+    if STORAGE_BACKEND == "cos":
+        assert _cos_client is not None
+        header = _range_header(offset, length)
+        if header:
+            resp = _cos_client.get_object(Bucket=COS_BUCKET, Key=key, Range=header)
+        else:
+            resp = _cos_client.get_object(Bucket=COS_BUCKET, Key=key)
+        raw = resp["Body"].get_raw_stream()
+        try:
+            for block in iter(lambda: raw.read(chunk_size), b""):
+                yield block
+        finally:
+            raw.close()
+        return
+    raise HTTPException(status_code=500, detail="未实现的存储后端")
+
 def _storage_upload(key: str, data: bytes, content_type: str = "application/octet-stream"):
     _ensure_storage_ready()
+    if len(data) > STORAGE_PART_SIZE:
+        # 大对象分片并行上传
+        _storage_upload_stream(key, io.BytesIO(data), content_type=content_type, length=len(data))
+        return
     if STORAGE_BACKEND == "minio":
         assert _minio_client is not None
-        import io as _io
         _minio_client.put_object(
             STORAGE_BUCKET,
             key,
-            _io.BytesIO(data),
+            io.BytesIO(data),
             length=len(data),
             content_type=content_type,
         )
@@ -173,3 +323,412 @@ def _storage_upload(key: str, data: bytes, content_type: str = "application/octe
             raise HTTPException(status_code=500, detail=f"COS 上传失败: {e}")
     raise HTTPException(status_code=500, detail="未实现的存储后端")
 
+
+class _IterReader(io.RawIOBase):
+    """把字节块迭代器包装成只读文件对象"""
+
+    def __init__(self, blocks: Iterable[bytes]):
+        self._blocks = iter(blocks)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._blocks)
+            except StopIteration:
+                return 0
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+class _CountingReader:
+    """统计已读取字节数的文件对象包装"""
+
+    def __init__(self, raw: BinaryIO):
+        self._raw = raw
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._raw.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def _read_part(reader: BinaryIO, size: int) -> bytes:
+    """读满一个分片（文件对象可能一次返回不足size字节），到末尾时返回较短的数据"""
+    parts = []
+    remaining = size
+    while remaining > 0:
+        data = reader.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b"".join(parts)
+
+
+def _storage_upload_stream(key: str, source: Union[BinaryIO, Iterable[bytes]],
+                           content_type: str = "application/octet-stream", length: Optional[int] = None,
+                           part_size: Optional[int] = None,
+                           parallel: Optional[int] = None) -> Dict[str, float]:
+    """流式上传文件对象或字节块迭代器，不在内存中拼出整个对象
+
+    超过一个分片的对象走分片上传，最多parallel个分片同时传输（内存占用约为parallel个分片）。
+    分片大小与并发数默认取 STORAGE_PART_SIZE 与 STORAGE_UPLOAD_PARALLEL。返回字节数、分片数、耗时与吞吐。
+    """
+    _ensure_storage_ready()
+    part_size = part_size or STORAGE_PART_SIZE
+    parallel = parallel or STORAGE_UPLOAD_PARALLEL
+    reader = source if hasattr(source, "read") else io.BufferedReader(_IterReader(source))
+    started = time.perf_counter()
+    if STORAGE_BACKEND == "minio":
+        assert _minio_client is not None
+        counting = _CountingReader(reader)
+        _minio_client.put_object(
+            STORAGE_BUCKET,
+            key,
+            counting,
+            length=length if length is not None else -1,
+            part_size=part_size,
+            num_parallel_uploads=max(1, parallel),
+            content_type=content_type,
+        )
+        total = counting.bytes_read
+        parts = max(1, -(-total // part_size))
+    elif STORAGE_BACKEND == "cos":
+        assert _cos_client is not None
+        try:
+            total, parts = _cos_multipart_upload(key, reader, content_type, part_size, parallel)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"COS 上传失败: {e}")
+    else:
+        raise HTTPException(status_code=500, detail="未实现的存储后端")
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    return {
+        "bytes": total,
+        "parts": parts,
+        "seconds": round(elapsed, 3),
+        "mbPerSecond": round(total / (1024 * 1024) / elapsed, 2),
+    }
+
+
+def _cos_multipart_upload(key: str, reader: BinaryIO, content_type: str,
+                          part_size: int, parallel: int) -> Tuple[int, int]:
+    """COS分片上传，返回 (字节数, 分片数)；只有一个分片时直接普通上传"""
+    assert _cos_client is not None
+    first = _read_part(reader, part_size)
+    if len(first) < part_size:
+        _cos_client.put_object(Bucket=COS_BUCKET, Key=key, Body=first, ContentType=content_type)
+        return len(first), 1
+
+    upload_id = _cos_client.create_multipart_upload(Bucket=COS_BUCKET, Key=key, ContentType=content_type)["UploadId"]
+
+    def send(number: int, data: bytes) -> Dict[str, object]:
+        resp = _cos_client.upload_part(Bucket=COS_BUCKET, Key=key, Body=data, PartNumber=number, UploadId=upload_id)
+        return {"PartNumber": number, "ETag": resp["ETag"]}
+
+    uploaded: List[Dict[str, object]] = []
+    total = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+            running: set = set()
+            number, data = 1, first
+            while data:
+                if len(running) >= max(1, parallel):
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    uploaded.extend(f.result() for f in done)
+                running.add(pool.submit(send, number, data))
+                total += len(data)
+                number += 1
+                data = _read_part(reader, part_size)
+            uploaded.extend(f.result() for f in running)
+        uploaded.sort(key=lambda part: part["PartNumber"])
+        _cos_client.complete_multipart_upload(
+            Bucket=COS_BUCKET, Key=key, UploadId=upload_id, MultipartUpload={"Part": uploaded},
+        )
+    except BaseException:
+        try:
+            _cos_client.abort_multipart_upload(Bucket=COS_BUCKET, Key=key, UploadId=upload_id)
+        except Exception:
+            pass
+        raise
+    return total, len(uploaded)
+
+
+def _storage_cache_stats() -> Optional[dict]:
+    """本地缓存统计；未启用时返回None"""
+    cache = _get_disk_cache()
+    return cache.stats() if cache is not None else None
+
+
+def _storage_etag(key: str) -> Optional[str]:
+    _ensure_storage_ready()
+    if STORAGE_BACKEND == "minio":
+        assert _minio_client is not None
+        stat = _minio_client.stat_object(STORAGE_BUCKET, key)
+        return stat.etag
+    if STORAGE_BACKEND == "cos":
+        assert _cos_client is not None
+        resp = _cos_client.head_object(Bucket=COS_BUCKET, Key=key)
+        return resp.get("ETag")
+    raise HTTPException(status_code=500, detail="未实现的存储后端")
+
+
+def _storage_list(prefix: str) -> List[Tuple[str, int]]:
+    """列出前缀下的对象，返回 (对象键, 字节数) 列表"""
+    _ensure_storage_ready()
+    if STORAGE_BACKEND == "minio":
+        assert _minio_client is not None
+        return [
+            (obj.object_name, obj.size or 0)
+            for obj in _minio_client.list_objects(STORAGE_BUCKET, prefix=prefix, recursive=True)
+            if not obj.is_dir
+        ]
+    if STORAGE_BACKEND == "cos":
+        assert _cos_client is not None
+        items: List[Tuple[str, int]] = []
+        marker = ""
+        while True:
+            resp = _cos_client.list_objects(Bucket=COS_BUCKET, Prefix=prefix, Marker=marker, MaxKeys=1000)
+            for obj in resp.get("Contents", []):
+                items.append((obj["Key"], int(obj.get("Size", 0))))
+            if resp.get("IsTruncated") != "true":
+                return items
+            marker = resp.get("NextMarker") or items[-1][0]
+    raise HTTPException(status_code=500, detail="未实现的存储后端")
+
+
+
+# ------------------------------
+# Storage backends
+# ------------------------------
+class ObjectStorageBackend:
+    """MinIO/COS 后端（STORAGE_BACKEND=none 时各操作返回 501）"""
+
+    # 不能内存映射，map 会下载整个对象
+    mappable = False
+
+    def __init__(self):
+        self.name = STORAGE_BACKEND
+
+    def read(self, key: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        return _storage_download(key, offset, length)
+
+    def read_ranges(self, key: str, ranges: Sequence[Tuple[int, int]]) -> List[bytes]:
+        return _storage_download_ranges(key, ranges)
+
+    def map(self, key: str):
+        return _storage_download(key)
+
+    def stream(self, key: str, offset: int, length: Optional[int], chunk_size: int) -> Iterator[bytes]:
+        return _storage_stream(key, offset, length, chunk_size)
+
+    def write(self, key: str, data: bytes, content_type: str):
+        _storage_upload(key, data, content_type)
+
+    def write_stream(self, key: str, source, content_type: str, length: Optional[int]) -> Dict[str, float]:
+        return _storage_upload_stream(key, source, content_type=content_type, length=length)
+
+    def etag(self, key: str) -> Optional[str]:
+        return _storage_etag(key)
+
+    def list(self, prefix: str) -> List[Tuple[str, int]]:
+        return _storage_list(prefix)
+
+    def presign_get(self, key: str) -> str:
+        return _presign_get_url(key)
+
+    def presign_put(self, key: str, content_type: str) -> Tuple[str, dict]:
+        return _presign_put_url(key, content_type)
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": self.name, "cache": _storage_cache_stats()}
+
+
+class LocalStorageBackend:
+    """本地磁盘后端：对象键即根目录下的相对路径，读取走 mmap，写入先写临时文件再原子重命名"""
+
+    name = "local"
+    mappable = True
+
+    def __init__(self, root: str = STORAGE_LOCAL_DIR):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise HTTPException(status_code=400, detail=f"非法的对象键: {key}")
+        return path
+
+    def map(self, key: str):
+        """只读映射整个对象（空文件返回b""）；替换写入不影响已映射的旧版本"""
+        with open(self._path(key), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, key: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        mapped = self.map(key)
+        try:
+            return mapped[offset:None if length is None else offset + length]
+        finally:
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    def read_ranges(self, key: str, ranges: Sequence[Tuple[int, int]]) -> List[bytes]:
+        mapped = self.map(key)
+        try:
+            return [mapped[offset:offset + length] if length > 0 else b"" for offset, length in ranges]
+        finally:
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    def stream(self, key: str, offset: int, length: Optional[int], chunk_size: int) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            f.seek(offset)
+            remaining = length
+            while remaining is None or remaining > 0:
+                block = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not block:
+                    break
+                if remaining is not None:
+                    remaining -= len(block)
+                yield block
+
+    def write(self, key: str, data: bytes, content_type: str):
+        self.write_stream(key, [data], content_type, len(data))
+
+    def write_stream(self, key: str, source, content_type: str, length: Optional[int]) -> Dict[str, float]:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        started = time.perf_counter()
+        total = 0
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if hasattr(source, "read"):
+                    for block in iter(lambda: source.read(STORAGE_STREAM_CHUNK_BYTES), b""):
+                        total += f.write(block)
+                else:
+                    for block in source:
+                        total += f.write(block)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        return {
+            "bytes": total,
+            "parts": 1,
+            "seconds": round(elapsed, 3),
+            "mbPerSecond": round(total / (1024 * 1024) / elapsed, 2),
+        }
+
+    def etag(self, key: str) -> Optional[str]:
+        # 每次写入都是新文件（原子重命名），inode 与修改时间一起区分版本
+        stat = os.stat(self._path(key))
+        return f"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+    def list(self, prefix: str) -> List[Tuple[str, int]]:
+        items: List[Tuple[str, int]] = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    items.append((key, os.path.getsize(path)))
+        return sorted(items)
+
+    def presign_get(self, key: str) -> str:
+        # 服务器上的文件路径对客户端没有意义，未配置下载地址时与预签名上传一样不支持
+        if not STORAGE_LOCAL_URL_BASE:
+            raise HTTPException(status_code=501, detail="本地存储未配置 STORAGE_LOCAL_URL_BASE，无法生成下载链接")
+        self._path(key)
+        return f"{STORAGE_LOCAL_URL_BASE}/{key}"
+
+    def presign_put(self, key: str, content_type: str) -> Tuple[str, dict]:
+        raise HTTPException(status_code=501, detail="本地存储不支持预签名上传")
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": self.name, "root": self.root}
+
+
+def _create_backend():
+    if STORAGE_BACKEND == "local":
+        return LocalStorageBackend()
+    return ObjectStorageBackend()
+
+
+class StorageAdapter:
+    """对象存储接口：按 STORAGE_BACKEND 选择本地磁盘或 MinIO/COS 后端"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or _create_backend()
+
+    def upload_bytes(self, key: str, data: bytes, content_type: str = "application/octet-stream"):
+        self.backend.write(key, data, content_type)
+
+    def upload_text(self, key: str, text: str):
+        self.upload_bytes(key, text.encode("utf-8"), "text/plain; charset=utf-8")
+
+    def upload_stream(self, key: str, source, content_type: str = "application/octet-stream",
+                      length: Optional[int] = None) -> Dict[str, float]:
+        """流式上传文件对象或字节块迭代器，返回字节数、分片数、耗时与吞吐"""
+        return self.backend.write_stream(key, source, content_type, length)
+
+    def download_bytes(self, key: str) -> bytes:
+        return self.backend.read(key)
+
+    def download_text(self, key: str) -> str:
+        return self.download_bytes(key).decode("utf-8")
+
+    def download_range(self, key: str, offset: int, length: Optional[int] = None) -> bytes:
+        """读取对象的字节区间（length为None表示读到末尾）"""
+        if length is not None and length <= 0:
+            return b""
+        return self.backend.read(key, offset, length)
+
+    def download_ranges(self, key: str, ranges: Sequence[Tuple[int, int]]) -> List[bytes]:
+        """批量读取多个 (offset, length) 区间"""
+        return self.backend.read_ranges(key, ranges)
+
+    def iter_bytes(self, key: str, offset: int = 0, length: Optional[int] = None,
+                   chunk_size: int = STORAGE_STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+        """流式读取对象"""
+        return self.backend.stream(key, offset, length, chunk_size)
+
+    def map_bytes(self, key: str):
+        """读取整个对象供零拷贝解析：本地后端返回只读 mmap，其他后端返回 bytes"""
+        return self.backend.map(key)
+
+    @property
+    def mappable(self) -> bool:
+        """map_bytes 是否为内存映射；否则按需读取区间比下载整个对象更省"""
+        return getattr(self.backend, "mappable", False)
+
+    def get_etag(self, key: str) -> Optional[str]:
+        return self.backend.etag(key)
+
+    def get_presign_url(self, key: str) -> str:
+        return self.backend.presign_get(key)
+
+    def get_presign_put_url(self, key: str, content_type: str = "application/octet-stream") -> Tuple[str, dict]:
+        return self.backend.presign_put(key, content_type)
+
+    def list_keys(self, prefix: str = "") -> List[Tuple[str, int]]:
+        """列出前缀下的对象，返回 (对象键, 字节数) 列表"""
+        return self.backend.list(prefix)
+
+    def stats(self) -> Dict[str, object]:
+        return self.backend.stats()
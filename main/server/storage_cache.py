@@ -0,0 +1,220 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+STORAGE_CACHE_MAX_BYTES = int(os.environ.get("STORAGE_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# 重新扫描缓存目录的间隔：多个进程共用一个目录时，据此按整个目录的占用淘汰
+STORAGE_CACHE_RESCAN_SECONDS = float(os.environ.get("STORAGE_CACHE_RESCAN_SECONDS", "60"))
+
+_TMP_PREFIX = ".tmp"
+# 超过该时间仍未完成重命名的临时文件视为进程崩溃后的残留
+_STALE_TMP_SECONDS = 3600
+
+
+class _Fill:
+    """同一对象版本正在进行的一次下载，其他请求等待它完成"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.data: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+
+class DiskCache:
+    """对象存储的本地磁盘读缓存：按 (对象键, ETag) 存文件，按字节数做LRU淘汰
+
+    写入先落到同目录下的临时文件再原子重命名，进程崩溃不会留下半个缓存文件；
+    同一对象版本的并发未命中只下载一次。命中时更新文件修改时间，重启后据此恢复LRU顺序。
+    多个进程（uvicorn worker、ingest_cli）可以共用一个目录：每隔STORAGE_CACHE_RESCAN_SECONDS
+    按目录中的全部文件重新计算占用，max_bytes是整个目录的上限（超出量不超过一个扫描周期内的写入）。
+    """
+
+    def __init__(self, directory: str, max_bytes: int = STORAGE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        # 文件名 -> 字节数，按最近使用排序
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        # 对象键 -> 当前缓存的文件名，对象更新后用于删除旧版本
+        self._by_key: Dict[str, str] = {}
+        self._fills: Dict[str, _Fill] = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.fill_waits = 0
+        self.evictions = 0
+        self._last_scan = 0.0
+        self._scan()
+
+    def _scan(self):
+        """按目录中的文件（含其他进程写入的）重建占用与LRU顺序，清理过期的临时文件"""
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.directory):
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if entry.name.startswith(_TMP_PREFIX):
+                    # 其他进程可能正在写入，只删除长时间未完成的
+                    if now - stat.st_mtime > _STALE_TMP_SECONDS:
+                        os.unlink(entry.path)
+                    continue
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+        with self._lock:
+            self._entries = OrderedDict((name, size) for _, name, size in sorted(files))
+            self.total_bytes = sum(size for _, _, size in files)
+            self._by_key = {key: name for key, name in self._by_key.items() if name in self._entries}
+            self._last_scan = now
+            self._evict()
+
+    def holds(self, key: str) -> bool:
+        """是否缓存了该对象的某个版本（区间读取据此决定是否需要查询ETag）"""
+        with self._lock:
+            return self._by_key.get(key) in self._entries
+
+    @staticmethod
+    def _name(key: str, etag: str) -> str:
+        return hashlib.sha256(f"{key}\0{etag}".encode("utf-8")).hexdigest()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get_or_fill(self, key: str, etag: str, fill: Callable[[], bytes]) -> bytes:
+        """命中时读本地文件；未命中时调用fill下载并写入缓存"""
+        name = self._name(key, etag)
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                state = "hit"
+            elif name in self._fills:
+                current = self._fills[name]
+                self.fill_waits += 1
+                state = "wait"
+            else:
+                current = self._fills[name] = _Fill()
+                self.misses += 1
+                state = "fill"
+
+        if state == "hit":
+            data = self._read(name)
+            # 文件已被删除时重新按未命中处理
+            return data if data is not None else self.get_or_fill(key, etag, fill)
+        if state == "wait":
+            current.done.wait()
+            if current.error is not None:
+                raise current.error
+            return current.data
+
+        try:
+            current.data = fill()
+            self._store(key, name, current.data)
+            return current.data
+        except BaseException as e:
+            current.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._fills[name]
+            current.done.set()
+
+    def read_range(self, key: str, etag: str, offset: int, length: Optional[int]) -> Optional[bytes]:
+        """已缓存时从本地文件读取一段字节，否则返回None（不触发下载）"""
+        name = self._name(key, etag)
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+        try:
+            with open(self._path(name), "rb") as f:
+                f.seek(offset)
+                data = f.read() if length is None else f.read(length)
+            os.utime(self._path(name))
+            return data
+        except FileNotFoundError:
+            self._forget(name)
+            return None
+
+    def _read(self, name: str) -> Optional[bytes]:
+        try:
+            with open(self._path(name), "rb") as f:
+                data = f.read()
+            os.utime(self._path(name))
+            return data
+        except FileNotFoundError:
+            # 文件被外部删除，按未命中处理
+            self._forget(name)
+            return None
+
+    def _store(self, key: str, name: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{_TMP_PREFIX}{os.getpid()}-", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(name))
+        except OSError as e:
+            print(f"写入存储缓存失败: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+        with self._lock:
+            stale = self._by_key.get(key)
+            self._by_key[key] = name
+            self.total_bytes += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+        if stale is not None and stale != name:
+            self._forget(stale, remove=True)
+        if time.time() - self._last_scan > STORAGE_CACHE_RESCAN_SECONDS:
+            self._scan()
+            return
+        with self._lock:
+            self._evict()
+
+    def _forget(self, name: str, remove: bool = False):
+        with self._lock:
+            size = self._entries.pop(name, None)
+            if size is not None:
+                self.total_bytes -= size
+        if remove and size is not None:
+            try:
+                os.unlink(self._path(name))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        """超出容量时删除最久未使用的文件（调用方持有锁）"""
+        while self.total_bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(self._path(name))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中、未命中、等待并发下载、淘汰计数与当前占用"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.fill_waits
+            return {
+                "directory": self.directory,
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "fillWaits": self.fill_waits,
+                "evictions": self.evictions,
+                "hitRate": round((self.hits + self.fill_waits) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# 测试直接导入服务端模块；存储相关的环境变量需在导入前设置
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="reader-test-"))
+os.environ.setdefault("STORAGE_CACHE_MAX_BYTES", "0")
@@ -0,0 +1,92 @@
+import auth_cache
+from auth_cache import CachedUserRepository, TTLCache
+from user_store import SQLiteUserRepository
+
+
+class _Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+def _clock(monkeypatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr(auth_cache.time, "time", clock.time)
+    return clock
+
+
+def test_entries_expire(monkeypatch):
+    clock = _clock(monkeypatch)
+    cache = TTLCache(10)
+    cache.put("k", "v", clock.now + 30)
+    assert cache.get("k") == "v"
+    clock.now += 30
+    assert cache.get("k") is None
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1}
+    # 已过期的值不写入
+    cache.put("k", "v", clock.now - 1)
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_evicted(monkeypatch):
+    clock = _clock(monkeypatch)
+    cache = TTLCache(2)
+    cache.put("a", 1, clock.now + 30)
+    cache.put("b", 2, clock.now + 30)
+    cache.get("a")
+    cache.put("c", 3, clock.now + 30)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_invalidate_and_disabled_cache(monkeypatch):
+    clock = _clock(monkeypatch)
+    cache = TTLCache(10)
+    cache.put("k", "v", clock.now + 30)
+    cache.invalidate("k")
+    assert cache.get("k") is None
+    disabled = TTLCache(0)
+    disabled.put("k", "v", clock.now + 30)
+    assert disabled.get("k") is None
+
+
+class _CountingRepo(SQLiteUserRepository):
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.reads = 0
+
+    def get_user(self, email):
+        self.reads += 1
+        return super().get_user(email)
+
+
+def _user(email: str):
+    return {"id": "u1", "name": "读者", "email": email, "avatarUrl": "", "passwordHash": "h",
+            "createdAt": 1700000000}
+
+
+def test_user_lookups_cached_until_ttl(tmp_path, monkeypatch):
+    clock = _clock(monkeypatch)
+    inner = _CountingRepo(str(tmp_path / "users.db"))
+    inner.create_user(_user("a@b.com"))
+    repo = CachedUserRepository(inner, ttl=30, max_entries=10)
+    for _ in range(3):
+        assert repo.get_user("a@b.com")["id"] == "u1"
+    assert inner.reads == 1
+    clock.now += 31
+    repo.get_user("a@b.com")
+    assert inner.reads == 2
+    assert repo.stats()["userCache"]["hits"] == 2
+
+
+def test_missing_user_not_cached_and_create_invalidates(tmp_path, monkeypatch):
+    _clock(monkeypatch)
+    inner = _CountingRepo(str(tmp_path / "users.db"))
+    repo = CachedUserRepository(inner, ttl=30, max_entries=10)
+    # 未注册的邮箱不缓存，注册后立即可见
+    assert repo.get_user("a@b.com") is None
+    assert repo.create_user(_user("a@b.com"))
+    assert repo.get_user("a@b.com")["id"] == "u1"
+    assert inner.reads == 2
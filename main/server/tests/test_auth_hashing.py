@@ -0,0 +1,70 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from passlib.hash import bcrypt
+
+import auth_hashing
+from auth_hashing import CodeHasher
+from bounded_executor import BoundedExecutor, PoolBusyError
+
+
+@pytest.fixture
+def thread_pool(monkeypatch):
+    """测试中用线程池代替进程池执行bcrypt"""
+    pool = BoundedExecutor("auth", lambda n: ThreadPoolExecutor(max_workers=n), 1, 1)
+    monkeypatch.setattr(auth_hashing, "hash_pool", pool)
+    yield pool
+    pool.shutdown()
+
+
+def test_code_hash_is_keyed_and_bound_to_email():
+    hasher = CodeHasher("secret")
+    hashed = hasher.hash("a@b.com", "123456")
+    assert hashed.startswith("hmac-sha256$") and len(hashed) == len("hmac-sha256$") + 64
+    assert hashed == hasher.hash("a@b.com", "123456")
+    assert hashed != hasher.hash("c@d.com", "123456")
+    assert hashed != CodeHasher("other").hash("a@b.com", "123456")
+
+
+def test_verify_code():
+    hasher = CodeHasher("secret")
+    hashed = hasher.hash("a@b.com", "123456")
+    assert asyncio.run(hasher.verify("a@b.com", "123456", hashed))
+    assert not asyncio.run(hasher.verify("a@b.com", "654321", hashed))
+    assert not asyncio.run(hasher.verify("c@d.com", "123456", hashed))
+
+
+def test_verify_falls_back_to_legacy_bcrypt(thread_pool):
+    hasher = CodeHasher("secret")
+    legacy = bcrypt.using(rounds=4).hash("123456")
+    assert asyncio.run(hasher.verify("a@b.com", "123456", legacy))
+    assert not asyncio.run(hasher.verify("a@b.com", "654321", legacy))
+    # 空值或损坏的旧哈希视为校验失败
+    assert not asyncio.run(hasher.verify("a@b.com", "123456", ""))
+    assert thread_pool.stats()["completed"] == 3
+
+
+def test_password_hash_round_trip(thread_pool, monkeypatch):
+    monkeypatch.setattr(auth_hashing, "bcrypt", bcrypt.using(rounds=4))
+    hashed = asyncio.run(auth_hashing.hash_password("p@ssw0rd"))
+    assert asyncio.run(auth_hashing.verify_password("p@ssw0rd", hashed))
+    assert not asyncio.run(auth_hashing.verify_password("wrong", hashed))
+
+
+def test_pool_rejects_when_queue_full(thread_pool, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(auth_hashing, "_bcrypt_verify", lambda secret, hashed: release.wait(5))
+
+    async def burst():
+        tasks = [asyncio.ensure_future(auth_hashing.verify_password("x", "y")) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(burst())
+    # 一个运行、一个排队，第三个被拒绝
+    assert results[:2] == [True, True]
+    assert isinstance(results[2], PoolBusyError)
+    assert thread_pool.stats()["rejected"] == 1
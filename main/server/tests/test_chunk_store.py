@@ -0,0 +1,39 @@
+from ai.chunk_store import Chunk, ChunkStore
+
+TEXT = "第一章 开端\n少年离开村庄。他走向远方的城市。\n第二章 城市\n城市里灯火通明。少年住进了旅店。"
+
+
+def _raw_store() -> ChunkStore:
+    # 原文模式：分块之间有重叠
+    bounds = [(0, 20), (15, 35), (30, len(TEXT))]
+    chunks = [Chunk(f"chunk_{i:06d}", s, e, TEXT[s:e].strip(), "第一章" if i < 2 else "第二章")
+              for i, (s, e) in enumerate(bounds)]
+    return ChunkStore.from_bytes(ChunkStore.build(chunks, TEXT).to_bytes())
+
+
+def test_raw_round_trip_and_lookup():
+    store = _raw_store()
+    assert store.raw
+    assert [c.text for c in store] == [TEXT[0:20].strip(), TEXT[15:35].strip(), TEXT[30:].strip()]
+    assert store[2].title == "第二章"
+    assert store.locate(16) == 0
+    assert store.locate(25) == 1
+    assert store.count_ending_by(20) == 1
+    assert store.text_range(10, 40) == TEXT[10:40]
+
+
+def test_find_text_in_overlap_matches_every_covering_chunk():
+    store = _raw_store()
+    needle = TEXT[16:19]
+    assert list(store.find_text(needle)) == [0, 1]
+    assert list(store.find_text(needle, 1)) == [0]
+    assert list(store.find_text("不存在的词")) == []
+
+
+def test_segmented_find_text_ignores_matches_across_chunks():
+    chunks = [Chunk("chunk_000000", 0, 4, "少年离开"), Chunk("chunk_000001", 10, 14, "村庄远方")]
+    store = ChunkStore.from_bytes(ChunkStore.build(chunks).to_bytes())
+    assert not store.raw
+    assert list(store.find_text("离开村庄")) == []
+    assert list(store.find_text("村庄")) == [1]
+    assert store.text_range(0, 14) == "少年离开村庄远方"
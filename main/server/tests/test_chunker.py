@@ -0,0 +1,77 @@
+import pytest
+
+from ai.chunker import Chunker
+
+
+def _check_cover(text, chunks, chunker):
+    """分块按顺序、首尾相接或重叠，且覆盖全文"""
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == len(text)
+    for (s1, e1, _), (s2, e2, _) in zip(chunks, chunks[1:]):
+        assert s1 < s2 <= e1 < e2
+        assert e1 - s2 <= chunker.overlap
+    for start, end, chunk_text in chunks:
+        assert chunk_text == text[start:end].strip()
+
+
+def test_cuts_after_sentence_end_with_closing_quote():
+    sentence = "他说：“我们明天出发。”"
+    text = sentence * 40
+    chunker = Chunker(size=100, overlap=10, min_chars=0)
+    chunks = chunker.split(text)
+    _check_cover(text, chunks, chunker)
+    for _, end, _ in chunks[:-1]:
+        assert text[end - 2:end] == "。”"
+
+
+def test_english_period_needs_following_space():
+    text = "Version 3.14 is out. " * 20
+    chunker = Chunker(size=60, overlap=0, min_chars=0)
+    for _, end, chunk_text in chunker.split(text)[:-1]:
+        assert chunk_text.endswith("out.")
+
+
+def test_paragraph_preferred_over_line_break():
+    para = "一行文字\n" * 3 + "\n"
+    text = para * 20
+    chunker = Chunker(size=50, overlap=0, min_chars=0)
+    for _, end, _ in chunker.split(text)[:-1]:
+        assert text[end - 2:end] == "\n\n"
+
+
+def test_no_punctuation_cuts_at_window_size():
+    text = "字" * 1000
+    chunker = Chunker(size=100, overlap=20, min_chars=0)
+    chunks = chunker.split(text)
+    _check_cover(text, chunks, chunker)
+    assert all(end - start == 100 for start, end, _ in chunks[:-1])
+    assert all(e1 - s2 == 20 for (_, e1, _), (s2, _, _) in zip(chunks, chunks[1:]))
+
+
+def test_overlap_larger_than_window_still_advances():
+    text = "字" * 1000
+    chunker = Chunker(size=40, overlap=200, min_chars=0)
+    chunks = chunker.split(text)
+    assert len(chunks) <= len(text) // (40 // 4) + 1
+    assert [s for s, _, _ in chunks] == sorted({s for s, _, _ in chunks})
+
+
+def test_short_chunks_dropped():
+    chunker = Chunker(size=2000, overlap=200, min_chars=50)
+    assert chunker.split("太短了") == []
+    assert chunker.split("") == []
+
+
+def test_token_unit_counts_latin_words_once():
+    text = " ".join(["reading"] * 300)
+    chunker = Chunker(size=100, overlap=10, unit="token", min_chars=0)
+    chunks = chunker.split(text)
+    assert chunks[-1][1] == len(text)
+    assert all(len(chunk_text.split()) <= 100 for _, _, chunk_text in chunks)
+    assert len(chunks[0][2].split()) == 100
+
+
+@pytest.mark.parametrize("kwargs", [{"unit": "word"}, {"size": 0}, {"overlap": -1}])
+def test_invalid_settings(kwargs):
+    with pytest.raises(ValueError):
+        Chunker(**kwargs)
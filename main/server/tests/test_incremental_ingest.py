@@ -0,0 +1,65 @@
+import json
+
+from ai.chunk_store import ChunkStore
+from ai.keyword_index import KeywordIndex
+from ai.reading_ai import ReadingAI
+from storage_adapter import LocalStorageBackend, StorageAdapter
+
+
+def _chapter(i: int, word: str = "书房") -> str:
+    body = "".join(f"张三{i}在{word}里读到了第{j}页，李四{j}站在窗边。" for j in range(300))
+    return f"第{i}章 标题{i}\n{body}"
+
+
+def _book(chapters) -> str:
+    return "\n".join(chapters)
+
+
+def _ingest(storage: StorageAdapter, text: str):
+    storage.upload_text("books/b.txt", text)
+    result = ReadingAI(storage).ingest_book("b", "txt")
+    assert result["status"] == "success"
+    chunks = ChunkStore.from_bytes(storage.download_bytes("books/b/chunks.bin"))
+    return result, chunks
+
+
+def test_only_changed_chapters_are_resliced(tmp_path):
+    storage = StorageAdapter(LocalStorageBackend(str(tmp_path)))
+    chapters = [_chapter(i) for i in range(1, 6)]
+    first, old = _ingest(storage, _book(chapters))
+    assert first["reused_chunks"] == 0
+
+    chapters[2] = _chapter(3, "花园")
+    second, new = _ingest(storage, _book(chapters))
+    toc = json.loads(storage.download_bytes("books/b/toc.json"))
+    changed = range(*next(entry["chunks"] for entry in toc if (entry["title"] or "").startswith("第3章")))
+    assert len(changed)
+    assert second["reused_chunks"] == second["chunk_count"] - len(changed)
+
+    # 未变化的章节保留原分块id与文本，变化的章节得到新id
+    old_texts = {chunk.id: chunk.text for chunk in old}
+    for i, chunk in enumerate(new):
+        if i in changed:
+            assert chunk.id not in old_texts
+            assert "花园" in chunk.text
+        else:
+            assert old_texts[chunk.id] == chunk.text
+
+
+def test_incremental_index_matches_full_rebuild(tmp_path):
+    chapters = [_chapter(i) for i in range(1, 5)]
+    edited = list(chapters)
+    edited[1] = _chapter(2, "花园")
+
+    incremental = StorageAdapter(LocalStorageBackend(str(tmp_path / "inc")))
+    _ingest(incremental, _book(chapters))
+    _, chunks = _ingest(incremental, _book(edited))
+    full = StorageAdapter(LocalStorageBackend(str(tmp_path / "full")))
+    _, full_chunks = _ingest(full, _book(edited))
+
+    assert [chunk.text for chunk in chunks] == [chunk.text for chunk in full_chunks]
+    index = KeywordIndex.from_bytes(incremental.download_bytes("books/b/index.bin"))
+    expected = KeywordIndex.from_bytes(full.download_bytes("books/b/index.bin"))
+    for query in ("张三2在花园", "李四7站在窗边", "第3章"):
+        assert [round(s, 6) for _, s in index.search(query, top_k=5)] == \
+            [round(s, 6) for _, s in expected.search(query, top_k=5)]
@@ -0,0 +1,89 @@
+import asyncio
+import urllib.error
+
+import pytest
+
+from ai import ingest_jobs
+from ai.executors import PoolBusyError
+from ai.ingest_jobs import IngestConflictError, IngestJobManager, IngestQueueFullError
+
+
+class FakeEngine:
+    """按顺序返回或抛出预设的结果"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def aingest_book(self, book_id, file_type, progress=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else {"status": "success", "chunk_count": 1}
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def _run_job(engine, max_retries=2):
+    async def run():
+        manager = IngestJobManager(engine, workers=1, max_retries=max_retries)
+        await manager.start()
+        job = manager.submit("b", "txt")
+        while job.active:
+            await asyncio.sleep(0)
+        await manager.stop()
+        return job
+    return asyncio.run(run())
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch):
+    monkeypatch.setattr(ingest_jobs, "INGEST_RETRY_BACKOFF_SECONDS", 0)
+
+
+def test_transient_errors_retried():
+    engine = FakeEngine(PoolBusyError("cpu 执行池繁忙"), ConnectionResetError("reset"),
+                        urllib.error.HTTPError("u", 503, "busy", None, None))
+    job = _run_job(engine, max_retries=3)
+    assert job.status == "succeeded"
+    assert job.attempts == 4
+
+
+def test_retries_exhausted():
+    job = _run_job(FakeEngine(*[TimeoutError("timeout")] * 5), max_retries=2)
+    assert job.status == "failed"
+    assert job.attempts == 3
+
+
+@pytest.mark.parametrize("outcome", [
+    {"status": "error", "message": "无法下载或解析书籍文本"},
+    FileNotFoundError("books/b.txt"),
+    urllib.error.HTTPError("u", 404, "not found", None, None),
+    ValueError("bad data"),
+])
+def test_deterministic_failures_not_retried(outcome):
+    engine = FakeEngine(outcome)
+    job = _run_job(engine)
+    assert job.status == "failed"
+    assert engine.calls == 1
+    assert job.error
+
+
+def test_duplicate_submit_merged_and_type_conflict_rejected():
+    async def run():
+        manager = IngestJobManager(FakeEngine())
+        job = manager.submit("b", "txt")
+        assert manager.submit("b", "txt") is job
+        with pytest.raises(IngestConflictError):
+            manager.submit("b", "epub")
+    asyncio.run(run())
+
+
+def test_queue_limit():
+    async def run():
+        manager = IngestJobManager(FakeEngine(), queue_limit=2)
+        manager.submit("a", "txt")
+        manager.submit("b", "txt")
+        with pytest.raises(IngestQueueFullError):
+            manager.submit("c", "txt")
+        assert manager.stats()["jobs"] == {"queued": 2}
+    asyncio.run(run())
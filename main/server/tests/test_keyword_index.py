@@ -0,0 +1,83 @@
+import math
+
+import pytest
+
+from ai import keyword_index
+from ai.keyword_index import KeywordIndex
+from ai.tokenizer import get_tokenizer, tokenizer_names
+
+TEXTS = [
+    "alpha beta gamma",
+    "beta beta delta",
+    "gamma epsilon zeta eta theta",
+    "delta delta delta beta",
+]
+
+
+def _build(texts=TEXTS):
+    return KeywordIndex.build(texts, get_tokenizer("word"))
+
+
+def test_postings_sorted_by_chunk():
+    index = _build()
+    term_id = index.vocab["beta"]
+    lo, hi = index.ptr[term_id], index.ptr[term_id + 1]
+    assert list(index.docs[lo:hi]) == [0, 1, 3]
+    assert list(index.tfs[lo:hi]) == [1, 2, 1]
+    assert list(index.doc_lengths) == [3, 3, 5, 4]
+
+
+def test_idf_rarer_terms_score_higher():
+    index = _build()
+    assert index.idf("epsilon") > index.idf("gamma") > index.idf("beta")
+    assert index.idf("missing") == math.log(1 + (4 + 0.5) / 0.5)
+
+
+def test_search_ranks_by_bm25():
+    index = _build()
+    hits = index.search("delta", top_k=4)
+    assert [doc for doc, _ in hits] == [3, 1]
+    assert hits[0][1] > hits[1][1] > 0
+    assert index.search("nothing here") == []
+
+
+def test_search_respects_position_window():
+    index = _build()
+    assert [doc for doc, _ in index.search("beta", limit=2, top_k=4)] == [1, 0]
+    assert [doc for doc, _ in index.search("beta", start=2, top_k=4)] == [3]
+    assert index.search("beta", start=2, limit=2) == []
+
+
+def test_search_sums_query_terms():
+    index = _build()
+    doc, _ = index.search("alpha gamma", top_k=1)[0]
+    assert doc == 0
+
+
+def test_empty_index():
+    index = _build([])
+    assert index.doc_count == 0
+    assert index.search("alpha") == []
+
+
+@pytest.mark.parametrize("name", tokenizer_names())
+def test_round_trip_every_tokenizer(name):
+    texts = ["第一章 少年出发去远方。", "He left the village at dawn.", "远方的城市 the city lights"]
+    index = KeywordIndex.build(texts, get_tokenizer(name))
+    loaded = KeywordIndex.from_bytes(index.to_bytes())
+    assert loaded.tokenizer.name == name
+    assert loaded.vocab == index.vocab
+    assert list(loaded.docs) == list(index.docs)
+    assert list(loaded.tfs) == list(index.tfs)
+    assert loaded.search("远方 city", top_k=3) == index.search("远方 city", top_k=3)
+
+
+def test_loads_version2_with_truncated_tokenizer_name():
+    index = KeywordIndex.build(["远方的城市"], get_tokenizer("cjk-bigram-trigram"))
+    data = index.to_bytes()
+    header = keyword_index._HEADER.unpack_from(data, 0)
+    arrays = data[keyword_index._padded(keyword_index._HEADER.size + header[-1]):]
+    legacy = keyword_index._HEADER_V2.pack(*header[:1], 2, *header[2:-1], b"cjk-bigram-trigr") + arrays
+    loaded = KeywordIndex.from_bytes(legacy)
+    assert loaded.tokenizer.name == "cjk-bigram-trigram"
+    assert loaded.vocab == index.vocab
@@ -0,0 +1,104 @@
+import asyncio
+import smtplib
+
+import pytest
+
+import mail_queue
+from mail_queue import MailQueue, OutgoingMail
+
+
+class _FakeSession:
+    """按收件人返回预设结果的 SMTP 会话：outcomes[收件人] 为依次抛出的异常（None 表示成功）"""
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.sent = []
+        self.connections = 0
+        self.closed = 0
+
+    def send(self, mail: OutgoingMail):
+        pending = self.outcomes.get(mail.recipients[0], [])
+        error = pending.pop(0) if pending else None
+        if error is not None:
+            raise error
+        self.sent.append(mail.recipients[0])
+
+    def close(self):
+        self.closed += 1
+
+
+@pytest.fixture(autouse=True)
+def fast_retry(monkeypatch):
+    monkeypatch.setattr(mail_queue, "MAIL_RETRY_BACKOFF_SECONDS", 0.01)
+
+
+def _mail(to: str) -> OutgoingMail:
+    return OutgoingMail("noreply@example.com", [to], "Subject: code\r\n\r\n123456")
+
+
+async def _wait_for(predicate, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def _run(session, mails, until, **kwargs):
+    async def main():
+        queue = MailQueue(lambda: session, **kwargs)
+        await queue.start()
+        for mail in mails:
+            assert queue.submit(mail)
+        await _wait_for(lambda: until(queue))
+        await queue.stop(timeout=0.1)
+        return queue
+
+    return asyncio.run(main())
+
+
+def test_transient_errors_retried_permanent_errors_not():
+    session = _FakeSession({
+        "busy@example.com": [smtplib.SMTPResponseException(451, b"try later")],
+        "gone@example.com": [smtplib.SMTPRecipientsRefused({"gone@example.com": (550, b"no such user")})],
+    })
+    mails = [_mail("ok@example.com"), _mail("busy@example.com"), _mail("gone@example.com")]
+    queue = _run(session, mails, lambda q: q.sent + q.failed == 3)
+    assert sorted(session.sent) == ["busy@example.com", "ok@example.com"]
+    assert (queue.sent, queue.failed, queue.retries) == (2, 1, 1)
+
+
+def test_gives_up_after_max_retries():
+    session = _FakeSession({"down@example.com": [ConnectionRefusedError()] * 5})
+    queue = _run(session, [_mail("down@example.com")], lambda q: q.failed == 1, max_retries=2)
+    assert queue.retries == 2
+    assert session.sent == []
+    # 连接错误后关闭会话，下一封重新连接
+    assert session.closed >= 3
+
+
+def test_pending_retries_counted_as_failed_on_stop(monkeypatch):
+    monkeypatch.setattr(mail_queue, "MAIL_RETRY_BACKOFF_SECONDS", 60)
+    session = _FakeSession({"busy@example.com": [smtplib.SMTPResponseException(421, b"busy")]})
+    queue = _run(session, [_mail("busy@example.com")], lambda q: q.retries == 1)
+    assert queue.failed == 1
+    assert queue.stats()["pendingRetries"] == 0
+
+
+def test_sender_survives_unexpected_errors(monkeypatch):
+    calls = []
+    send_batch = mail_queue._send_batch
+
+    def flaky(session, batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return send_batch(session, batch)
+
+    monkeypatch.setattr(mail_queue, "_send_batch", flaky)
+    session = _FakeSession({"odd@example.com": [UnicodeEncodeError("ascii", "é", 0, 1, "bad")]})
+    queue = _run(session, [_mail("a@example.com")], lambda q: q.sent == 1, max_retries=1)
+    assert queue.retries == 1
+
+    # 单封邮件的意外错误不影响同批其他邮件
+    queue = _run(session, [_mail("odd@example.com"), _mail("b@example.com")], lambda q: q.sent == 2)
+    assert "b@example.com" in session.sent and queue.retries == 1
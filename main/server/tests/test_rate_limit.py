@@ -0,0 +1,51 @@
+from rate_limit import Limit, MemoryBucketStore, _client_ip
+
+
+def _scope(peer: str, *headers):
+    return {
+        "client": (peer, 50000),
+        "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+    }
+
+
+def test_direct_client_headers_ignored():
+    scope = _scope("203.0.113.7", ("x-forwarded-for", "198.51.100.1"), ("x-real-ip", "198.51.100.1"))
+    assert _client_ip(scope) == "203.0.113.7"
+
+
+def test_forwarded_for_uses_last_untrusted_hop():
+    # 客户端自带的 X-Forwarded-For 在左侧，Nginx 追加的真实地址在最右侧
+    scope = _scope("127.0.0.1", ("x-forwarded-for", "1.2.3.4, 203.0.113.7"), ("x-real-ip", "203.0.113.7"))
+    assert _client_ip(scope) == "203.0.113.7"
+
+
+def test_trusted_hops_skipped():
+    scope = _scope("::1", ("x-forwarded-for", "203.0.113.7, 127.0.0.1"))
+    assert _client_ip(scope) == "203.0.113.7"
+
+
+def test_real_ip_without_forwarded_for():
+    assert _client_ip(_scope("127.0.0.1", ("x-real-ip", "203.0.113.7"))) == "203.0.113.7"
+    assert _client_ip(_scope("127.0.0.1")) == "127.0.0.1"
+
+
+def test_memory_bucket_refills_over_window():
+    store = MemoryBucketStore()
+    limit = Limit(2, 60)
+    assert store.take("k", limit, 0) == 0
+    assert store.take("k", limit, 0) == 0
+    assert store.take("k", limit, 0) == 30
+    assert store.take("k", limit, 30) == 0
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryBucketStore(max_keys=3)
+    limit = Limit(1, 60)
+    for i, key in enumerate("abc"):
+        store.take(key, limit, i)
+    # a 最近被访问，超出上限时淘汰最久未使用的 b
+    assert store.take("a", limit, 3) > 0
+    store.take("d", limit, 4)
+    assert list(store._buckets) == ["c", "a", "d"]
+    assert store.take("a", limit, 5) > 0
+    assert store.take("b", limit, 6) == 0
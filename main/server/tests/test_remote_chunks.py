@@ -0,0 +1,136 @@
+import hashlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ai import chunk_store
+from ai.chunk_store import ChunkStore
+from ai.reading_ai import ReadingAI
+from storage_adapter import StorageAdapter
+
+
+class FakeRemoteBackend:
+    """内存中的对象存储，不能内存映射，记录每个对象被读取的请求数与字节数"""
+
+    name = "fake"
+    mappable = False
+
+    def __init__(self):
+        self.objects: Dict[str, bytes] = {}
+        self.requests: Dict[str, int] = {}
+        self.bytes_read: Dict[str, int] = {}
+        self.whole_reads: List[str] = []
+
+    def _count(self, key: str, blobs: List[bytes]) -> List[bytes]:
+        self.requests[key] = self.requests.get(key, 0) + 1
+        self.bytes_read[key] = self.bytes_read.get(key, 0) + sum(len(b) for b in blobs)
+        return blobs
+
+    def read(self, key: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        if offset == 0 and length is None:
+            self.whole_reads.append(key)
+        data = self.objects[key]
+        return self._count(key, [data[offset:None if length is None else offset + length]])[0]
+
+    def read_ranges(self, key: str, ranges: Sequence[Tuple[int, int]]) -> List[bytes]:
+        data = self.objects[key]
+        return self._count(key, [data[offset:offset + length] for offset, length in ranges])
+
+    def map(self, key: str):
+        return self.read(key)
+
+    def stream(self, key: str, offset: int, length: Optional[int], chunk_size: int):
+        yield self.read(key, offset, length)
+
+    def write(self, key: str, data: bytes, content_type: str):
+        self.objects[key] = bytes(data)
+
+    def write_stream(self, key: str, source, content_type: str, length: Optional[int]):
+        data = source.read() if hasattr(source, "read") else b"".join(source)
+        self.write(key, data, content_type)
+        return {"bytes": len(data), "parts": 1}
+
+    def etag(self, key: str) -> Optional[str]:
+        if key not in self.objects:
+            raise FileNotFoundError(key)
+        return hashlib.md5(self.objects[key]).hexdigest()
+
+    def list(self, prefix: str) -> List[Tuple[str, int]]:
+        return sorted((k, len(v)) for k, v in self.objects.items() if k.startswith(prefix))
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+def _book_text() -> str:
+    chapters = []
+    for i in range(1, 9):
+        body = "".join(f"第{i}章第{j}段，张三{i}在书房里读到了第{j}页，李四{j}站在窗边。" for j in range(600))
+        chapters.append(f"第{i}章 标题{i}\n{body}")
+    return "\n".join(chapters)
+
+
+def _ingested_storage() -> Tuple[FakeRemoteBackend, StorageAdapter]:
+    backend = FakeRemoteBackend()
+    storage = StorageAdapter(backend)
+    storage.upload_text("books/b.txt", _book_text())
+    result = ReadingAI(storage).ingest_book("b", "txt")
+    assert result["status"] == "success"
+    return backend, storage
+
+
+def test_remote_chunk_store_reads_only_header_and_selected_ranges():
+    backend, storage = _ingested_storage()
+    key = "books/b/chunks.bin"
+    data = backend.objects[key]
+    assert len(data) > 4 * 64 * 1024
+
+    store = ChunkStore.open(lambda offset, length: storage.download_range(key, offset, length),
+                            lambda ranges: storage.download_ranges(key, ranges))
+    local = ChunkStore.from_bytes(data)
+    assert store.remote
+    assert backend.requests[key] == 1
+    assert store.nbytes < local.nbytes
+
+    before = backend.requests[key]
+    ordinals = [len(local) - 1, 0, len(local) // 2]
+    assert store.take(ordinals) == [local[i] for i in ordinals]
+    # 三个分块一次批量请求
+    assert backend.requests[key] == before + 1
+    assert store.text_range(1000, 3000) == local.text_range(1000, 3000)
+
+
+def test_query_on_remote_storage_does_not_download_whole_chunk_file():
+    backend, storage = _ingested_storage()
+    ai = ReadingAI(storage)
+    ai.llm.generate = lambda prompt, model=None: "ok"
+    backend.requests.clear()
+    backend.bytes_read.clear()
+    backend.whole_reads.clear()
+
+    result = ai.query_with_context("b", "张三5在哪里", 20000)
+
+    key = "books/b/chunks.bin"
+    assert result["answer"] == "ok"
+    assert result["citations"]
+    assert key not in backend.whole_reads
+    assert backend.bytes_read[key] < len(backend.objects[key]) / 2
+
+    expected = {c.id: c for c in ChunkStore.from_bytes(backend.objects[key])}
+    for citation in result["citations"]:
+        chunk = expected[citation["chunkId"]]
+        assert [chunk.start, chunk.end] == citation["range"]
+        assert chunk.text[:200] == citation["text"][:200]
+
+
+def test_find_text_reads_remote_text_in_batches(monkeypatch):
+    monkeypatch.setattr(chunk_store, "_FIND_BATCH", 8)
+    backend, storage = _ingested_storage()
+    key = "books/b/chunks.bin"
+    store = ChunkStore.open(lambda offset, length: storage.download_range(key, offset, length),
+                            lambda ranges: storage.download_ranges(key, ranges))
+    local = ChunkStore.from_bytes(backend.objects[key])
+    assert len(local) > 2 * chunk_store._FIND_BATCH
+
+    before = backend.bytes_read[key]
+    assert next(store.find_text("张三1")) == next(local.find_text("张三1"))
+    assert backend.bytes_read[key] - before < len(backend.objects[key]) / 2
+    assert list(store.find_text("张三8", len(local))) == list(local.find_text("张三8"))
@@ -0,0 +1,86 @@
+import os
+import time
+
+import pytest
+
+import storage_adapter
+import storage_cache
+from storage_cache import DiskCache
+
+
+def test_fill_once_then_hit(tmp_path):
+    cache = DiskCache(str(tmp_path), 1024)
+    calls = []
+    fill = lambda: calls.append(1) or b"payload"
+    assert cache.get_or_fill("k", "v1", fill) == b"payload"
+    assert cache.get_or_fill("k", "v1", fill) == b"payload"
+    assert cache.read_range("k", "v1", 3, 4) == b"load"
+    assert len(calls) == 1
+    # 新版本替换旧版本
+    assert cache.get_or_fill("k", "v2", lambda: b"new") == b"new"
+    assert cache.read_range("k", "v1", 0, 1) is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_startup_keeps_other_processes_temp_files(tmp_path):
+    fresh = tmp_path / ".tmp123-fresh"
+    stale = tmp_path / ".tmp456-stale"
+    fresh.write_bytes(b"x")
+    stale.write_bytes(b"x")
+    old = time.time() - storage_cache._STALE_TMP_SECONDS - 10
+    os.utime(stale, (old, old))
+    DiskCache(str(tmp_path), 1024)
+    assert fresh.exists()
+    assert not stale.exists()
+
+
+def test_budget_covers_files_written_by_other_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_cache, "STORAGE_CACHE_RESCAN_SECONDS", 0)
+    first = DiskCache(str(tmp_path), 250)
+    second = DiskCache(str(tmp_path), 250)
+    for i in range(3):
+        first.get_or_fill(f"a{i}", "v", lambda: b"a" * 50)
+        second.get_or_fill(f"b{i}", "v", lambda: b"b" * 50)
+    on_disk = sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+    assert on_disk <= 250
+    # 被另一个进程淘汰的文件按未命中重新下载
+    assert first.get_or_fill("a0", "v", lambda: b"c" * 50) in (b"a" * 50, b"c" * 50)
+
+
+@pytest.fixture
+def remote(tmp_path, monkeypatch):
+    """带本地缓存的对象存储：记录ETag查询与实际下载的区间"""
+    objects = {"books/b/chunks.bin": bytes(range(256)) * 64}
+    log = {"etag": 0, "fetch": []}
+
+    def etag(key):
+        log["etag"] += 1
+        return "v1"
+
+    def fetch(key, offset=0, length=None):
+        log["fetch"].append((offset, length))
+        data = objects[key]
+        return data[offset:None if length is None else offset + length]
+
+    monkeypatch.setattr(storage_adapter, "_storage_etag", etag)
+    monkeypatch.setattr(storage_adapter, "_storage_fetch", fetch)
+    monkeypatch.setattr(storage_adapter, "_disk_cache", DiskCache(str(tmp_path), 1 << 20))
+    monkeypatch.setattr(storage_adapter, "STORAGE_RANGE_MERGE_GAP", 0)
+    return objects, log
+
+
+def test_range_reads_skip_etag_until_object_is_cached(remote):
+    objects, log = remote
+    key = "books/b/chunks.bin"
+    data = objects[key]
+
+    assert storage_adapter._storage_download(key, 100, 10) == data[100:110]
+    assert storage_adapter._storage_download_ranges(key, [(0, 4), (5000, 8)]) == [data[:4], data[5000:5008]]
+    assert log["etag"] == 0
+    assert len(log["fetch"]) == 3
+
+    assert storage_adapter._storage_download(key) == data
+    fetched = len(log["fetch"])
+    assert storage_adapter._storage_download_ranges(key, [(0, 4), (5000, 8)]) == [data[:4], data[5000:5008]]
+    assert storage_adapter._storage_download(key, 100, 10) == data[100:110]
+    assert len(log["fetch"]) == fetched
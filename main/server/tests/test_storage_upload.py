@@ -0,0 +1,150 @@
+import hashlib
+import io
+import os
+import random
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import storage_adapter
+from ai.reading_ai import ReadingAI
+from storage_adapter import ObjectStorageBackend, StorageAdapter
+
+
+class _Body:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def read(self) -> bytes:
+        return self._data
+
+    def get_raw_stream(self):
+        return io.BytesIO(self._data)
+
+
+class FakeCosClient:
+    """内存中的COS客户端：分片乱序完成，记录完成分片上传时提交的分片序号"""
+
+    def __init__(self, fail_part: int = 0):
+        self.objects = {}
+        self.fail_part = fail_part
+        self.multipart_keys = []
+        self.completed_parts = {}
+        self.aborted = []
+        self.ranged_gets = []
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        self.objects[Key] = Body if isinstance(Body, bytes) else Body.read()
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None):
+        with self._lock:
+            upload_id = f"upload-{len(self._uploads)}"
+            self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, Body, PartNumber, UploadId):
+        time.sleep(random.uniform(0, 0.005))
+        if PartNumber == self.fail_part:
+            raise ConnectionError("part upload failed")
+        with self._lock:
+            self._uploads[UploadId][PartNumber] = Body
+        return {"ETag": hashlib.md5(Body).hexdigest()}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self._uploads.pop(UploadId)
+        numbers = [part["PartNumber"] for part in MultipartUpload["Part"]]
+        assert all(part["ETag"] == hashlib.md5(parts[part["PartNumber"]]).hexdigest()
+                   for part in MultipartUpload["Part"])
+        self.completed_parts[Key] = numbers
+        self.multipart_keys.append(Key)
+        self.objects[Key] = b"".join(parts[n] for n in numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._uploads.pop(UploadId, None)
+        self.aborted.append(Key)
+
+    def head_object(self, Bucket, Key):
+        return {"ETag": hashlib.md5(self.objects[Key]).hexdigest()}
+
+    def get_object(self, Bucket, Key, Range=None):
+        data = self.objects[Key]
+        if Range:
+            self.ranged_gets.append(Key)
+            start, _, end = Range[len("bytes="):].partition("-")
+            data = data[int(start):int(end) + 1 if end else None]
+        return {"Body": _Body(data)}
+
+    def list_objects(self, Bucket, Prefix, Marker, MaxKeys):
+        keys = sorted(k for k in self.objects if k.startswith(Prefix))
+        return {"Contents": [{"Key": k, "Size": len(self.objects[k])} for k in keys], "IsTruncated": "false"}
+
+
+@pytest.fixture
+def cos(monkeypatch):
+    client = FakeCosClient()
+    monkeypatch.setattr(storage_adapter, "STORAGE_BACKEND", "cos")
+    monkeypatch.setattr(storage_adapter, "_COS_AVAILABLE", True)
+    monkeypatch.setattr(storage_adapter, "COS_BUCKET", "test-bucket")
+    monkeypatch.setattr(storage_adapter, "_cos_client", client)
+    return client
+
+
+def test_multipart_upload_from_file_keeps_part_order(cos):
+    data = os.urandom(10 * 1024 + 512)
+    stats = storage_adapter._storage_upload_stream("big.bin", io.BytesIO(data), length=len(data),
+                                                   part_size=1024, parallel=3)
+    assert stats["bytes"] == len(data)
+    assert stats["parts"] == 11
+    assert cos.completed_parts["big.bin"] == list(range(1, 12))
+    assert cos.objects["big.bin"] == data
+
+
+def test_multipart_upload_from_irregular_blocks(cos):
+    data = os.urandom(5000)
+    blocks = [data[i:i + 700] for i in range(0, len(data), 700)]
+    stats = storage_adapter._storage_upload_stream("blocks.bin", iter(blocks), part_size=1024, parallel=2)
+    assert stats["parts"] == 5
+    assert cos.objects["blocks.bin"] == data
+
+
+def test_single_part_object_uses_plain_put(cos):
+    stats = storage_adapter._storage_upload_stream("small.bin", io.BytesIO(b"abc"), part_size=1024)
+    assert stats["parts"] == 1
+    assert cos.objects["small.bin"] == b"abc"
+    assert cos.multipart_keys == []
+
+
+def test_failed_part_aborts_multipart_upload(cos):
+    cos.fail_part = 3
+    with pytest.raises(HTTPException):
+        storage_adapter._storage_upload_stream("broken.bin", io.BytesIO(os.urandom(8 * 1024)),
+                                               part_size=1024, parallel=2)
+    assert cos.aborted == ["broken.bin"]
+    assert "broken.bin" not in cos.objects
+
+
+def test_ingest_streams_artifacts_through_multipart_upload(cos, monkeypatch):
+    monkeypatch.setattr(storage_adapter, "STORAGE_PART_SIZE", 8 * 1024)
+    storage = StorageAdapter(ObjectStorageBackend())
+    text = "\n".join(
+        f"第{i}章 标题{i}\n" + "".join(f"王五{i}在第{j}段推开了门，赵六{j}坐在桌前。" for j in range(300))
+        for i in range(1, 6)
+    )
+    storage.upload_text("books/m.txt", text)
+
+    ai = ReadingAI(storage)
+    result = ai.ingest_book("m", "txt")
+    assert result["status"] == "success"
+    for name in ("chunks.bin", "index.bin", "vectors.bin"):
+        assert f"books/m/{name}" in cos.multipart_keys
+
+    ai.llm.generate = lambda prompt, model=None: "ok"
+    answer = ai.query_with_context("m", "王五3在哪", 10000)
+    assert answer["answer"] == "ok"
+    assert answer["citations"]
+    # 分块正文按区间读取
+    assert "books/m/chunks.bin" in cos.ranged_gets
@@ -0,0 +1,66 @@
+import io
+import zipfile
+
+from ai import text_extraction
+from ai.text_extraction import extract_book, iter_text_segments
+
+
+def _plain(data: bytes) -> str:
+    return "".join(iter_text_segments(io.BytesIO(data), "txt"))
+
+
+def test_gb18030_after_long_ascii_prefix():
+    data = b"A" * 70000 + "中文内容测试".encode("gb18030")
+    assert _plain(data) == "A" * 70000 + "中文内容测试"
+
+
+def test_utf8_split_across_blocks():
+    text = "x" + "中文" * text_extraction.READ_BLOCK_SIZE
+    assert _plain(text.encode("utf-8")) == text
+
+
+def test_latin1_only_when_every_candidate_fails():
+    data = b"caf\xe9 \xff\xfe"
+    assert _plain(data) == data.decode("latin-1")
+
+
+def test_html_tags_stripped():
+    html = b"<html><head><title>t</title></head><body><h1>Title</h1><p>One</p><script>x</script><p>Two</p></body></html>"
+    assert "".join(iter_text_segments(io.BytesIO(html), "html")).split() == ["Title", "One", "Two"]
+
+
+def _epub(members):
+    buf = io.BytesIO()
+    spine = "".join(f'<itemref idref="{name}"/>' for name in members)
+    manifest = "".join(f'<item id="{name}" href="{name}.xhtml"/>' for name in members)
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("META-INF/container.xml",
+                    '<container><rootfiles><rootfile full-path="OEBPS/c.opf"/></rootfiles></container>')
+        zf.writestr("OEBPS/c.opf", f"<package><manifest>{manifest}</manifest><spine>{spine}</spine></package>")
+        # 压缩包内的顺序与spine相反
+        for name, body in reversed(list(members.items())):
+            if body is not None:
+                zf.writestr(f"OEBPS/{name}.xhtml", body)
+    buf.seek(0)
+    return buf
+
+
+def test_epub_follows_spine_order():
+    stream = _epub({
+        "b": "<html><body><h1>第一章</h1><p>开始</p></body></html>",
+        "a": "<html><body><h1>第二章</h1><p>结束</p></body></html>",
+    })
+    text, chapters = extract_book(stream, "epub")
+    assert text.index("开始") < text.index("结束")
+    # 没有目录时不在目录中的文件并入第一章
+    assert [(c.title, c.start, c.end) for c in chapters] == [("第一章", 0, len(text))]
+
+
+def test_epub_missing_member_skipped():
+    stream = _epub({
+        "a": "<html><body><p>第一部分</p></body></html>",
+        "b": None,
+        "c": "<html><body><p>第三部分</p></body></html>",
+    })
+    text, _ = extract_book(stream, "epub")
+    assert "第一部分" in text and "第三部分" in text
@@ -0,0 +1,44 @@
+import pytest
+
+from ai import tokenizer
+from ai.tokenizer import TOKENIZER_NAME_MAX_BYTES, CJKNgramTokenizer, get_tokenizer, register_tokenizer
+
+
+def test_cjk_bigrams_and_latin_words():
+    tokens = get_tokenizer("cjk-bigram").tokenize("少年出发 Hello, World a")
+    assert tokens == ["少年", "年出", "出发", "hello", "world"]
+
+
+def test_single_cjk_character_kept():
+    assert get_tokenizer("cjk-bigram").tokenize("剑") == ["剑"]
+
+
+def test_bigram_trigram():
+    tokens = get_tokenizer("cjk-bigram-trigram").tokenize("少年出发")
+    assert tokens == ["少年", "年出", "出发", "少年出", "年出发"]
+
+
+def test_stopwords_removed():
+    assert get_tokenizer("cjk-bigram").tokenize("我们 the castle") == ["castle"]
+
+
+def test_word_tokenizer_keeps_legacy_rule():
+    assert get_tokenizer("word").tokenize("少年出发 to x") == ["少年出发", "to"]
+
+
+def test_unknown_tokenizer():
+    with pytest.raises(ValueError):
+        get_tokenizer("no-such-tokenizer")
+
+
+@pytest.mark.parametrize("name", ["", "x" * (TOKENIZER_NAME_MAX_BYTES + 1), "分词", "a\0b"])
+def test_register_rejects_names_the_index_cannot_store(name):
+    with pytest.raises(ValueError):
+        register_tokenizer(name, lambda: CJKNgramTokenizer(name))
+
+
+def test_register_custom_tokenizer(monkeypatch):
+    monkeypatch.setattr(tokenizer, "_TOKENIZERS", dict(tokenizer._TOKENIZERS))
+    monkeypatch.setattr(tokenizer, "_instances", {})
+    register_tokenizer("test-trigram", lambda: CJKNgramTokenizer("test-trigram", (3,), stopwords=()))
+    assert get_tokenizer("test-trigram").tokenize("少年出发") == ["少年出", "年出发"]
@@ -0,0 +1,81 @@
+import json
+import threading
+
+from user_store import SQLiteUserRepository, create_user_repository
+
+
+def _user(email: str, **extra):
+    return {"id": "u1", "name": "读者", "email": email, "avatarUrl": "", "passwordHash": "h",
+            "createdAt": 1700000000, **extra}
+
+
+def test_create_and_get_user(tmp_path):
+    repo = SQLiteUserRepository(str(tmp_path / "users.db"))
+    assert repo.get_user("a@b.com") is None
+    assert repo.create_user(_user("a@b.com"))
+    assert not repo.create_user(_user("a@b.com", id="u2"))
+    assert repo.get_user("a@b.com") == _user("a@b.com")
+    assert repo.stats()["users"] == 1
+
+
+def test_put_code_respects_min_interval(tmp_path):
+    repo = SQLiteUserRepository(str(tmp_path / "users.db"))
+    assert repo.put_code("a@b.com", {"hash": "h1", "sentAt": 100, "expires": 400}, 60)
+    assert not repo.put_code("a@b.com", {"hash": "h2", "sentAt": 130, "expires": 430}, 60)
+    assert repo.get_code("a@b.com") == {"hash": "h1", "sentAt": 100, "expires": 400}
+    assert repo.put_code("a@b.com", {"hash": "h3", "sentAt": 160, "expires": 460}, 60)
+    assert repo.get_code("a@b.com")["hash"] == "h3"
+
+
+def test_concurrent_put_code_only_one_wins(tmp_path):
+    repo = SQLiteUserRepository(str(tmp_path / "users.db"))
+    repo.put_code("a@b.com", {"hash": "h0", "sentAt": 0, "expires": 300}, 60)
+    results = []
+
+    def send(i):
+        results.append(repo.put_code("a@b.com", {"hash": f"h{i}", "sentAt": 100, "expires": 400}, 60))
+
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(1, 9)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results.count(True) == 1
+
+
+def test_delete_and_purge_codes(tmp_path):
+    repo = SQLiteUserRepository(str(tmp_path / "users.db"))
+    repo.put_code("a@b.com", {"hash": "h1", "sentAt": 100, "expires": 400})
+    repo.put_code("c@d.com", {"hash": "h2", "sentAt": 100, "expires": 200})
+    # 只删除与给定哈希一致的验证码（已被新验证码替换时不删除）
+    assert not repo.delete_code("a@b.com", "other")
+    assert repo.delete_code("a@b.com", "h1")
+    assert repo.get_code("a@b.com") is None
+    assert repo.purge_expired_codes(300) == 1
+    assert repo.stats()["codes"] == 0
+
+
+def test_migrates_json_files_once(tmp_path):
+    users = {"Reader@Example.com": _user("Reader@Example.com")}
+    codes = {"Reader@Example.com": {"hash": "h", "sentAt": 100, "expires": 400}}
+    (tmp_path / "users.json").write_text(json.dumps(users))
+    (tmp_path / "codes.json").write_text(json.dumps(codes))
+
+    repo = create_user_repository(tmp_path)
+    assert repo.get_user("reader@example.com")["id"] == "u1"
+    assert repo.get_code("reader@example.com") == {"hash": "h", "sentAt": 100, "expires": 400}
+    assert not (tmp_path / "users.json").exists()
+    assert (tmp_path / "users.json.migrated").exists()
+    assert (tmp_path / "codes.json.migrated").exists()
+
+    # 迁移只执行一次，之后出现的JSON文件不再导入
+    (tmp_path / "users.json").write_text(json.dumps({"new@example.com": _user("new@example.com")}))
+    repo = create_user_repository(tmp_path)
+    assert repo.get_user("new@example.com") is None
+    assert repo.stats()["users"] == 1
+
+
+def test_missing_or_corrupt_json_is_ignored(tmp_path):
+    (tmp_path / "users.json").write_text("{not json")
+    repo = create_user_repository(tmp_path)
+    assert repo.stats()["users"] == 0
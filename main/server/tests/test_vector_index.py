@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from ai import vector_index
+from ai.tokenizer import get_tokenizer
+from ai.vector_index import HashingEmbeddingProvider, VectorIndex
+
+TEXTS = [
+    "少年离开村庄前往远方的城市",
+    "城市里灯火通明，商人来来往往",
+    "老人在村庄的井边讲述旧事",
+    "the knight rode north to the castle",
+]
+
+
+def _provider():
+    return HashingEmbeddingProvider(64, get_tokenizer("cjk-bigram"))
+
+
+def test_embeddings_are_normalised():
+    vectors = _provider().embed(TEXTS + [""])
+    assert vectors.shape == (5, 64)
+    assert np.allclose(np.linalg.norm(vectors[:4], axis=1), 1.0)
+    assert not vectors[4].any()
+
+
+def test_search_finds_overlapping_text_within_window():
+    index = VectorIndex.build(TEXTS, _provider())
+    assert index.search("村庄的老人", top_k=1)[0][0] == 2
+    assert index.search("knight castle", top_k=1)[0][0] == 3
+    assert all(doc < 2 for doc, _ in index.search("村庄的老人", limit=2, top_k=4))
+    assert [doc for doc, _ in index.search("村庄", start=3, top_k=4)] == [3]
+    assert index.search("村庄", start=2, limit=2) == []
+
+
+def test_round_trip_keeps_signature(monkeypatch):
+    provider = _provider()
+    monkeypatch.setitem(vector_index._instances, "hashing", provider)
+    index = VectorIndex.build(TEXTS, provider)
+    loaded = VectorIndex.from_bytes(index.to_bytes())
+    assert loaded.signature == "hashing:cjk-bigram:64"
+    assert np.array_equal(loaded.vectors, index.vectors)
+
+
+def test_version1_has_no_signature(monkeypatch):
+    provider = _provider()
+    monkeypatch.setitem(vector_index._instances, "hashing", provider)
+    index = VectorIndex.build(TEXTS, provider)
+    data = index.to_bytes()
+    legacy = vector_index._HEADER_V1.pack(b"RAVX", 1, 4, 64, b"hashing") + data[vector_index._HEADER.size:]
+    loaded = VectorIndex.from_bytes(legacy)
+    assert loaded.signature is None
+    assert np.array_equal(loaded.vectors, index.vectors)
+
+
+def test_dimension_mismatch_rejected(monkeypatch):
+    monkeypatch.setitem(vector_index._instances, "hashing", HashingEmbeddingProvider(32))
+    with pytest.raises(ValueError):
+        VectorIndex.from_bytes(VectorIndex.build(TEXTS, _provider()).to_bytes())
+
+
+def test_update_reuses_rows_and_embeds_new_chunks():
+    provider = _provider()
+    previous = VectorIndex.build(TEXTS, provider)
+    texts = [TEXTS[2], "新的章节内容", TEXTS[0]]
+    updated = VectorIndex.update(previous, [2, -1, 0], texts)
+    assert np.array_equal(updated.vectors[0], previous.vectors[2])
+    assert np.array_equal(updated.vectors[2], previous.vectors[0])
+    assert np.allclose(updated.vectors[1], provider.embed(["新的章节内容"])[0])
+
+
+def test_token_bucket_cache_is_bounded():
+    assert vector_index._signed_bucket.cache_info().maxsize == vector_index.EMBEDDING_TOKEN_CACHE_SIZE
@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+USER_DB_PATH = os.environ.get("USER_DB_PATH", "")
+USER_DB_BUSY_TIMEOUT_MS = int(os.environ.get("USER_DB_BUSY_TIMEOUT_MS", "5000"))
+
+# 用户字段（API中的驼峰键）与表列的对应关系
+_USER_COLUMNS = {
+    "id": "id",
+    "name": "name",
+    "email": "email",
+    "avatarUrl": "avatar_url",
+    "passwordHash": "password_hash",
+    "createdAt": "created_at",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    avatar_url TEXT NOT NULL DEFAULT '',
+    password_hash TEXT NOT NULL,
+    created_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS codes (
+    email TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    sent_at INTEGER NOT NULL,
+    expires INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS codes_expires ON codes (expires);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class UserRepository:
+    """用户与验证码存储接口；邮箱为小写形式"""
+
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def create_user(self, user: Dict[str, Any]) -> bool:
+        """新增用户，邮箱已存在时返回False"""
+        raise NotImplementedError
+
+    def get_code(self, email: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def put_code(self, email: str, entry: Dict[str, Any], min_interval: int = 0) -> bool:
+        """写入验证码；距上次发送不足min_interval秒时不写入并返回False"""
+        raise NotImplementedError
+
+    def delete_code(self, email: str, code_hash: Optional[str] = None) -> bool:
+        """删除验证码（提供code_hash时只删除该验证码），返回是否删除了记录"""
+        raise NotImplementedError
+
+    def purge_expired_codes(self, now: int) -> int:
+        """清理过期验证码，返回清理条数"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class SQLiteUserRepository(UserRepository):
+    """SQLite（WAL模式）存储：按邮箱主键查找，单行更新，每个线程一个连接"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=USER_DB_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._conn())
+
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+        if row is None:
+            return None
+        return {key: row[column] for key, column in _USER_COLUMNS.items()}
+
+    def create_user(self, user: Dict[str, Any]) -> bool:
+        columns = ", ".join(_USER_COLUMNS.values())
+        placeholders = ", ".join("?" for _ in _USER_COLUMNS)
+        values = [user.get(key, "") for key in _USER_COLUMNS]
+        try:
+            self._conn().execute(f"INSERT INTO users ({columns}) VALUES ({placeholders})", values)
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def get_code(self, email: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT hash, sent_at, expires FROM codes WHERE email = ?", (email,)).fetchone()
+        if row is None:
+            return None
+        return {"hash": row["hash"], "sentAt": row["sent_at"], "expires": row["expires"]}
+
+    def put_code(self, email: str, entry: Dict[str, Any], min_interval: int = 0) -> bool:
+        # 频率检查与写入在同一条语句中完成，并发请求不会同时通过
+        cursor = self._conn().execute(
+            "INSERT INTO codes (email, hash, sent_at, expires) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(email) DO UPDATE SET hash = excluded.hash, sent_at = excluded.sent_at, "
+            "expires = excluded.expires WHERE excluded.sent_at - codes.sent_at >= ?",
+            (email, entry["hash"], entry["sentAt"], entry["expires"], min_interval),
+        )
+        return cursor.rowcount > 0
+
+    def delete_code(self, email: str, code_hash: Optional[str] = None) -> bool:
+        if code_hash is None:
+            cursor = self._conn().execute("DELETE FROM codes WHERE email = ?", (email,))
+        else:
+            cursor = self._conn().execute("DELETE FROM codes WHERE email = ? AND hash = ?", (email, code_hash))
+        return cursor.rowcount > 0
+
+    def purge_expired_codes(self, now: int) -> int:
+        return self._conn().execute("DELETE FROM codes WHERE expires < ?", (now,)).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "users": conn.execute("SELECT COUNT(*) FROM users").fetchone()[0],
+            "codes": conn.execute("SELECT COUNT(*) FROM codes").fetchone()[0],
+        }
+
+    def migrate_json(self, users_file: Path, codes_file: Path):
+        """一次性导入旧版 users.json / codes.json，导入后将文件重命名为 *.migrated"""
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+                return
+            users = _read_json(users_file)
+            codes = _read_json(codes_file)
+            columns = ", ".join(_USER_COLUMNS.values())
+            placeholders = ", ".join("?" for _ in _USER_COLUMNS)
+            conn.executemany(
+                f"INSERT OR IGNORE INTO users ({columns}) VALUES ({placeholders})",
+                [[{**user, "email": email.lower()}.get(key, "") for key in _USER_COLUMNS]
+                 for email, user in users.items()],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO codes (email, hash, sent_at, expires) VALUES (?, ?, ?, ?)",
+                [(email.lower(), entry.get("hash", ""), int(entry.get("sentAt", 0)), int(entry.get("expires", 0)))
+                 for email, entry in codes.items()],
+            )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(int(time.time())),))
+        for path in (users_file, codes_file):
+            if path.exists():
+                path.rename(path.with_name(path.name + ".migrated"))
+        if users or codes:
+            print(f"已从JSON文件导入 {len(users)} 个用户、{len(codes)} 条验证码")
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+
+
+def _read_json(path: Path) -> Dict[str, dict]:
+    try:
+        return json.loads(path.read_text())
+    except Exception:
+        return {}
+
+
+def create_user_repository(data_dir: Path) -> UserRepository:
+    """创建用户存储，并导入旧版JSON数据（只执行一次）"""
+    repo = SQLiteUserRepository(USER_DB_PATH or str(data_dir / "users.db"))
+    repo.migrate_json(data_dir / "users.json", data_dir / "codes.json")
+    return repo